@@ -0,0 +1,287 @@
+"""Vectorised filter/group-by queries over a user's matches.
+
+A user's matches (hot and archived) are held as NumPy columns: ids, scores,
+``created_at`` as ``datetime64[s]`` and ``map``/``agent`` dictionary-encoded to
+small ints. Columns are built on first use, patched from the ``/sync`` log when
+the user writes, and kept in an LRU bounded by ``ANALYTICS_CACHE_BYTES`` (0, the
+default, turns the cache off and every query builds its columns from the database).
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .archive import archived_rows
+from .core.config import get_settings
+from .leaderboard import MAX_SCORE
+from .models import Match
+from .schemas import AnalyticsQuery
+from .sync import changed_rows, latest_version
+
+SCORE_BINS = MAX_SCORE + 1
+NO_PERIOD = np.iinfo(np.int64).min
+Row = Tuple[int, str, str, int, Optional[datetime]]
+
+
+class MatchColumns:
+    """One user's matches as parallel arrays.
+
+    ``day`` and ``month`` hold ``created_at`` as days/months since the epoch so
+    time grouping is plain integer arithmetic (``NO_PERIOD`` when unknown).
+    """
+
+    COLUMNS = {
+        "ids": np.int64,
+        "map": np.int16,
+        "agent": np.int16,
+        "score": np.int8,
+        "created_at": "datetime64[s]",
+        "day": np.int64,
+        "month": np.int64,
+    }
+    PERIOD_UNITS = {"day": "D", "month": "M"}
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self) -> None:
+        self.labels: Dict[str, List[str]] = {"map": [], "agent": []}
+        self._codes: Dict[str, Dict[str, int]] = {"map": {}, "agent": {}}
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.empty(0, dtype=dtype))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.COLUMNS)
+
+    def _encode(self, name: str, values: Sequence[str]) -> np.ndarray:
+        codes, labels = self._codes[name], self.labels[name]
+        for value in values:
+            if value not in codes:
+                codes[value] = len(labels)
+                labels.append(value)
+        return np.fromiter((codes[value] for value in values), dtype=np.int16, count=len(values))
+
+    def append(self, rows: Sequence[Row]) -> None:
+        if not rows:
+            return
+        ids, maps, agents, scores, created = zip(*rows)
+        created_at = np.array(created, dtype="datetime64[s]")
+        known = ~np.isnat(created_at)
+        new = {
+            "ids": np.array(ids, dtype=np.int64),
+            "map": self._encode("map", maps),
+            "agent": self._encode("agent", agents),
+            "score": np.array(scores, dtype=np.int8),
+            "created_at": created_at,
+        }
+        for period, unit in self.PERIOD_UNITS.items():
+            values = created_at.astype(f"datetime64[{unit}]").astype(np.int64)
+            new[period] = np.where(known, values, NO_PERIOD)
+        for name, values in new.items():
+            setattr(self, name, np.concatenate([getattr(self, name), values]))
+
+    def drop(self, ids: Sequence[int]) -> None:
+        keep = ~np.isin(self.ids, np.array(ids, dtype=np.int64))
+        for name in self.COLUMNS:
+            setattr(self, name, getattr(self, name)[keep])
+
+    def _selected(self, name: str, labels: Sequence[str]) -> np.ndarray:
+        codes = self._codes[name]
+        wanted = np.zeros(len(codes) + 1, dtype=bool)
+        wanted[[codes[label] for label in labels if label in codes]] = True
+        return wanted[getattr(self, name)]
+
+    def _mask(
+        self,
+        maps: Optional[Sequence[str]],
+        agents: Optional[Sequence[str]],
+        min_score: Optional[int],
+        max_score: Optional[int],
+        since: Optional[datetime],
+        until: Optional[datetime],
+    ) -> np.ndarray:
+        mask = np.ones(len(self), dtype=bool)
+        if maps:
+            mask &= self._selected("map", maps)
+        if agents:
+            mask &= self._selected("agent", agents)
+        if min_score is not None:
+            mask &= self.score >= min_score
+        if max_score is not None:
+            mask &= self.score <= max_score
+        if since is not None:
+            mask &= self.created_at >= np.datetime64(since, "s")
+        if until is not None:
+            mask &= self.created_at < np.datetime64(until, "s")
+        return mask
+
+    def _dimension(self, name: str, mask: np.ndarray) -> Tuple[np.ndarray, int, Callable[[int], str]]:
+        """Codes of the selected rows, their radix and a code-to-label function."""
+        if name in self.labels:
+            labels = self.labels[name]
+            return getattr(self, name)[mask], max(len(labels), 1), labels.__getitem__
+        periods = getattr(self, name)[mask]
+        if not len(periods):
+            return periods, 1, str
+        first, last = int(periods.min()), int(periods.max())
+        unit = self.PERIOD_UNITS[name]
+        return periods - first, last - first + 1, lambda code: str(np.datetime64(first + code, unit))
+
+    def query(
+        self,
+        maps: Optional[Sequence[str]] = None,
+        agents: Optional[Sequence[str]] = None,
+        min_score: Optional[int] = None,
+        max_score: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        group_by: Sequence[str] = (),
+    ) -> dict:
+        """Aggregate the matching rows with a single ``bincount``.
+
+        Each selected row gets a group key (mixed radix over the group
+        dimensions); ``np.unique`` numbers the groups that actually occur, so the
+        per-group score histograms are bounded by the row count rather than by
+        the product of the dimensions' cardinalities. The histograms give count,
+        average and best.
+        """
+        group_by = list(dict.fromkeys(group_by))
+        with self.lock:
+            mask = self._mask(maps, agents, min_score, max_score, since, until)
+            if any(name in self.PERIOD_UNITS for name in group_by):
+                mask &= self.day != NO_PERIOD
+            scores = self.score[mask].astype(np.int64)
+            key = np.zeros(len(scores), dtype=np.int64)
+            dimensions = []
+            for name in reversed(group_by):
+                codes, radix, label = self._dimension(name, mask)
+                key = key * radix + codes
+                dimensions.append((name, radix, label))
+
+        keys, group_of = np.unique(key, return_inverse=True)
+        histogram = np.bincount(
+            group_of.reshape(-1) * SCORE_BINS + scores, minlength=len(keys) * SCORE_BINS
+        ).reshape(-1, SCORE_BINS)
+        counts = histogram.sum(axis=1)
+        totals = histogram @ np.arange(SCORE_BINS)
+        best = SCORE_BINS - 1 - np.argmax(histogram[:, ::-1] > 0, axis=1)
+
+        groups = []
+        for index, value in enumerate(keys.tolist()):
+            labels = {}
+            for name, radix, label in reversed(dimensions):
+                value, code = divmod(value, radix)
+                labels[name] = label(code)
+            groups.append(
+                {
+                    **labels,
+                    "matches": int(counts[index]),
+                    "average": round(float(totals[index] / counts[index]), 2),
+                    "best": int(best[index]),
+                }
+            )
+        groups.sort(key=lambda group: tuple(group[name] for name in group_by))
+        return {"matches": int(counts.sum()), "groups": groups}
+
+
+def _match_rows(db: Session, user_id: int, ids: Optional[Sequence[int]] = None) -> List[Row]:
+    query = select(Match.id, Match.map, Match.agent, Match.score, Match.created_at).where(
+        Match.user_id == user_id
+    )
+    if ids is not None:
+        query = query.where(Match.id.in_(ids))
+    return [tuple(row) for row in db.execute(query)]
+
+
+def _archived_match_rows(db: Session, user_id: int, ids: Optional[set] = None) -> List[Row]:
+    return [
+        (row["id"], row["map"], row["agent"], row["score"], row["created_at"])
+        for row in archived_rows(db, Match, user_id)
+        if ids is None or row["id"] in ids
+    ]
+
+
+def load_columns(
+    db: Session, user_id: int, columns: Optional[MatchColumns] = None
+) -> MatchColumns:
+    if columns is None:
+        columns = MatchColumns()
+    columns.clear()
+    columns.append(_match_rows(db, user_id))
+    columns.append(_archived_match_rows(db, user_id))
+    return columns
+
+
+class ColumnCache:
+    """Per-user ``MatchColumns``, least recently used evicted beyond ``max_bytes``."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._columns: "OrderedDict[int, MatchColumns]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(columns.nbytes for columns in self._columns.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._columns.clear()
+
+    def _refresh(self, db: Session, columns: MatchColumns, user_id: int, version: int) -> None:
+        if columns.version is None or columns.version > version:
+            load_columns(db, user_id, columns)
+        elif columns.version < version:
+            changed = changed_rows(db, user_id, Match.__tablename__, columns.version)
+            columns.drop([row_id for row_id, _ in changed])
+            written = [row_id for row_id, deleted in changed if not deleted]
+            rows = _match_rows(db, user_id, written)
+            # Rows archived since they were written are no longer in ``matches``.
+            missing = set(written) - {row[0] for row in rows}
+            if missing:
+                rows += _archived_match_rows(db, user_id, missing)
+            columns.append(rows)
+        columns.version = version
+
+    def get(self, db: Session, user_id: int) -> MatchColumns:
+        if self.max_bytes <= 0:
+            return load_columns(db, user_id)
+        version = latest_version(db, user_id)
+        with self._lock:
+            columns = self._columns.get(user_id)
+            if columns is None:
+                columns = self._columns[user_id] = MatchColumns()
+            self._columns.move_to_end(user_id)
+        with columns.lock:
+            if columns.version != version:
+                self._refresh(db, columns, user_id, version)
+        with self._lock:
+            while self._columns and self.nbytes > self.max_bytes:
+                self._columns.popitem(last=False)
+        return columns
+
+
+columns_cache = ColumnCache(get_settings().ANALYTICS_CACHE_BYTES)
+
+
+def match_stats(db: Session, user_id: int, query: AnalyticsQuery) -> dict:
+    return columns_cache.get(db, user_id).query(
+        maps=query.map,
+        agents=query.agent,
+        min_score=query.min_score,
+        max_score=query.max_score,
+        since=query.since,
+        until=query.until,
+        group_by=query.group_by,
+    )
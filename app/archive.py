@@ -0,0 +1,323 @@
+"""Monthly partitioning for matches and sessions, with old months tiered out to disk.
+
+On Postgres ``partition_table`` turns a table into ``PARTITION BY RANGE (created_at)``
+with one child table per month, and ``ensure_partitions`` keeps upcoming months
+created. SQLite has no declarative partitioning, so there a month is simply its
+``created_at`` range of the base table (indexed for exactly these scans).
+
+``archive_partitions`` moves every month older than ``ARCHIVE_AFTER_MONTHS`` into
+gzip-compressed columnar files under ``ARCHIVE_DIR``, one per user and month, and
+records the month in ``archived_partitions``; ``archived_rows`` reads one user's
+files back so list, dashboard, sync and analytics queries see hot and archived
+history together. Archiving is reported as an ``archive`` change
+(``app.core.changes``) so caches drop the user; sync clients keep their copies,
+leaderboards keep counting the scores and a match's round events stay in the hot
+``match_rounds`` table.
+
+Archived rows cannot be edited, and bulk updates and deletes only reach hot rows,
+but ``delete_archived`` removes a single archived row (the single-row DELETE
+routes fall back to it) and reports it as an ordinary ``delete``.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime
+import gzip
+import json
+import os
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+from fastapi import Query
+from sqlalchemy import DateTime, delete, func, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import AddConstraint
+
+from .core.changes import Change, record
+from .core.config import get_settings
+from .database import SessionLocal, engine
+from .models import ArchivedPartition, Match, Session as ValorantSession
+
+PARTITIONED_MODELS = (Match, ValorantSession)
+ARCHIVED_QUERY = Query(True, description="Include rows moved to the archive (older months)")
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _month_bounds(month: date):
+    upper = add_months(month, 1)
+    return datetime(month.year, month.month, 1), datetime(upper.year, upper.month, 1)
+
+
+def partition_name(table_name: str, month: date) -> str:
+    return f"{table_name}_p{month:%Y_%m}"
+
+
+def is_partitioned(connection, table_name: str) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    found = connection.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :name"
+        ),
+        {"name": table_name},
+    )
+    return found.first() is not None
+
+
+def ensure_partitions(
+    connection,
+    model,
+    since: Optional[date] = None,
+    months_ahead: Optional[int] = None,
+) -> None:
+    """Create monthly partitions from ``since`` up to ``months_ahead`` months from now."""
+    table_name = model.__tablename__
+    if not is_partitioned(connection, table_name):
+        return
+    if months_ahead is None:
+        months_ahead = get_settings().PARTITION_MONTHS_AHEAD
+    current = month_start(datetime.utcnow())
+    month = since or current
+    while month <= add_months(current, months_ahead):
+        lower, upper = _month_bounds(month)
+        connection.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(table_name, month)} "
+                f"PARTITION OF {table_name} "
+                f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+        )
+        month = add_months(month, 1)
+
+
+def partition_table(connection, model) -> None:
+    """One-time Postgres migration of an existing table to monthly range partitions.
+
+    The primary key becomes ``(id, created_at)`` as Postgres requires, and foreign
+    keys from other tables that referenced the old table are dropped.
+    """
+    table = model.__table__
+    name = table.name
+    legacy = f"{name}_unpartitioned"
+    columns = ", ".join(column.name for column in table.columns)
+    source_columns = ", ".join(
+        "COALESCE(created_at, now())" if column.name == "created_at" else column.name
+        for column in table.columns
+    )
+
+    connection.execute(text(f"ALTER TABLE {name} RENAME TO {legacy}"))
+    connection.execute(
+        text(
+            f"CREATE TABLE {name} (LIKE {legacy} INCLUDING DEFAULTS) "
+            "PARTITION BY RANGE (created_at)"
+        )
+    )
+    connection.execute(text(f"CREATE TABLE {name}_default PARTITION OF {name} DEFAULT"))
+    oldest = connection.execute(text(f"SELECT min(created_at) FROM {legacy}")).scalar()
+    ensure_partitions(connection, model, since=month_start(oldest) if oldest else None)
+    connection.execute(
+        text(f"INSERT INTO {name} ({columns}) SELECT {source_columns} FROM {legacy}")
+    )
+    connection.execute(text(f"ALTER SEQUENCE {name}_id_seq OWNED BY {name}.id"))
+    connection.execute(text(f"DROP TABLE {legacy} CASCADE"))
+    connection.execute(text(f"ALTER TABLE {name} ALTER COLUMN created_at SET NOT NULL"))
+    connection.execute(text(f"ALTER TABLE {name} ADD PRIMARY KEY (id, created_at)"))
+    for constraint in table.foreign_key_constraints:
+        connection.execute(AddConstraint(constraint))
+    for index in table.indexes:
+        index.create(connection)
+
+
+def _archive_path(table_name: str, month: date) -> str:
+    return os.path.join(table_name, f"{month:%Y-%m}")
+
+
+def _user_file(directory: str, path: str, user_id: int) -> str:
+    return os.path.join(directory, path, f"{user_id}.json.gz")
+
+
+def _datetime_columns(model) -> List[str]:
+    return [column.name for column in model.__table__.columns if isinstance(column.type, DateTime)]
+
+
+def _write_archive(path: str, model, rows: List[dict]) -> None:
+    """Write one user's rows column by column, newest first."""
+    rows.sort(key=lambda row: (-row["created_at"].timestamp(), -row["id"]))
+    datetime_columns = _datetime_columns(model)
+    names = [column.name for column in model.__table__.columns]
+    columns = {name: [row[name] for row in rows] for name in names}
+    for name in datetime_columns:
+        columns[name] = [value.isoformat() if value else None for value in columns[name]]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(handle, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as archive:
+        payload = {"columns": columns, "datetime_columns": datetime_columns}
+        archive.write(json.dumps(payload, separators=(",", ":")).encode())
+    os.replace(temp_path, path)
+
+
+def _read_archive(path: str) -> List[dict]:
+    if not os.path.exists(path):
+        return []
+    with gzip.open(path, "rt") as archive:
+        payload = json.load(archive)
+    columns = payload["columns"]
+    rows = [{name: values[index] for name, values in columns.items()} for index in range(len(columns["id"]))]
+    for row in rows:
+        for name in payload["datetime_columns"]:
+            if row[name] is not None:
+                row[name] = datetime.fromisoformat(row[name])
+    return rows
+
+
+def archived_rows(
+    db: Session, model, user_id: int, directory: Optional[str] = None
+) -> List[dict]:
+    """A user's archived rows for ``model``, newest month first."""
+    directory = directory or get_settings().ARCHIVE_DIR
+    paths = db.execute(
+        select(ArchivedPartition.path)
+        .where(ArchivedPartition.table_name == model.__tablename__)
+        .order_by(ArchivedPartition.month.desc())
+    ).scalars()
+    rows: List[dict] = []
+    for path in paths:
+        rows.extend(_read_archive(_user_file(directory, path, user_id)))
+    return rows
+
+
+def delete_archived(
+    db: Session, model, user_id: int, row_id: int, directory: Optional[str] = None
+) -> bool:
+    """Delete one of a user's archived rows; False when they have no such row.
+
+    The file is rewritten before the caller commits, as in ``archive_month``.
+    """
+    directory = directory or get_settings().ARCHIVE_DIR
+    catalogs = db.execute(
+        select(ArchivedPartition).where(ArchivedPartition.table_name == model.__tablename__)
+    ).scalars()
+    for catalog in catalogs:
+        path = _user_file(directory, catalog.path, user_id)
+        rows = _read_archive(path)
+        deleted = next((row for row in rows if row["id"] == row_id), None)
+        if deleted is None:
+            continue
+        record(db, [Change("delete", model.__tablename__, row_id, user_id, deleted)])
+        kept = [row for row in rows if row["id"] != row_id]
+        if kept:
+            _write_archive(path, model, kept)
+        else:
+            os.remove(path)
+        catalog.row_count -= 1
+        return True
+    return False
+
+
+def _drop_month(db: Session, model, month: date) -> None:
+    table = model.__table__
+    connection = db.connection()
+    partition = partition_name(table.name, month)
+    if is_partitioned(connection, table.name):
+        exists = connection.execute(text("SELECT to_regclass(:name)"), {"name": partition}).scalar()
+        if exists:
+            connection.execute(text(f"ALTER TABLE {table.name} DETACH PARTITION {partition}"))
+            connection.execute(text(f"DROP TABLE {partition}"))
+            return
+    lower, upper = _month_bounds(month)
+    db.execute(delete(table).where(table.c.created_at >= lower, table.c.created_at < upper))
+
+
+def archive_month(db: Session, model, month: date, directory: str) -> Optional[ArchivedPartition]:
+    table = model.__table__
+    lower, upper = _month_bounds(month)
+    rows = [
+        dict(row)
+        for row in db.execute(
+            select(table).where(table.c.created_at >= lower, table.c.created_at < upper)
+        ).mappings()
+    ]
+    if not rows:
+        return None
+
+    relative_path = _archive_path(table.name, month)
+    catalog = db.execute(
+        select(ArchivedPartition).where(
+            ArchivedPartition.table_name == table.name, ArchivedPartition.month == month
+        )
+    ).scalar_one_or_none()
+    if catalog is None:
+        catalog = ArchivedPartition(table_name=table.name, month=month, path=relative_path, row_count=0)
+        db.add(catalog)
+
+    by_user: Dict[int, List[dict]] = defaultdict(list)
+    for row in rows:
+        by_user[row["user_id"]].append(row)
+    added = 0
+    for user_id, user_rows in by_user.items():
+        path = _user_file(directory, relative_path, user_id)
+        hot_ids = {row["id"] for row in user_rows}
+        archived = _read_archive(path)  # rows of an earlier run of this month
+        kept = [row for row in archived if row["id"] not in hot_ids]
+        added += len(user_rows) - (len(archived) - len(kept))
+        _write_archive(path, model, user_rows + kept)
+    catalog.row_count += added
+    catalog.archived_at = datetime.utcnow()
+    record(db, [Change("archive", table.name, row["id"], row["user_id"], row) for row in rows])
+    _drop_month(db, model, month)
+    db.commit()
+    return catalog
+
+
+def archive_partitions(
+    db: Session, before: Optional[date] = None, directory: Optional[str] = None
+) -> List[ArchivedPartition]:
+    """Archive every month that starts before ``before`` (default: ``ARCHIVE_AFTER_MONTHS`` ago)."""
+    settings = get_settings()
+    if before is None:
+        before = add_months(month_start(datetime.utcnow()), -settings.ARCHIVE_AFTER_MONTHS)
+    directory = directory or settings.ARCHIVE_DIR
+
+    archived = []
+    for model in PARTITIONED_MODELS:
+        table = model.__table__
+        oldest = db.execute(select(func.min(table.c.created_at))).scalar()
+        if oldest is None:
+            continue
+        month = month_start(oldest)
+        while month < before:
+            catalog = archive_month(db, model, month, directory)
+            if catalog is not None:
+                archived.append(catalog)
+            month = add_months(month, 1)
+    return archived
+
+
+def maintain_partitions(bind=engine) -> None:
+    with bind.begin() as connection:
+        for model in PARTITIONED_MODELS:
+            ensure_partitions(connection, model)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    if "--partition" in sys.argv:
+        with engine.begin() as connection:
+            for model in PARTITIONED_MODELS:
+                if connection.dialect.name == "postgresql" and not is_partitioned(
+                    connection, model.__tablename__
+                ):
+                    partition_table(connection, model)
+    maintain_partitions()
+    with SessionLocal() as session:
+        for partition in archive_partitions(session):
+            print(f"archived {partition.table_name} {partition.month:%Y-%m}: {partition.row_count} rows")
@@ -14,6 +14,8 @@ from .models import User
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
+# Scope of the short-lived tokens that only open event streams (see routes/events.py).
+STREAM_SCOPE = "events"
 html_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login", auto_error=False)
 
 
@@ -50,6 +52,15 @@ def create_refresh_token(user: User) -> str:
     )
 
 
+def create_stream_token(user: User) -> str:
+    settings = get_settings()
+    return _generate_token(
+        {"sub": user.username, "user_id": str(user.id), "scope": STREAM_SCOPE},
+        settings.JWT_SECRET_KEY,
+        timedelta(seconds=settings.EVENTS_TOKEN_EXPIRE_SECONDS),
+    )
+
+
 def _decode_token(token: str, secret_key: str) -> Dict[str, str]:
     try:
         return jwt.decode(token, secret_key, algorithms=[get_settings().ALGORITHM])
@@ -65,22 +76,27 @@ def decode_refresh_token(token: str) -> Dict[str, str]:
     return _decode_token(token, get_settings().JWT_REFRESH_SECRET_KEY)
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> User:
+def _user_from_token(token: str, db: Session, scope: Optional[str]) -> User:
     payload = _decode_token(token, get_settings().JWT_SECRET_KEY)
     username: Optional[str] = payload.get("sub")
-    if username is None:
+    if username is None or payload.get("scope") != scope:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
     user = db.query(User).filter(User.username == username).first()
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
 
+    db.info["user_id"] = user.id
     return user
 
 
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+) -> User:
+    return _user_from_token(token, db, scope=None)
+
+
 def _ensure_active_user(user: User) -> User:
     if not user.is_active:
         raise HTTPException(
@@ -94,6 +110,27 @@ def get_current_active_user(current_user: User = Depends(get_current_user)) -> U
     return _ensure_active_user(current_user)
 
 
+def get_current_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
+    if current_user.username not in get_settings().ADMIN_USERNAMES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+    return current_user
+
+
+def get_active_user_from_token(
+    token: Optional[str], db: Session, scope: Optional[str] = None
+) -> User:
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return _ensure_active_user(_user_from_token(token, db, scope))
+
+
 def get_current_user_for_templates(
     request: Request,
     token: str | None = Depends(html_oauth2_scheme),
@@ -0,0 +1,100 @@
+"""Set-based updates and deletes of user-owned rows.
+
+Each operation compiles to one ``UPDATE``/``DELETE ... WHERE user_id = ?`` with
+``RETURNING`` instead of loading ORM objects, then reports the written rows to
+``core.changes`` so leaderboards, the sync log and live events stay consistent.
+"""
+
+from typing import Any, Dict, List
+
+from pydantic import BaseModel
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from .core.changes import Change, record
+
+
+def filter_criteria(model, filters: BaseModel) -> list:
+    criteria = []
+    for name, value in filters.model_dump(exclude_none=True).items():
+        if name == "ids":
+            criteria.append(model.id.in_(value))
+        elif name == "created_after":
+            criteria.append(model.created_at >= value)
+        elif name == "created_before":
+            criteria.append(model.created_at < value)
+        else:
+            criteria.append(getattr(model, name) == value)
+    return criteria
+
+
+def _update_with_old_values(table, matched, values: Dict[str, Any]):
+    """``UPDATE ... FROM`` a locking CTE of ``matched``, returning each row's old values too."""
+    old_rows = matched.cte("old_rows")
+    return (
+        update(table)
+        .where(table.c.id == old_rows.c.id)
+        .values(**values)
+        .returning(*table.c, *(old_rows.c[name].label(f"old_{name}") for name in values))
+    )
+
+
+def update_rows(
+    db: Session, model, user_id: int, criteria: list, values: Dict[str, Any]
+) -> List[dict]:
+    """Apply ``values`` to the user's rows matching ``criteria``; returns the rows as written.
+
+    On Postgres this is one statement (``_update_with_old_values``). SQLite's
+    ``RETURNING`` cannot see pre-update values, so only there the old values of
+    the assigned columns are read first with a ``SELECT`` and the update is
+    pinned to exactly those rows.
+    """
+    table = model.__table__
+    matched = (
+        select(table.c.id, *(table.c[name] for name in values))
+        .where(table.c.user_id == user_id, *criteria)
+        .with_for_update()
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        rows, old = [], {}
+        for row in db.execute(_update_with_old_values(table, matched, values)).mappings():
+            rows.append({column.name: row[column.name] for column in table.columns})
+            old[row["id"]] = {name: row[f"old_{name}"] for name in values}
+    else:
+        old = {row["id"]: row for row in db.execute(matched).mappings()}
+        if not old:
+            return []
+        rows = [
+            dict(row)
+            for row in db.execute(
+                update(table)
+                .where(table.c.user_id == user_id, table.c.id.in_(list(old)))
+                .values(**values)
+                .returning(*table.c)
+            ).mappings()
+        ]
+    changes = []
+    for row in rows:
+        previous = {
+            name: old[row["id"]][name] for name in values if old[row["id"]][name] != row[name]
+        }
+        if previous:
+            changes.append(Change("update", table.name, row["id"], user_id, row, previous))
+    record(db, changes)
+    return rows
+
+
+def delete_rows(db: Session, model, user_id: int, criteria: list) -> List[dict]:
+    table = model.__table__
+    rows = [
+        dict(row)
+        for row in db.execute(
+            delete(table).where(table.c.user_id == user_id, *criteria).returning(*table.c)
+        ).mappings()
+    ]
+    record(db, [Change("delete", table.name, row["id"], user_id, row) for row in rows])
+    return rows
+
+
+def bulk_result(rows: List[dict]) -> dict:
+    return {"affected": len(rows), "ids": sorted(row["id"] for row in rows)}
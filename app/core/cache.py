@@ -0,0 +1,271 @@
+"""Read-through cache for per-user query results.
+
+Results are stored as JSON under ``cache:<user_id>:<generation>:<name>:<args>``.
+Committing a write to a user's matches, strategies or sessions bumps that user's
+generation, so every older entry stops being read and ages out through its TTL
+(and, in memory, the LRU byte budget). With the Redis backend the generation and
+entries are shared by all workers; the memory backend only sees this worker's
+writes, so keep ``CACHE_TTL_SECONDS`` short when running several workers with it.
+
+Concurrent misses for the same key within a worker wait for the first caller's
+result instead of all querying the database.
+"""
+
+from collections import OrderedDict
+import functools
+import itertools
+import json
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from .changes import Change, on_commit, on_flush
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "cache:"
+FLIGHT_TIMEOUT_SECONDS = 30.0
+
+
+class MemoryBackend:
+    """Entries held in this process, least recently used evicted beyond ``max_bytes``.
+
+    Counters live in the same LRU. Their values come from one sequence, so a
+    counter that was evicted comes back as a value no older entry is keyed by.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._store(key, value, time.monotonic() + ttl)
+
+    def _store(self, key: str, value: bytes, expires: float) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires, value)
+        self.nbytes += len(value)
+        while self.nbytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self.nbytes -= len(value)
+
+    def counter(self, key: str) -> int:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return self._advance(key)
+            self._entries.move_to_end(key)
+            return int(entry[1])
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            return self._advance(key)
+
+    def _advance(self, key: str) -> int:
+        value = next(self._sequence)
+        self._store(key, str(value).encode(), math.inf)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+class RedisBackend:
+    """Entries shared by every worker; eviction is left to Redis' ``maxmemory-policy``."""
+
+    def __init__(self, url: str):
+        import redis
+
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._client.set(key, value, px=max(int(ttl * 1000), 1))
+
+    def counter(self, key: str) -> int:
+        return int(self._client.get(key) or 0)
+
+    def incr(self, key: str) -> int:
+        return self._client.incr(key)
+
+    def clear(self) -> None:
+        keys = list(self._client.scan_iter(match=f"{KEY_PREFIX}*"))
+        if keys:
+            self._client.delete(*keys)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Optional[bytes] = None
+
+
+class QueryCache:
+    def __init__(self, backend=None, ttl: float = 60.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "errors": 0}
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def _generation_key(self, user_id: int) -> str:
+        return f"{KEY_PREFIX}generation:{user_id}"
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def _call(self, method: str, *args, default=None):
+        """Backend call that degrades to ``default`` so an outage only costs cache hits."""
+        try:
+            return getattr(self.backend, method)(*args)
+        except Exception:
+            self._count("errors")
+            logger.warning("Cache %s failed", method, exc_info=True)
+            return default
+
+    def key(self, user_id: int, name: str, args: Sequence[Any]) -> Optional[str]:
+        generation = self._call("counter", self._generation_key(user_id))
+        if generation is None:
+            return None
+        encoded = json.dumps(list(args), default=str, separators=(",", ":"))
+        return f"{KEY_PREFIX}{user_id}:{generation}:{name}:{encoded}"
+
+    def invalidate(self, user_id: int) -> None:
+        if self.backend is not None:
+            self._call("incr", self._generation_key(user_id))
+
+    def clear(self) -> None:
+        if self.backend is not None:
+            self._call("clear")
+        with self._lock:
+            for name in self.stats:
+                self.stats[name] = 0
+
+    def get_or_compute(
+        self, db: Session, user_id: int, name: str, args: Sequence[Any], compute: Callable[[], Any]
+    ) -> Any:
+        """``compute()``'s JSON-compatible result, from the cache when possible.
+
+        Sessions that have already written skip the cache: they must see their own
+        uncommitted rows, and what they read must not be shared.
+        """
+        if self.backend is None or db.info.get("wrote"):
+            self._count("bypassed")
+            return compute()
+        # The key carries the generation read *before* querying, so a result that
+        # races a commit is stored under the old generation and never served.
+        key = self.key(user_id, name, args)
+        if key is None:
+            return compute()
+        cached = self._call("get", key)
+        if cached is not None:
+            self._count("hits")
+            return json.loads(cached)
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            if flight.done.wait(FLIGHT_TIMEOUT_SECONDS) and flight.value is not None:
+                self._count("hits")
+                return json.loads(flight.value)
+            return compute()
+
+        self._count("misses")
+        try:
+            value = compute()
+            flight.value = json.dumps(value, separators=(",", ":")).encode()
+            self._call("set", key, flight.value, self.ttl)
+            return value
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+
+def build_backend(name: str, redis_url: str, max_bytes: int):
+    if name == "redis":
+        return RedisBackend(redis_url)
+    if name == "memory":
+        return MemoryBackend(max_bytes)
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown cache backend: {name}")
+
+
+settings = get_settings()
+query_cache = QueryCache(
+    build_backend(settings.CACHE_BACKEND, settings.CACHE_REDIS_URL, settings.CACHE_MAX_BYTES),
+    settings.CACHE_TTL_SECONDS,
+)
+
+
+def cached(name: str, result_type: Any):
+    """Cache ``fn(db, user_id, *args)`` per user; the result is returned as ``result_type`` JSON.
+
+    Hits and misses return the same shape: ``result_type`` dumped in JSON mode with
+    unset fields left out, ready for a route's ``response_model`` or a batch result.
+    """
+    adapter = TypeAdapter(result_type)
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(db: Session, user_id: int, *args):
+            def compute():
+                value = adapter.validate_python(fn(db, user_id, *args), from_attributes=True)
+                return adapter.dump_python(value, mode="json", exclude_unset=True)
+
+            return query_cache.get_or_compute(db, user_id, name, args, compute)
+
+        wrapper.uncached = fn
+        return wrapper
+
+    return decorator
+
+
+@on_flush
+def mark_writer(session: Session, changes: Sequence[Change]) -> None:
+    # Any session, not only ``RoutingSession``: once it has written, its reads
+    # see uncommitted rows that a rollback may still discard.
+    session.info["wrote"] = True
+
+
+@on_commit
+def invalidate_writers(changes: Sequence[Change]) -> None:
+    for user_id in {change.user_id for change in changes}:
+        query_cache.invalidate(user_id)
@@ -0,0 +1,129 @@
+from dataclasses import dataclass, field
+import logging
+from typing import Any, Callable, Dict, Iterable, List
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from ..models import Match, Session as ValorantSession, Strategy
+
+logger = logging.getLogger(__name__)
+
+TRACKED_MODELS = (Match, Strategy, ValorantSession)
+PENDING_KEY = "pending_changes"
+
+
+@dataclass(frozen=True)
+class Change:
+    """A write to a user-owned row.
+
+    ``values`` holds the row as written (or as deleted); for updates ``previous``
+    maps each changed column to its value before the write.
+    """
+
+    op: str
+    entity: str
+    id: int
+    user_id: int
+    values: Dict[str, Any] = field(default_factory=dict)
+    previous: Dict[str, Any] = field(default_factory=dict)
+
+
+FlushListener = Callable[[Session, List[Change]], None]
+CommitListener = Callable[[List[Change]], None]
+
+_flush_listeners: List[FlushListener] = []
+_commit_listeners: List[CommitListener] = []
+
+
+def on_flush(listener: FlushListener) -> FlushListener:
+    """Run ``listener`` inside the writing transaction, right after the rows hit the database."""
+    _flush_listeners.append(listener)
+    return listener
+
+
+def on_commit(listener: CommitListener) -> CommitListener:
+    """Run ``listener`` once the writing transaction has committed."""
+    _commit_listeners.append(listener)
+    return listener
+
+
+def _loaded_values(obj) -> Dict[str, Any]:
+    state = inspect(obj)
+    return {
+        attr.key: state.dict[attr.key]
+        for attr in state.mapper.column_attrs
+        if attr.key in state.dict
+    }
+
+
+def _previous_values(obj) -> Dict[str, Any]:
+    state = inspect(obj)
+    previous = {}
+    for attr in state.mapper.column_attrs:
+        history = state.attrs[attr.key].history
+        if history.deleted:
+            previous[attr.key] = history.deleted[0]
+    return previous
+
+
+def _change(op: str, obj) -> Change:
+    previous = _previous_values(obj) if op == "update" else {}
+    return Change(op, obj.__tablename__, obj.id, obj.user_id, _loaded_values(obj), previous)
+
+
+def record(session: Session, changes: Iterable[Change]) -> None:
+    """Register writes made with bulk statements that bypass the unit of work."""
+    changes = list(changes)
+    if not changes:
+        return
+    session.info.setdefault(PENDING_KEY, []).extend(changes)
+    for listener in _flush_listeners:
+        listener(session, changes)
+
+
+@event.listens_for(Session, "before_flush")
+def _load_deleted(session, flush_context, instances):
+    # Deleting a partly loaded object (deferred or expired columns) only needs its
+    # key, but listeners need the row as it was.
+    for obj in session.deleted:
+        if not isinstance(obj, TRACKED_MODELS):
+            continue
+        state = inspect(obj)
+        unloaded = [attr.key for attr in state.mapper.column_attrs if attr.key in state.unloaded]
+        if unloaded:
+            session.refresh(obj, attribute_names=unloaded)
+
+
+@event.listens_for(Session, "after_flush")
+def _capture_flush(session, flush_context):
+    changes = []
+    for op, objects in (
+        ("create", session.new),
+        ("update", session.dirty),
+        ("delete", session.deleted),
+    ):
+        for obj in objects:
+            if not isinstance(obj, TRACKED_MODELS):
+                continue
+            if op == "update" and not session.is_modified(obj, include_collections=False):
+                continue
+            changes.append(_change(op, obj))
+    record(session, changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_commit(session):
+    changes = session.info.pop(PENDING_KEY, None)
+    if not changes:
+        return
+    for listener in _commit_listeners:
+        try:
+            listener(changes)
+        except Exception:
+            logger.exception("Commit listener %r failed", listener)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(PENDING_KEY, None)
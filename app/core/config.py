@@ -8,6 +8,12 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str = Field(..., env="DATABASE_URL")
+    DATABASE_REPLICA_URLS: List[str] = []
+    REPLICA_STICKY_SECONDS: float = 5.0
+    REPLICA_RETRY_SECONDS: float = 30.0
+    REPLICA_HEALTH_INTERVAL_SECONDS: float = 5.0
+    DATABASE_SHARD_URLS: List[str] = []
+    SHARD_VNODES: int = 64
     JWT_SECRET_KEY: str = Field(..., env="JWT_SECRET_KEY")
     JWT_REFRESH_SECRET_KEY: str = Field(..., env="JWT_REFRESH_SECRET_KEY")
     ALGORITHM: str = "HS256"
@@ -15,6 +21,28 @@ class Settings(BaseSettings):
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     BCRYPT_ROUNDS: int = 12
     CORS_ORIGINS: List[str] = ["*"]
+    ADMIN_USERNAMES: List[str] = []
+    # SIGTERM a worker whose RSS passes this size (0 = off). Needs a supervisor
+    # that replaces exited workers (gunicorn, uvicorn --workers, Kubernetes...);
+    # a single unsupervised process just stops serving.
+    MEMORY_RECYCLE_RSS_MB: int = 0
+    MEMORY_CHECK_EVERY_REQUESTS: int = 100
+    ARCHIVE_DIR: str = "archive"
+    ARCHIVE_AFTER_MONTHS: int = 6
+    PARTITION_MONTHS_AHEAD: int = 3
+    EVENTS_BACKEND: str = "memory"
+    EVENTS_REDIS_URL: str = "redis://localhost:6379/0"
+    EVENTS_QUEUE_SIZE: int = 100
+    EVENTS_KEEPALIVE_SECONDS: float = 15.0
+    EVENTS_TOKEN_EXPIRE_SECONDS: int = 60
+    RECOMMENDATION_CACHE_USERS: int = 256
+    ANALYTICS_CACHE_BYTES: int = 0
+    MATCH_EVENTS_MAX_EVENTS: int = 200_000
+    MATCH_EVENTS_MAX_ROUNDS: int = 64
+    CACHE_BACKEND: str = "memory"
+    CACHE_REDIS_URL: str = "redis://localhost:6379/1"
+    CACHE_TTL_SECONDS: float = 30.0
+    CACHE_MAX_BYTES: int = 32 * 1024 * 1024
 
     class Config:
         env_file = ".env"
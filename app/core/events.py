@@ -0,0 +1,193 @@
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+import logging
+from typing import AsyncIterator, Callable, Dict, Optional, Set
+
+Deliver = Callable[[int, str], None]
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """A single connection's bounded mailbox; ``None`` means the hub dropped it."""
+
+    def __init__(self, user_id: int, maxsize: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = False
+
+    async def get(self) -> Optional[str]:
+        return await self.queue.get()
+
+
+class InMemoryBackend:
+    """Delivers events published in this process only."""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._deliver = deliver
+
+    def publish(self, user_id: int, message: str) -> None:
+        loop, deliver = self._loop, self._deliver
+        if loop is None or deliver is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(deliver, user_id, message)
+
+    async def stop(self) -> None:
+        self._loop = None
+        self._deliver = None
+
+
+class RedisBackend:
+    """Shares events between workers through Redis pub/sub channels.
+
+    If the subscription fails (Redis restarts, the connection drops...) the
+    listener logs it and resubscribes with exponential backoff; events published
+    in between are lost, as with any pub/sub outage.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        channel_prefix: str = "valorant:events:",
+        retry_seconds: float = 0.5,
+        max_retry_seconds: float = 30.0,
+    ):
+        self.url = url
+        self.channel_prefix = channel_prefix
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._publisher = None
+        self._client = None
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        import redis
+        import redis.asyncio
+
+        self._publisher = redis.Redis.from_url(self.url)
+        self._client = redis.asyncio.Redis.from_url(self.url)
+        await self._subscribe()
+        self._task = asyncio.create_task(self._listen(deliver))
+
+    async def _subscribe(self) -> None:
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.psubscribe(f"{self.channel_prefix}*")
+
+    async def _resubscribe(self) -> None:
+        try:
+            await self._pubsub.aclose()
+        except Exception:  # the connection is already broken
+            pass
+        await self._subscribe()
+
+    async def _listen(self, deliver: Deliver) -> None:
+        prefix_length = len(self.channel_prefix)
+        delay = self.retry_seconds
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    delay = self.retry_seconds
+                    if message["type"] != "pmessage":
+                        continue
+                    user_id = int(message["channel"].decode()[prefix_length:])
+                    deliver(user_id, message["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Redis event subscription failed; resubscribing in %.1fs", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_seconds)
+            try:
+                await self._resubscribe()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Resubscribing to Redis events failed")
+
+    def publish(self, user_id: int, message: str) -> None:
+        if self._publisher is not None:
+            self._publisher.publish(f"{self.channel_prefix}{user_id}", message)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        if self._client is not None:
+            await self._client.aclose()
+        if self._publisher is not None:
+            self._publisher.close()
+        self._publisher = self._client = self._pubsub = self._task = None
+
+
+class EventHub:
+    """Per-user fan-out of serialized events to connected clients.
+
+    Each connection gets a bounded queue. A connection whose queue is full is
+    dropped instead of letting it buffer without limit; the client is expected to
+    reload its state and reconnect.
+    """
+
+    def __init__(self, backend=None, queue_size: int = 100):
+        self.backend = backend or InMemoryBackend()
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[Subscription]] = defaultdict(set)
+
+    async def start(self) -> None:
+        await self.backend.start(self._deliver)
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+
+    def publish(self, user_id: int, message: str) -> None:
+        """Thread-safe; may be called from request worker threads."""
+        self.backend.publish(user_id, message)
+
+    def subscriber_count(self, user_id: int) -> int:
+        return len(self._subscribers.get(user_id, ()))
+
+    def _deliver(self, user_id: int, message: str) -> None:
+        for subscription in list(self._subscribers.get(user_id, ())):
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._drop(subscription)
+
+    def _drop(self, subscription: Subscription) -> None:
+        subscription.dropped = True
+        self._discard(subscription)
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+
+    def _discard(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            self._subscribers.pop(subscription.user_id, None)
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int) -> AsyncIterator[Subscription]:
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscribers[user_id].add(subscription)
+        try:
+            yield subscription
+        finally:
+            self._discard(subscription)
+
+
+def build_backend(name: str, redis_url: str):
+    if name == "redis":
+        return RedisBackend(redis_url)
+    if name == "memory":
+        return InMemoryBackend()
+    raise ValueError(f"Unknown events backend: {name}")
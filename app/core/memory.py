@@ -0,0 +1,244 @@
+"""Runtime memory diagnostics built on ``tracemalloc``.
+
+Tracing is off by default (it slows allocation-heavy code noticeably) and can be
+switched on and off at runtime. While it is on, ``MemoryMiddleware`` records each
+route's net allocation (still traced when the response has been sent) and peak
+allocation. Both are measured with the process-wide traced totals, so requests
+running at the same time inflate each other's numbers; use them to find a
+suspect route, then compare heap snapshots taken around it.
+
+Independently of tracing, the middleware checks the worker's RSS every
+``check_every`` requests and asks the worker to shut down gracefully (SIGTERM)
+once it passes ``recycle_bytes``, so the process manager (gunicorn, uvicorn
+``--workers``, Kubernetes...) can start a fresh one. Only turn recycling on under
+such a supervisor: a lone ``uvicorn app.main:app`` simply exits.
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+import logging
+import os
+import signal
+import threading
+import tracemalloc
+from typing import Dict, List, Optional
+
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+MAX_SNAPSHOTS = 8
+IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<unknown>")
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+
+        # ru_maxrss is the peak, in KiB on Linux and bytes on macOS; close enough
+        # where /proc is unavailable.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RouteMemory:
+    __slots__ = ("requests", "net_bytes", "max_net_bytes", "peak_bytes")
+
+    def __init__(self):
+        self.requests = 0
+        self.net_bytes = 0
+        self.max_net_bytes = 0
+        self.peak_bytes = 0
+
+    def add(self, net: int, peak: int) -> None:
+        self.requests += 1
+        self.net_bytes += net
+        self.max_net_bytes = max(self.max_net_bytes, net)
+        self.peak_bytes = max(self.peak_bytes, peak)
+
+    def as_dict(self, route: str) -> dict:
+        return {
+            "route": route,
+            "requests": self.requests,
+            "net_bytes": self.net_bytes,
+            "avg_net_bytes": self.net_bytes // self.requests if self.requests else 0,
+            "max_net_bytes": self.max_net_bytes,
+            "peak_bytes": self.peak_bytes,
+        }
+
+
+class MemoryDiagnostics:
+    def __init__(self, recycle_bytes: int = 0, check_every: int = 100):
+        self.recycle_bytes = recycle_bytes
+        self.check_every = check_every
+        self.routes: Dict[str, RouteMemory] = {}
+        self.snapshots: "OrderedDict[int, dict]" = OrderedDict()
+        self.recycling = False
+        self._next_snapshot = 1
+        self._requests = 0
+        self._inflight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1) -> None:
+        if tracemalloc.is_tracing() and tracemalloc.get_traceback_limit() != frames:
+            tracemalloc.stop()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self) -> None:
+        """Stop tracing; snapshots already taken stay available."""
+        tracemalloc.stop()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.routes.clear()
+            self.snapshots.clear()
+
+    def status(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            routes = [stats.as_dict(route) for route, stats in self.routes.items()]
+        routes.sort(key=lambda route: route["net_bytes"], reverse=True)
+        return {
+            "tracing": self.tracing,
+            "frames": tracemalloc.get_traceback_limit() if self.tracing else 0,
+            "rss_bytes": rss_bytes(),
+            "recycle_rss_bytes": self.recycle_bytes,
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "routes": routes,
+        }
+
+    def begin(self) -> Optional[int]:
+        if not tracemalloc.is_tracing():
+            return None
+        with self._lock:
+            self._inflight += 1
+            if self._inflight == 1:
+                tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0]
+
+    def finish(self, route: str, started: Optional[int]) -> None:
+        if started is not None:
+            current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            self._requests += 1
+            check = self.recycle_bytes and self._requests % self.check_every == 0
+            if started is not None:
+                self._inflight -= 1
+                if tracemalloc.is_tracing():  # not switched off mid-request
+                    stats = self.routes.get(route)
+                    if stats is None:
+                        stats = self.routes[route] = RouteMemory()
+                    stats.add(current - started, max(peak - started, 0))
+        if check:
+            self.check_rss()
+
+    def check_rss(self) -> bool:
+        rss = rss_bytes()
+        with self._lock:
+            if self.recycling or rss < self.recycle_bytes:
+                return False
+            self.recycling = True
+        logger.warning(
+            "Worker %s RSS %d bytes is over %d; shutting down to be replaced",
+            os.getpid(),
+            rss,
+            self.recycle_bytes,
+        )
+        os.kill(os.getpid(), signal.SIGTERM)
+        return True
+
+    def take_snapshot(self) -> dict:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("Memory tracing is off")
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, filename) for filename in IGNORED_FILES]
+        )
+        with self._lock:
+            snapshot_id = self._next_snapshot
+            self._next_snapshot += 1
+            info = {
+                "id": snapshot_id,
+                "taken_at": datetime.utcnow(),
+                "traced_bytes": sum(trace.size for trace in snapshot.traces),
+                "rss_bytes": rss_bytes(),
+            }
+            self.snapshots[snapshot_id] = {"info": info, "snapshot": snapshot}
+            while len(self.snapshots) > MAX_SNAPSHOTS:
+                self.snapshots.popitem(last=False)
+        return info
+
+    def snapshot_infos(self) -> List[dict]:
+        with self._lock:
+            return [entry["info"] for entry in self.snapshots.values()]
+
+    def _snapshot(self, snapshot_id: int) -> Optional[tracemalloc.Snapshot]:
+        entry = self.snapshots.get(snapshot_id)
+        return None if entry is None else entry["snapshot"]
+
+    def top(self, snapshot_id: int, group_by: str, limit: int) -> Optional[List[dict]]:
+        snapshot = self._snapshot(snapshot_id)
+        if snapshot is None:
+            return None
+        return [
+            {
+                "location": _location(stat.traceback, group_by),
+                "size_bytes": stat.size,
+                "count": stat.count,
+            }
+            for stat in snapshot.statistics(group_by)[:limit]
+        ]
+
+    def diff(
+        self, base_id: int, current_id: int, group_by: str, limit: int
+    ) -> Optional[List[dict]]:
+        base, current = self._snapshot(base_id), self._snapshot(current_id)
+        if base is None or current is None:
+            return None
+        return [
+            {
+                "location": _location(stat.traceback, group_by),
+                "size_bytes": stat.size,
+                "size_diff_bytes": stat.size_diff,
+                "count": stat.count,
+                "count_diff": stat.count_diff,
+            }
+            for stat in current.compare_to(base, group_by)[:limit]
+        ]
+
+
+def _location(traceback: tracemalloc.Traceback, group_by: str) -> str:
+    frame = traceback[0]
+    return frame.filename if group_by == "filename" else f"{frame.filename}:{frame.lineno}"
+
+
+class MemoryMiddleware:
+    """Feeds per-route allocation stats and the RSS recycle check."""
+
+    def __init__(self, app, diagnostics: Optional[MemoryDiagnostics] = None):
+        self.app = app
+        self.diagnostics = diagnostics or memory
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = self.diagnostics.begin()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = getattr(scope.get("route"), "path", scope["path"])
+            self.diagnostics.finish(f"{scope['method']} {route}", started)
+
+
+settings = get_settings()
+memory = MemoryDiagnostics(
+    settings.MEMORY_RECYCLE_RSS_MB * 1024 * 1024, settings.MEMORY_CHECK_EVERY_REQUESTS
+)
@@ -0,0 +1,262 @@
+"""Sampling CPU profiler for live requests.
+
+While profiling is on, requests whose path matches ``pattern`` are selected with
+probability ``rate``. A background thread wakes every ``interval`` seconds and
+reads every thread's current stack (``sys._current_frames``); a stack counts
+towards a selected request when it runs inside that request, either on the event
+loop (under ``ProfilerMiddleware``) or in a threadpool worker executing one of its
+sync dependencies or endpoints (auth, SQLAlchemy, Jinja, bcrypt...). Stacks are
+aggregated per route and served in collapsed ("folded") form or as an SVG
+flame graph.
+
+Nothing is sampled while no selected request is in flight, and each tick only
+walks the frames of busy threads, so the overhead stays low.
+"""
+
+from collections import Counter
+from contextvars import Context, ContextVar
+import fnmatch
+import html
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+import zlib
+
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar("profiled_request", default=None)
+
+EXCLUDED_PREFIXES = ("/admin/",)
+MAX_DEPTH = 128
+
+try:
+    from anyio._backends._asyncio import WorkerThread
+
+    _WORKER_CODE = WorkerThread.run.__code__
+except (ImportError, AttributeError):  # pragma: no cover - other anyio backends
+    _WORKER_CODE = None
+_IDLE_CODE = queue.Queue.get.__code__
+
+
+class RequestProfile:
+    __slots__ = ("stacks",)
+
+    def __init__(self):
+        self.stacks: Counter = Counter()
+
+
+def _short_path(filename: str) -> str:
+    best = ""
+    for entry in sys.path:
+        if entry and filename.startswith(entry) and len(entry) > len(best):
+            best = entry
+    return os.path.relpath(filename, best) if best else filename
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self.active = False
+        self.pattern = "*"
+        self.rate = 1.0
+        self.interval = 0.01
+        self.stacks: Counter = Counter()
+        self.requests: Counter = Counter()
+        self.ticks = 0
+        self.sampling_seconds = 0.0
+        self.started_at: Optional[float] = None
+        self._inflight: Set[RequestProfile] = set()
+        self._labels: Dict[object, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, pattern: str = "*", rate: float = 1.0, interval: float = 0.01) -> None:
+        self.stop()
+        self.pattern, self.rate, self.interval = pattern, rate, interval
+        self.started_at = time.monotonic()
+        self.sampling_seconds = 0.0
+        self.ticks = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        self.active = True
+
+    def stop(self) -> None:
+        self.active = False
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stacks.clear()
+            self.requests.clear()
+            self.ticks = 0
+            self.sampling_seconds = 0.0
+
+    def status(self) -> dict:
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            "active": self.active,
+            "pattern": self.pattern,
+            "rate": self.rate,
+            "interval_ms": self.interval * 1000,
+            "requests": sum(self.requests.values()),
+            "samples": sum(self.stacks.values()),
+            "overhead": round(self.sampling_seconds / elapsed, 5) if elapsed else 0.0,
+        }
+
+    def select(self, path: str) -> bool:
+        return (
+            self.active
+            and not path.startswith(EXCLUDED_PREFIXES)
+            and fnmatch.fnmatchcase(path, self.pattern)
+            and (self.rate >= 1 or random.random() < self.rate)
+        )
+
+    def begin(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._inflight.add(profile)
+
+    def finish(self, profile: RequestProfile, route: str) -> None:
+        with self._lock:
+            self._inflight.discard(profile)
+            self.requests[route] += 1
+            for stack, count in profile.stacks.items():
+                self.stacks[f"{route};{stack}" if stack else route] += count
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if not self._inflight:
+                continue
+            started = time.perf_counter()
+            self._sample()
+            self.sampling_seconds += time.perf_counter() - started
+            self.ticks += 1
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = (
+                f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+            )
+        return label
+
+    def _attribute(self, frame) -> Tuple[Optional[RequestProfile], List[str]]:
+        """The request ``frame``'s thread is working for, and its stack below that point."""
+        labels, child = [], None
+        while frame is not None:
+            code = frame.f_code
+            if code is _MIDDLEWARE_CODE:
+                return frame.f_locals.get("profile"), labels
+            if code is _WORKER_CODE:
+                if child is None or child.f_code is _IDLE_CODE:
+                    return None, labels
+                context = frame.f_locals.get("context")
+                if isinstance(context, Context):
+                    return context.get(_current), labels
+                return None, labels
+            if len(labels) < MAX_DEPTH:
+                labels.append(self._label(code))
+            child, frame = frame, frame.f_back
+        return None, labels
+
+    def _sample(self) -> None:
+        me = threading.get_ident()
+        frames = sys._current_frames()
+        with self._lock:
+            for thread_id, frame in frames.items():
+                if thread_id == me:
+                    continue
+                profile, labels = self._attribute(frame)
+                if profile is not None and profile in self._inflight:
+                    profile.stacks[";".join(reversed(labels))] += 1
+
+    def collapsed(self) -> str:
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def flamegraph(self, width: int = 1200, row_height: int = 16) -> str:
+        with self._lock:
+            return flamegraph_svg(dict(self.stacks), width, row_height)
+
+
+def flamegraph_svg(stacks: Dict[str, int], width: int = 1200, row_height: int = 16) -> str:
+    """Render collapsed stacks as a static SVG flame graph (root at the bottom)."""
+    tree: dict = {"count": 0, "children": {}}
+    for stack, count in stacks.items():
+        node = tree
+        node["count"] += count
+        for name in stack.split(";"):
+            node = node["children"].setdefault(name, {"count": 0, "children": {}})
+            node["count"] += count
+
+    rects, depth = [], 0
+
+    def place(name: str, node: dict, x: float, level: int) -> None:
+        nonlocal depth
+        depth = max(depth, level + 1)
+        span = node["count"] / tree["count"] * width
+        rects.append((name, node["count"], x, level, span))
+        for child_name, child in sorted(node["children"].items()):
+            place(child_name, child, x, level + 1)
+            x += child["count"] / tree["count"] * width
+
+    x = 0.0
+    for name, node in sorted(tree["children"].items()):
+        place(name, node, x, 0)
+        x += node["count"] / tree["count"] * width
+
+    height = max(depth, 1) * row_height
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        'font-family="monospace" font-size="11">'
+    ]
+    for name, count, x, level, span in rects:
+        if span < 0.5:
+            continue
+        y = height - (level + 1) * row_height
+        hue = 20 + zlib.crc32(name.encode()) % 40
+        text = html.escape(name)
+        chars = int(span // 7)
+        label = text if len(name) <= chars else html.escape(name[: max(chars - 2, 0)] + "..")
+        parts.append(
+            f'<g><title>{text} ({count} samples)</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{span:.1f}" height="{row_height - 1}" '
+            f'fill="hsl({hue},90%,60%)"/>'
+            + (f'<text x="{x + 2:.1f}" y="{y + row_height - 4}">{label}</text>' if chars > 2 else "")
+            + "</g>"
+        )
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+profiler = SamplingProfiler()
+
+
+class ProfilerMiddleware:
+    """Marks requests selected by ``profiler`` so their stacks can be attributed."""
+
+    def __init__(self, app, profiler: SamplingProfiler = profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.select(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile()
+        token = _current.set(profile)
+        self.profiler.begin(profile)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", scope["path"])
+            self.profiler.finish(profile, f"{scope['method']} {route}")
+
+
+_MIDDLEWARE_CODE = ProfilerMiddleware.__call__.__code__
@@ -1,28 +1,614 @@
-# app/database.py
-from sqlalchemy import create_engine
+from bisect import bisect
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import hmac
+import itertools
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple, TypeVar
+
+from sqlalchemy import DateTime, create_engine, event, func, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, object_mapper, sessionmaker
+from sqlalchemy.sql import Delete, Insert, Update
+from sqlalchemy.sql.util import find_tables
+from sqlalchemy.sql.functions import FunctionElement
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
 
 from .core.config import settings
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+READ_METHODS = {"GET", "HEAD"}
+# Tables kept only in the directory database when sharding is on.
+DIRECTORY_TABLES = frozenset({"users", "user_shards", "id_blocks"})
+
+T = TypeVar("T")
+
+
+class ReplicaSet:
+    """Round-robin pool of read replicas that skips members which fail to connect."""
+
+    def __init__(
+        self,
+        engines: Sequence[Engine],
+        retry_seconds: float = 30.0,
+        health_interval: float = 5.0,
+    ):
+        self.engines: List[Engine] = list(engines)
+        self.retry_seconds = retry_seconds
+        self.health_interval = health_interval
+        self._down_until: Dict[int, float] = {}
+        self._checked_at: Dict[int, float] = {}
+        self._cursor = itertools.count()
+        self._lock = threading.Lock()
+        for index, replica in enumerate(self.engines):
+            event.listen(replica, "handle_error", self._error_listener(index))
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def _error_listener(self, index: int):
+        def handle_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(index)
+
+        return handle_error
+
+    def mark_down(self, index: int) -> None:
+        with self._lock:
+            self._down_until[index] = time.monotonic() + self.retry_seconds
+            self._checked_at.pop(index, None)
+
+    def _healthy(self, index: int, now: float) -> bool:
+        if self._down_until.get(index, 0.0) > now:
+            return False
+        if now - self._checked_at.get(index, float("-inf")) < self.health_interval:
+            return True
+        try:
+            with self.engines[index].connect():
+                pass
+        except DBAPIError:
+            self.mark_down(index)
+            return False
+        with self._lock:
+            self._checked_at[index] = now
+            self._down_until.pop(index, None)
+        return True
+
+    def choose(self) -> Optional[Engine]:
+        if not self.engines:
+            return None
+        now = time.monotonic()
+        start = next(self._cursor)
+        for offset in range(len(self.engines)):
+            index = (start + offset) % len(self.engines)
+            if self._healthy(index, now):
+                return self.engines[index]
+        return None
+
+
+class StickyWriters:
+    """Remembers users who wrote recently so their reads stay on the primary."""
+
+    def __init__(self):
+        self._until: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def mark(self, user_id: int, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._until[user_id] = now + seconds
+            if now >= self._next_sweep:
+                # Writers who never read again would otherwise stay here forever.
+                self._until = {user: until for user, until in self._until.items() if until > now}
+                self._next_sweep = now + seconds
+
+    def is_sticky(self, user_id: Optional[int]) -> bool:
+        if user_id is None:
+            return False
+        until = self._until.get(user_id)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            with self._lock:
+                self._until.pop(user_id, None)
+            return False
+        return True
+
+
+sticky_writers = StickyWriters()
+
+
+class StickyCookie:
+    """Read-your-writes across workers, carried by the client.
+
+    ``StickyWriters`` only knows about writes this worker took. After a write is
+    committed the response also sets a signed cookie with the wall-clock time
+    until which the client's reads must use the primary; any worker honours it,
+    including for the user lookup of a request that follows a signup.
+    """
+
+    def __init__(self, secret: str, name: str = "primary_until"):
+        self.name = name
+        self._key = secret.encode()
+
+    def _sign(self, value: str) -> str:
+        return hmac.new(self._key, value.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def encode(self, until: float) -> str:
+        value = f"{until:.3f}"
+        return f"{value}.{self._sign(value)}"
+
+    def decode(self, cookie: Optional[str]) -> float:
+        """The time held by ``cookie``; 0 when it is missing or not signed by us."""
+        value, _, signature = (cookie or "").rpartition(".")
+        if not value or not hmac.compare_digest(signature, self._sign(value)):
+            return 0.0
+        return float(value)
+
+    def attach(self, db: Session, connection: HTTPConnection) -> None:
+        """Apply the request's cookie to ``db`` and let a commit renew it."""
+        db.info["primary_until"] = self.decode(connection.cookies.get(self.name))
+        db.info["request_state"] = connection.state
+
+
+sticky_cookie = StickyCookie(settings.JWT_SECRET_KEY)
+
+
+class StickyCookieMiddleware:
+    """Sets the ``StickyCookie`` on responses to requests that committed a write."""
+
+    def __init__(self, app, cookie: StickyCookie = sticky_cookie):
+        self.app = app
+        self.cookie = cookie
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            until = scope.get("state", {}).get("primary_until")
+            if message["type"] == "http.response.start" and until:
+                max_age = max(math.ceil(until - time.time()), 1)
+                MutableHeaders(scope=message).append(
+                    "set-cookie",
+                    f"{self.cookie.name}={self.cookie.encode(until)}; Max-Age={max_age}; "
+                    "Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing of user ids onto shard names, with virtual nodes.
+
+    Adding a shard only remaps the keys that now land on it (about 1/n of them).
+    """
+
+    def __init__(self, names: Sequence[str], vnodes: int = 64):
+        points = sorted(
+            (_ring_hash(f"{name}#{replica}"), name) for name in names for replica in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def node(self, key) -> str:
+        return self._names[bisect(self._hashes, _ring_hash(str(key))) % len(self._hashes)]
+
+
+class ShardMovingError(RuntimeError):
+    """A write for a user whose rows are being moved to another shard."""
+
+
+class IdBlocks:
+    """Ids for sharded tables, leased from the directory in blocks (hi/lo).
+
+    Rows keep their ids when a user moves to another shard, so ids have to be
+    unique across shards rather than per-database sequences.
+    """
+
+    def __init__(self, shards: "ShardMap", size: int = 1000):
+        self.shards = shards
+        self.size = size
+        self._blocks: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def next(self, table) -> int:
+        with self._lock:
+            start, end = self._blocks.get(table.name, (0, 0))
+            if start >= end:
+                end = self._lease(table)
+                start = end - self.size
+            self._blocks[table.name] = (start + 1, end)
+            return start
+
+    def _lease(self, table) -> int:
+        blocks = Base.metadata.tables["id_blocks"]
+        bump = (
+            update(blocks)
+            .where(blocks.c.name == table.name)
+            .values(next_id=blocks.c.next_id + self.size)
+            .returning(blocks.c.next_id)
+        )
+        with self.shards.directory.begin() as connection:
+            end = connection.execute(bump).scalar()
+            if end is None:
+                # First lease: start above every id already stored on any shard.
+                start = 1
+                for shard in self.shards.engines.values():
+                    with shard.connect() as shard_connection:
+                        stored = shard_connection.execute(
+                            select(func.max(table.autoincrement_column))
+                        ).scalar()
+                    start = max(start, (stored or 0) + 1)
+                connection.execute(
+                    dialect_insert(connection, blocks)
+                    .values(name=table.name, next_id=start)
+                    .on_conflict_do_nothing()
+                )
+                end = connection.execute(bump).scalar()
+        return end
+
+
+class ShardMap:
+    """User-scoped tables split across shard engines by ``user_id``.
+
+    The directory (``DATABASE_URL``) keeps the tables in ``DIRECTORY_TABLES``.
+    Every shard has the rest, plus copies of the ``users`` rows of the users it
+    holds so queries joining ``users`` stay on one shard. A user lives where
+    ``user_shards`` says (set from the hash ring at signup) or, without a row
+    there, on the ring's choice.
+    """
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    def __init__(self, directory: Engine, engines: Mapping[str, Engine], vnodes: int = 64):
+        self.directory = directory
+        self.engines: Dict[str, Engine] = dict(engines)
+        self.ring = HashRing(list(self.engines), vnodes)
+        self.ids = IdBlocks(self)
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def home(self, user_id: int) -> str:
+        return self.ring.node(user_id)
+
+    def locate(self, connection, user_id: int) -> Tuple[str, bool]:
+        """The user's shard and whether a move has frozen their writes."""
+        placements = Base.metadata.tables["user_shards"]
+        row = connection.execute(
+            select(placements.c.shard, placements.c.moving).where(
+                placements.c.user_id == user_id
+            )
+        ).first()
+        if row is None:
+            return self.home(user_id), False
+        return row.shard, row.moving
+
+    def session(self, shard: Optional[str] = None, **info) -> "RoutingSession":
+        """A session on this shard map; pinned to ``shard`` when given."""
+        session = RoutingSession(bind=self.directory, shards=self, autoflush=False, future=True)
+        if shard is not None:
+            session.info["shard"] = shard
+        session.info.update(info)
+        return session
+
+
+class RoutingSession(Session):
+    """Session that sends writes to the primary and read-only requests to a replica.
+
+    A session only reads from a replica when ``info["read_only"]`` is set, it has
+    not flushed anything yet, its user (``info["user_id"]``) has not written
+    within the sticky window on this worker and the request's ``StickyCookie``
+    (``info["primary_until"]``) has expired. A replica that cannot be reached when chosen is
+    skipped; one that fails a read is marked down and the read is retried on the
+    primary.
+
+    With ``shards``, statements touching any table outside ``DIRECTORY_TABLES`` go
+    to the shard named by ``info["shard"]``, or else to the shard holding
+    ``info["user_id"]``; the primary and replicas then only serve the directory.
+    """
+
+    def __init__(
+        self,
+        *args,
+        replicas: Optional[ReplicaSet] = None,
+        sticky_seconds: float = 0.0,
+        shards: Optional[ShardMap] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+        self.sticky_seconds = sticky_seconds
+        self.shards = shards
+        self.shard: Optional[str] = None
+        self._read_bind: Optional[Engine] = None
+        self._on_replica = False
+        self._moving = False
+
+    def _use_primary(self, clause) -> bool:
+        return (
+            not self.replicas
+            or not self.info.get("read_only")
+            or self.info.get("wrote")
+            or self._flushing
+            or isinstance(clause, (Insert, Update, Delete))
+            or sticky_writers.is_sticky(self.info.get("user_id"))
+            or self.info.get("primary_until", 0.0) > time.time()
+        )
+
+    def _sharded(self, mapper, clause) -> bool:
+        tables = list(mapper.tables) if mapper is not None else []
+        if clause is not None:
+            tables.extend(find_tables(clause, include_crud=True))
+        if not tables:  # session.connection(): the shard once one is known
+            return "shard" in self.info or "user_id" in self.info
+        return any(table.name not in DIRECTORY_TABLES for table in tables)
+
+    def _writes(self, clause) -> bool:
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            return True
+        # A bare session.connection() (raw or COPY writes) in a writing request.
+        return clause is None and not self.info.get("read_only")
+
+    def _shard_bind(self, clause) -> Engine:
+        if self.shard is None:
+            name = self.info.get("shard")
+            if name is None:
+                user_id = self.info.get("user_id")
+                if user_id is None:
+                    raise RuntimeError("Sharded query without info['user_id'] or info['shard']")
+                directory = self.connection(bind_arguments={"bind": self.shards.directory})
+                name, self._moving = self.shards.locate(directory, user_id)
+            self.shard = name
+        if self._moving and self._writes(clause):
+            raise ShardMovingError("This account is being moved; try again shortly")
+        return self.shards.engines[self.shard]
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        if isinstance(clause, (Insert, Update, Delete)):
+            # Core and bulk statements skip the flush, so they mark the write themselves.
+            self.info["wrote"] = True
+        if self.shards and self._sharded(mapper, clause):
+            return self._shard_bind(clause)
+        primary = super().get_bind(mapper, clause=clause, **kwargs)
+        if self._use_primary(clause):
+            return primary
+        if self._read_bind is None:
+            self._read_bind = self.replicas.choose() or primary
+        self._on_replica = self._read_bind is not primary
+        return self._read_bind
+
+    def _with_replica_fallback(self, method, *args, **kwargs):
+        self._on_replica = False
+        try:
+            return method(*args, **kwargs)
+        except DBAPIError as exc:
+            if not self._on_replica or not (
+                exc.connection_invalidated or isinstance(exc, OperationalError)
+            ):
+                raise
+            if self._read_bind in self.replicas.engines:
+                self.replicas.mark_down(self.replicas.engines.index(self._read_bind))
+            # Replicas only serve sessions that have not written, so dropping the
+            # transaction on the broken connection loses nothing.
+            self.rollback()
+            self._read_bind = self.bind
+            return method(*args, **kwargs)
+
+    def execute(self, *args, **kwargs):
+        return self._with_replica_fallback(super().execute, *args, **kwargs)
+
+    def scalar(self, *args, **kwargs):
+        return self._with_replica_fallback(super().scalar, *args, **kwargs)
+
+    def scalars(self, *args, **kwargs):
+        return self._with_replica_fallback(super().scalars, *args, **kwargs)
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _assign_shard_ids(session, flush_context, instances):
+    if not session.shards:
+        return
+    for instance in session.new:
+        table = object_mapper(instance).local_table
+        column = table.autoincrement_column
+        if column is None or table.name in DIRECTORY_TABLES:
+            continue
+        if getattr(instance, column.key) is None:
+            setattr(instance, column.key, session.shards.ids.next(table))
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _remember_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _stick_to_primary(session):
+    if not session.info.pop("wrote", False):
+        return
+    user_id = session.info.get("user_id")
+    if user_id is not None:
+        sticky_writers.mark(user_id, session.sticky_seconds)
+    state = session.info.get("request_state")
+    if state is not None and session.replicas and session.sticky_seconds > 0:
+        state.primary_until = time.time() + session.sticky_seconds
+
+
+def dialect_insert(bind, table):
+    """``INSERT`` construct with ``ON CONFLICT`` support for the bind's dialect."""
+    if bind.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+class utcnow(FunctionElement):
+    """Current UTC time computed by the database, for server-side column defaults."""
+
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _utcnow_default(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utcnow, "postgresql")
+def _utcnow_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+@compiles(utcnow, "sqlite")
+def _utcnow_sqlite(element, compiler, **kw):
+    # Same text layout SQLAlchemy writes for DateTime values (microsecond digits).
+    return "STRFTIME('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+def get_engine(database_url: str = SQLALCHEMY_DATABASE_URL, **kwargs):
+    return create_engine(database_url, future=True, **kwargs)
+
+
+def get_replica_set(
+    urls: Sequence[str] = settings.DATABASE_REPLICA_URLS,
+) -> ReplicaSet:
+    return ReplicaSet(
+        [get_engine(url, pool_pre_ping=True) for url in urls],
+        retry_seconds=settings.REPLICA_RETRY_SECONDS,
+        health_interval=settings.REPLICA_HEALTH_INTERVAL_SECONDS,
+    )
+
+
+def get_shard_map(
+    directory: Engine, urls: Sequence[str] = settings.DATABASE_SHARD_URLS
+) -> ShardMap:
+    # Shard names are positional: append new shards, never reorder the list.
+    return ShardMap(
+        directory,
+        {f"shard{index}": get_engine(url, pool_pre_ping=True) for index, url in enumerate(urls)},
+        vnodes=settings.SHARD_VNODES,
+    )
+
+
+def get_sessionmaker(
+    engine, replicas: Optional[ReplicaSet] = None, shards: Optional[ShardMap] = None
+):
+    return sessionmaker(
+        bind=engine,
+        class_=RoutingSession,
+        autoflush=False,
+        autocommit=False,
+        future=True,
+        replicas=replicas,
+        sticky_seconds=settings.REPLICA_STICKY_SECONDS,
+        shards=shards,
+    )
+
+
+engine = get_engine()
+replica_set = get_replica_set()
+shard_map = get_shard_map(engine)
+SessionLocal = get_sessionmaker(engine, replica_set, shard_map)
 Base = declarative_base()
 
 
-def get_db():
+def get_db(connection: HTTPConnection):
     db = SessionLocal()
+    db.info["read_only"] = connection.scope.get("method") in READ_METHODS
+    sticky_cookie.attach(db, connection)
     try:
         yield db
     finally:
         db.close()
 
 
-def get_engine(database_url: str = SQLALCHEMY_DATABASE_URL):
-    return create_engine(database_url, future=True)
+def fan_out(db: Session, query: Callable[[Session], T]) -> List[T]:
+    """Run ``query`` once per shard, in parallel; just on ``db`` when not sharded.
+
+    The shard ``db`` already uses is queried through ``db`` itself, so it sees the
+    session's own uncommitted writes.
+    """
+    shards = getattr(db, "shards", None)
+    if not shards:
+        return [query(db)]
+
+    def run(name: str) -> T:
+        with shards.session(name, read_only=True) as shard_db:
+            return query(shard_db)
+
+    others = [name for name in shards.engines if name != db.shard]
+    with ThreadPoolExecutor(max_workers=max(len(others), 1)) as pool:
+        pending = {name: pool.submit(run, name) for name in others}
+        results = {} if db.shard is None else {db.shard: query(db)}
+        results.update((name, future.result()) for name, future in pending.items())
+    return [results[name] for name in shards.engines]
+
+
+def shard_sessions() -> List[Session]:
+    """A session per shard (one plain session when not sharded), for maintenance scripts."""
+    if not shard_map:
+        return [SessionLocal()]
+    return [shard_map.session(name) for name in shard_map.engines]
+
+
+def _rebuild_sqlite_table(connection, table) -> None:
+    legacy = f"{table.name}_legacy"
+    columns = ", ".join(
+        column["name"]
+        for column in inspect(connection).get_columns(table.name)
+        if column["name"] in table.c
+    )
+    # Keep other tables' foreign keys pointing at the name, not the renamed copy.
+    connection.exec_driver_sql("PRAGMA legacy_alter_table = ON")
+    connection.exec_driver_sql(f"ALTER TABLE {table.name} RENAME TO {legacy}")
+    connection.exec_driver_sql("PRAGMA legacy_alter_table = OFF")
+    for index in table.indexes:
+        connection.exec_driver_sql(f"DROP INDEX IF EXISTS {index.name}")
+    table.create(connection)
+    connection.exec_driver_sql(
+        f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {legacy}"
+    )
+    connection.exec_driver_sql(f"DROP TABLE {legacy}")
 
 
-def get_sessionmaker(engine):
-    return sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+def ensure_server_defaults(connection) -> None:
+    """Give tables created before a column had a server default that default."""
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {
+            column["name"]: column["default"] for column in inspector.get_columns(table.name)
+        }
+        missing = [
+            column
+            for column in table.columns
+            if column.server_default is not None
+            and column.name in existing
+            and existing[column.name] is None
+        ]
+        if not missing:
+            continue
+        if connection.dialect.name == "sqlite":
+            _rebuild_sqlite_table(connection, table)
+            continue
+        for column in missing:
+            default = column.server_default.arg.compile(dialect=connection.dialect)
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table.name} ALTER COLUMN {column.name} SET DEFAULT {default}"
+            )
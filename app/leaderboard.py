@@ -0,0 +1,229 @@
+from collections import Counter
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from .archive import archived_rows
+from .core.changes import Change, on_flush
+from .database import dialect_insert, fan_out, shard_sessions
+from .models import Match, PlayerScore, PlayerScoreBucket, ScoreBucket, User
+
+# Scores are bounded by MatchBase (0-10), so every histogram has 11 buckets and
+# rank/percentile lookups cost O(buckets) no matter how many matches exist.
+MAX_SCORE = 10
+ScoreKey = Tuple[int, str, str, int]  # (user_id, map, agent, score)
+BUCKET_COLUMNS = ("scope", "map", "agent", "score")
+PLAYER_BUCKET_COLUMNS = ("user_id", "map", "agent", "score")
+
+
+def _bump(connection, table, counts: Dict[tuple, int], columns: Tuple[str, ...]) -> None:
+    # Sorted, so concurrent transactions lock shared bucket rows in the same order.
+    rows = [dict(zip(columns, key), count=delta) for key, delta in sorted(counts.items()) if delta]
+    if not rows:
+        return
+    stmt = dialect_insert(connection, table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[column.name for column in table.primary_key],
+        set_={"count": table.c.count + stmt.excluded.count},
+    )
+    connection.execute(stmt)
+
+
+def _refresh_player(
+    connection, user_id: int, map_name: str, agent: str, best_deltas: Counter
+) -> None:
+    players = PlayerScore.__table__
+    buckets = PlayerScoreBucket.__table__
+    key = (
+        (players.c.user_id == user_id)
+        & (players.c.map == map_name)
+        & (players.c.agent == agent)
+    )
+    # Upsert the player row before reading anything: on Postgres the row lock
+    # makes a concurrent write for the same player wait until this transaction
+    # commits, and its reads (fresh per statement under READ COMMITTED) then see
+    # these buckets. A row created here as a placeholder has ``matches = 0``.
+    lock = dialect_insert(connection, players).values(
+        user_id=user_id, map=map_name, agent=agent, best=0, total=0, matches=0
+    )
+    old = connection.execute(
+        lock.on_conflict_do_update(
+            index_elements=[players.c.user_id, players.c.map, players.c.agent],
+            set_={"matches": players.c.matches},
+        ).returning(players.c.best, players.c.matches)
+    ).one()
+    old_best = old.best if old.matches else None
+    scores = connection.execute(
+        select(buckets.c.score, buckets.c.count).where(
+            (buckets.c.user_id == user_id)
+            & (buckets.c.map == map_name)
+            & (buckets.c.agent == agent)
+            & (buckets.c.count > 0)
+        )
+    ).all()
+
+    if old_best is not None:
+        best_deltas[("best", map_name, agent, old_best)] -= 1
+    if not scores:
+        connection.execute(delete(players).where(key))
+        return
+
+    values = {
+        "best": max(score for score, _ in scores),
+        "total": sum(score * count for score, count in scores),
+        "matches": sum(count for _, count in scores),
+    }
+    best_deltas[("best", map_name, agent, values["best"])] += 1
+    connection.execute(update(players).where(key).values(**values))
+
+
+def apply_score_deltas(connection, deltas: Dict[ScoreKey, int]) -> None:
+    """Add (or with negative counts, remove) match scores from every ranking structure."""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    _bump(connection, PlayerScoreBucket.__table__, deltas, PLAYER_BUCKET_COLUMNS)
+
+    # The shared "match" and "best" histograms, bumped in one statement at the end
+    # so every writer holds their rows for as short a time as possible.
+    bucket_deltas: Counter = Counter()
+    for (_, map_name, agent, score), delta in deltas.items():
+        bucket_deltas[("match", map_name, agent, score)] += delta
+    # Sorted, so transactions touching several players lock them in the same order.
+    for user_id, map_name, agent in sorted({key[:3] for key in deltas}):
+        _refresh_player(connection, user_id, map_name, agent, bucket_deltas)
+    _bump(connection, ScoreBucket.__table__, bucket_deltas, BUCKET_COLUMNS)
+
+
+def score_deltas(changes: List[Change]) -> Counter:
+    deltas: Counter = Counter()
+    for change in changes:
+        if change.entity != Match.__tablename__:
+            continue
+        if change.op in ("update", "delete"):
+            old = {**change.values, **change.previous}
+            deltas[(change.user_id, old["map"], old["agent"], old["score"])] -= 1
+        if change.op in ("create", "update"):
+            new = change.values
+            deltas[(change.user_id, new["map"], new["agent"], new["score"])] += 1
+    return deltas
+
+
+@on_flush
+def maintain_leaderboards(session: Session, changes: List[Change]) -> None:
+    deltas = score_deltas(changes)
+    if any(deltas.values()):
+        apply_score_deltas(session.connection(), deltas)
+
+
+def histogram(db: Session, scope: str, map_name: str, agent: str) -> List[int]:
+    counts = [0] * (MAX_SCORE + 1)
+    query = select(ScoreBucket.score, ScoreBucket.count).where(
+        ScoreBucket.scope == scope,
+        ScoreBucket.map == map_name,
+        ScoreBucket.agent == agent,
+    )
+    # Each shard's buckets count its own players; the ranking is their sum.
+    for rows in fan_out(db, lambda shard_db: shard_db.execute(query).all()):
+        for score, count in rows:
+            counts[score] += count
+    return counts
+
+
+def _percentile(counts: List[int], value: float) -> float:
+    total = sum(counts)
+    if not total:
+        return 0.0
+    below = sum(count for score, count in enumerate(counts) if score < value)
+    equal = sum(count for score, count in enumerate(counts) if score == value)
+    return round(100.0 * (below + 0.5 * equal) / total, 2)
+
+
+def _ranks(best_counts: List[int]) -> List[int]:
+    """``ranks[score]`` is 1 + the number of players whose best beats ``score``."""
+    ranks = [1] * (MAX_SCORE + 1)
+    higher = 0
+    for score in range(MAX_SCORE, -1, -1):
+        ranks[score] = higher + 1
+        higher += best_counts[score]
+    return ranks
+
+
+def top_players(db: Session, map_name: str, agent: str, limit: int) -> dict:
+    best_counts = histogram(db, "best", map_name, agent)
+    ranks = _ranks(best_counts)
+    query = (
+        select(PlayerScore, User.username)
+        .join(User, User.id == PlayerScore.user_id)
+        .where(PlayerScore.map == map_name, PlayerScore.agent == agent)
+        .order_by(PlayerScore.best.desc(), PlayerScore.matches.desc(), PlayerScore.user_id)
+        .limit(limit)
+    )
+    # The global top ``limit`` is among the shards' own top ``limit`` rows.
+    rows = sorted(
+        chain.from_iterable(fan_out(db, lambda shard_db: shard_db.execute(query).all())),
+        key=lambda row: (-row[0].best, -row[0].matches, row[0].user_id),
+    )[:limit]
+    return {
+        "map": map_name,
+        "agent": agent,
+        "players": sum(best_counts),
+        "entries": [
+            {
+                "rank": ranks[player.best],
+                "user_id": player.user_id,
+                "username": username,
+                "best": player.best,
+                "average": round(player.total / player.matches, 2),
+                "matches": player.matches,
+            }
+            for player, username in rows
+        ],
+    }
+
+
+def standing(db: Session, user_id: int, map_name: str, agent: str) -> Optional[dict]:
+    player = db.get(PlayerScore, (user_id, map_name, agent))
+    if player is None:
+        return None
+    best_counts = histogram(db, "best", map_name, agent)
+    average = player.total / player.matches
+    return {
+        "map": map_name,
+        "agent": agent,
+        "best": player.best,
+        "average": round(average, 2),
+        "matches": player.matches,
+        "rank": _ranks(best_counts)[player.best],
+        "players": sum(best_counts),
+        "percentile": _percentile(best_counts, player.best),
+        "match_percentile": _percentile(histogram(db, "match", map_name, agent), average),
+    }
+
+
+def rebuild(db: Session) -> None:
+    """Recompute every leaderboard table from ``matches`` and the archive (backfill or repair)."""
+    for model in (ScoreBucket, PlayerScoreBucket, PlayerScore):
+        db.execute(delete(model))
+    rows = db.execute(
+        select(Match.user_id, Match.map, Match.agent, Match.score, func.count())
+        .group_by(Match.user_id, Match.map, Match.agent, Match.score)
+    )
+    counts = Counter({tuple(row[:4]): row[4] for row in rows})
+    # Archived scores keep counting, as they do when a month is archived. The
+    # database's own ``users`` rows: on a shard, the users it holds.
+    connection = db.connection()
+    for user_id in connection.execute(select(User.id)).scalars().all():
+        for row in archived_rows(db, Match, user_id):
+            counts[(user_id, row["map"], row["agent"], row["score"])] += 1
+    apply_score_deltas(connection, counts)
+    db.commit()
+
+
+if __name__ == "__main__":
+    for session in shard_sessions():  # pragma: no cover
+        with session:
+            rebuild(session)
@@ -1,29 +1,62 @@
 from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import Literal
 
 from fastapi import Depends, FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from sqlalchemy.orm import Session
 
+from .archive import maintain_partitions
 from .auth import get_current_user_for_templates
 from .core.config import get_settings
-from .database import Base, engine
-from .routes.matches import router as matches_router
-from .routes.sessions import router as sessions_router
-from .routes.strategies import router as strategies_router
+from .core.memory import MemoryMiddleware
+from .core.profiler import ProfilerMiddleware, profiler
+from .database import (
+    Base,
+    ShardMovingError,
+    StickyCookieMiddleware,
+    engine,
+    ensure_server_defaults,
+    get_db,
+    shard_map,
+)
+from .rendering import stream_template
+from .routes.admin import router as admin_router
+from .routes.analytics import router as analytics_router
+from .routes.batch import router as batch_router
+from .routes.events import hub as events_hub
+from .routes.events import router as events_router
+from .routes.leaderboards import router as leaderboards_router
+from .routes.matches import query_matches, router as matches_router
+from .routes.sessions import query_sessions, router as sessions_router
+from .routes.strategies import query_strategies, router as strategies_router
+from .routes.sync import router as sync_router
 from .routes.users import router as users_router
 from .routes.valorant_dashboard import router as valorant_dashboard_router
+from .sharding import init_shards
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        ensure_server_defaults(connection)
+    maintain_partitions(engine)
+    if shard_map:
+        init_shards(shard_map)
+    await events_hub.start()
     yield
+    profiler.stop()
+    await events_hub.stop()
 
 
 settings = get_settings()
 app = FastAPI(title="Valorant Coach", lifespan=lifespan)
+app.add_middleware(ProfilerMiddleware)
+app.add_middleware(MemoryMiddleware)
+app.add_middleware(StickyCookieMiddleware)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
@@ -32,6 +65,19 @@ app.include_router(matches_router)
 app.include_router(strategies_router)
 app.include_router(valorant_dashboard_router)
 app.include_router(sessions_router)
+app.include_router(events_router)
+app.include_router(leaderboards_router)
+app.include_router(batch_router)
+app.include_router(sync_router)
+app.include_router(analytics_router)
+app.include_router(admin_router)
+
+
+@app.exception_handler(ShardMovingError)
+async def shard_moving(request: Request, exc: ShardMovingError) -> JSONResponse:
+    return JSONResponse(
+        status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"}
+    )
 
 
 @app.get("/", response_class=HTMLResponse, name="home")
@@ -52,9 +98,26 @@ def register(request: Request):
 @app.get("/dashboard/app", response_class=HTMLResponse, name="dashboard_view")
 def dashboard_view(
     request: Request,
+    render: Literal["server", "client"] = "server",
+    db: Session = Depends(get_db),
     current_user=Depends(get_current_user_for_templates),
 ):
-    return templates.TemplateResponse("dashboard.html", {"request": request})
+    """The dashboard, streamed with its data (``render=client`` sends the bare shell)."""
+    if render == "client":
+        return templates.TemplateResponse("dashboard.html", {"request": request})
+    user_id = current_user.id
+    return stream_template(
+        templates,
+        "dashboard.html",
+        {
+            "request": request,
+            "server_rendered": True,
+            "current_user": current_user,
+            "load_matches": lambda: query_matches(db, user_id),
+            "load_strategies": lambda: query_strategies(db, user_id),
+            "load_sessions": lambda: query_sessions(db, user_id),
+        },
+    )
 
 
 @app.get("/health")
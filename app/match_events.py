@@ -0,0 +1,226 @@
+"""Round-by-round match events (kills, economy, plants...) for VOD review.
+
+Wire format: ``MAGIC`` followed by packed little-endian ``RECORD`` structs, one per
+event, 12 bytes each. Timelines stream back in the same format, or as NDJSON with
+one columnar object per round.
+
+Storage: one ``match_rounds`` row per round whose ``events`` blob is the round's
+events sorted by time, stored column by column (time as deltas) and zlib
+compressed. Rows are written with ``COPY`` on Postgres and ``executemany``
+elsewhere; re-sending a round replaces it, so retries are safe.
+"""
+
+import io
+import json
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import zlib
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from .archive import archived_rows
+from .core.changes import Change, on_flush
+from .models import Match, MatchRound
+
+MAGIC = b"VEV1"
+MEDIA_TYPE = "application/vnd.valorant.events"
+RECORD = np.dtype(
+    [
+        ("round", "u1"),
+        ("time_ms", "<u4"),
+        ("kind", "u1"),
+        ("actor", "u1"),
+        ("target", "u1"),
+        ("value", "<i4"),
+    ]
+)
+# (field, dtype) in chunk order; "round" is the row key and not stored per event.
+CHUNK_FIELDS = [(name, RECORD.fields[name][0]) for name in RECORD.names if name != "round"]
+NO_PLAYER = 255
+EVENT_KINDS = (
+    "round_start",
+    "round_end",
+    "kill",
+    "assist",
+    "damage",
+    "plant",
+    "defuse",
+    "purchase",
+    "economy",
+    "ability",
+)
+COMPRESSION_LEVEL = 1
+
+
+class EventFormatError(ValueError):
+    pass
+
+
+class EventLimitError(EventFormatError):
+    pass
+
+
+def max_payload_bytes(max_events: int) -> int:
+    return len(MAGIC) + max_events * RECORD.itemsize
+
+
+def decode_events(payload: bytes, max_rounds: Optional[int] = None) -> np.ndarray:
+    if not payload.startswith(MAGIC):
+        raise EventFormatError("Payload must start with the VEV1 header")
+    body = memoryview(payload)[len(MAGIC):]
+    if len(body) % RECORD.itemsize:
+        raise EventFormatError(f"Payload is not a whole number of {RECORD.itemsize}-byte events")
+    events = np.frombuffer(body, dtype=RECORD)
+    if len(events) and events["kind"].max() >= len(EVENT_KINDS):
+        raise EventFormatError("Unknown event kind")
+    if max_rounds is not None and len(np.unique(events["round"])) > max_rounds:
+        raise EventLimitError(f"At most {max_rounds} rounds per upload")
+    return events
+
+
+def encode_events(events: np.ndarray) -> bytes:
+    return MAGIC + np.ascontiguousarray(events, dtype=RECORD).tobytes()
+
+
+def encode_round(events: np.ndarray) -> bytes:
+    """Compress one round's events, which must already be sorted by time."""
+    columns = {name: events[name] for name, _ in CHUNK_FIELDS}
+    columns["time_ms"] = np.diff(events["time_ms"], prepend=np.uint32(0))
+    raw = b"".join(
+        np.ascontiguousarray(columns[name], dtype=dtype).tobytes() for name, dtype in CHUNK_FIELDS
+    )
+    return zlib.compress(raw, COMPRESSION_LEVEL)
+
+
+def decode_round(round_number: int, count: int, blob: bytes) -> np.ndarray:
+    raw = zlib.decompress(blob)
+    events = np.empty(count, dtype=RECORD)
+    events["round"] = round_number
+    offset = 0
+    for name, dtype in CHUNK_FIELDS:
+        size = count * dtype.itemsize
+        events[name] = np.frombuffer(raw, dtype=dtype, count=count, offset=offset)
+        offset += size
+    events["time_ms"] = np.cumsum(events["time_ms"], dtype=np.uint32)
+    return events
+
+
+def split_rounds(events: np.ndarray) -> Iterator[Tuple[int, np.ndarray]]:
+    ordered = events[np.lexsort((events["time_ms"], events["round"]))]
+    starts = np.flatnonzero(np.diff(ordered["round"])) + 1
+    for chunk in np.split(ordered, starts):
+        if len(chunk):
+            yield int(chunk["round"][0]), chunk
+
+
+def _copy_rows(connection, rows: List[dict]) -> None:
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(
+            f"{row['match_id']}\t{row['user_id']}\t{row['round_number']}\t{row['event_count']}\t"
+            f"{row['duration_ms']}\t\\\\x{row['events'].hex()}\n"
+        )
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            "COPY match_rounds (match_id, user_id, round_number, event_count, duration_ms, events) "
+            "FROM STDIN",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def write_rounds(connection, rows: List[dict]) -> None:
+    if not rows:
+        return
+    if connection.dialect.name == "postgresql":
+        _copy_rows(connection, rows)
+    else:
+        connection.execute(insert(MatchRound.__table__), rows)
+
+
+def ingest_events(db: Session, user_id: int, match_id: int, events: np.ndarray) -> Dict[str, int]:
+    """Store ``events`` for ``user_id``'s ``match_id``, replacing any rounds they cover."""
+    rows = [
+        {
+            "match_id": match_id,
+            "user_id": user_id,
+            "round_number": round_number,
+            "event_count": len(chunk),
+            "duration_ms": int(chunk["time_ms"][-1]),
+            "events": encode_round(chunk),
+        }
+        for round_number, chunk in split_rounds(events)
+    ]
+    connection = db.connection()
+    table = MatchRound.__table__
+    connection.execute(
+        delete(table).where(
+            table.c.match_id == match_id,
+            table.c.round_number.in_([row["round_number"] for row in rows]),
+        )
+    )
+    write_rounds(connection, rows)
+    return {"rounds": len(rows), "events": len(events)}
+
+
+def owned_match(db: Session, user_id: int, match_id: int) -> bool:
+    found = db.execute(
+        select(Match.id).where(Match.id == match_id, Match.user_id == user_id)
+    ).first()
+    if found is not None:
+        return True
+    # Archived matches keep their rounds here.
+    return any(row["id"] == match_id for row in archived_rows(db, Match, user_id))
+
+
+def iter_rounds(db: Session, match_id: int) -> Iterator[np.ndarray]:
+    rows = db.execute(
+        select(MatchRound.round_number, MatchRound.event_count, MatchRound.events)
+        .where(MatchRound.match_id == match_id)
+        .order_by(MatchRound.round_number)
+        .execution_options(yield_per=16)
+    )
+    for round_number, count, blob in rows:
+        yield decode_round(round_number, count, blob)
+
+
+def _players(values: np.ndarray) -> list:
+    return [None if value == NO_PLAYER else value for value in values.tolist()]
+
+
+def round_json(events: np.ndarray) -> str:
+    return json.dumps(
+        {
+            "round": int(events["round"][0]),
+            "time_ms": events["time_ms"].tolist(),
+            "kind": [EVENT_KINDS[kind] for kind in events["kind"].tolist()],
+            "actor": _players(events["actor"]),
+            "target": _players(events["target"]),
+            "value": events["value"].tolist(),
+        },
+        separators=(",", ":"),
+    )
+
+
+def stream_timeline(db: Session, match_id: int, binary: bool) -> Iterator[bytes]:
+    if binary:
+        yield MAGIC
+    for events in iter_rounds(db, match_id):
+        yield events.tobytes() if binary else (round_json(events) + "\n").encode()
+
+
+@on_flush
+def drop_deleted_rounds(session: Session, changes: Sequence[Change]) -> None:
+    deleted = [
+        change.id
+        for change in changes
+        if change.entity == Match.__tablename__ and change.op == "delete"
+    ]
+    if deleted:
+        session.connection().execute(
+            delete(MatchRound.__table__).where(MatchRound.match_id.in_(deleted))
+        )
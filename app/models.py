@@ -1,8 +1,19 @@
-from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 
-from .database import Base
+from .database import Base, utcnow
 
 
 class User(Base):
@@ -13,12 +24,39 @@ class User(Base):
     email = Column(String(128), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
 
     matches = relationship("Match", back_populates="user", cascade="all, delete-orphan")
     strategies = relationship("Strategy", back_populates="user", cascade="all, delete-orphan")
     sessions = relationship("Session", back_populates="user", cascade="all, delete-orphan")
 
+    # Server defaults come back in the INSERT's RETURNING clause, not a later SELECT.
+    __mapper_args__ = {"eager_defaults": True}
+
+
+class UserShard(Base):
+    """Directory entry for the shard holding a user's rows (see ``app.sharding``).
+
+    ``moving`` freezes the user's writes while a move copies their rows;
+    ``previous`` is the shard still to be emptied after one.
+    """
+
+    __tablename__ = "user_shards"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    shard = Column(String(32), nullable=False)
+    moving = Column(Boolean, nullable=False, default=False)
+    previous = Column(String(32), nullable=True)
+
+
+class IdBlock(Base):
+    """Next unleased id of a sharded table (see ``IdBlocks``)."""
+
+    __tablename__ = "id_blocks"
+
+    name = Column(String(64), primary_key=True)
+    next_id = Column(Integer, nullable=False)
+
 
 class Match(Base):
     __tablename__ = "matches"
@@ -28,12 +66,20 @@ class Match(Base):
     agent = Column(String(50), nullable=False)
     score = Column(Integer, nullable=False)
     notes = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
 
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     user = relationship("User", back_populates="matches")
 
+    __mapper_args__ = {"eager_defaults": True}
+
+    __table_args__ = (
+        Index("ix_matches_user_map_agent", "user_id", "map", "agent"),
+        Index("ix_matches_user_created", "user_id", "created_at"),
+        Index("ix_matches_created_at", "created_at"),
+    )
+
 
 class Strategy(Base):
     __tablename__ = "strategies"
@@ -41,12 +87,14 @@ class Strategy(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(128), nullable=False)
     description = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
 
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     user = relationship("User", back_populates="strategies")
 
+    __mapper_args__ = {"eager_defaults": True}
+
 
 class Session(Base):
     __tablename__ = "sessions"
@@ -56,8 +104,117 @@ class Session(Base):
     focus_area = Column(String(128), nullable=False)
     duration_minutes = Column(Integer, nullable=False)
     notes = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
 
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     user = relationship("User", back_populates="sessions")
+
+    __mapper_args__ = {"eager_defaults": True}
+
+    __table_args__ = (
+        Index("ix_sessions_user_created", "user_id", "created_at"),
+        Index("ix_sessions_created_at", "created_at"),
+    )
+
+
+class ScoreBucket(Base):
+    """Histogram of scores per map and agent.
+
+    ``scope`` is ``"match"`` for every logged match and ``"best"`` for each
+    player's best score, so ranks and percentiles never touch ``matches``.
+    """
+
+    __tablename__ = "leaderboard_buckets"
+
+    scope = Column(String(8), primary_key=True)
+    map = Column(String(100), primary_key=True)
+    agent = Column(String(50), primary_key=True)
+    score = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class PlayerScoreBucket(Base):
+    __tablename__ = "leaderboard_player_buckets"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    map = Column(String(100), primary_key=True)
+    agent = Column(String(50), primary_key=True)
+    score = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class PlayerScore(Base):
+    __tablename__ = "leaderboard_players"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    map = Column(String(100), primary_key=True)
+    agent = Column(String(50), primary_key=True)
+    best = Column(Integer, nullable=False)
+    total = Column(Integer, nullable=False)
+    matches = Column(Integer, nullable=False)
+
+    user = relationship("User")
+
+    __table_args__ = (Index("ix_leaderboard_players_rank", "map", "agent", "best"),)
+
+
+class ArchivedPartition(Base):
+    """Catalog of monthly partitions moved out of the hot tables into archive files."""
+
+    __tablename__ = "archived_partitions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    table_name = Column(String(64), nullable=False)
+    month = Column(Date, nullable=False)
+    path = Column(String(255), nullable=False)
+    row_count = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, server_default=utcnow())
+
+    __table_args__ = (UniqueConstraint("table_name", "month", name="uq_archived_partitions_month"),)
+
+
+class SyncVersion(Base):
+    """Per-user change counter behind the ``/sync`` feed."""
+
+    __tablename__ = "sync_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class SyncChange(Base):
+    """Latest change to each synced row; ``deleted`` rows are tombstones.
+
+    The log is compacted: a row written many times keeps only its newest version,
+    so a resync reads each changed row once.
+    """
+
+    __tablename__ = "sync_log"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    entity = Column(String(32), primary_key=True)
+    entity_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    deleted = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (Index("ix_sync_log_user_version", "user_id", "version"),)
+
+
+class MatchRound(Base):
+    """Events of one round of a match as a compressed columnar chunk (see ``app.match_events``).
+
+    ``match_id`` has no foreign key because a partitioned ``matches`` table cannot
+    be referenced by ``id`` alone; rounds of deleted matches are removed on flush
+    (archived matches keep theirs), and ``user_id`` cascades deletes of the owner
+    like every user table.
+    """
+
+    __tablename__ = "match_rounds"
+
+    match_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    round_number = Column(Integer, primary_key=True)
+    event_count = Column(Integer, nullable=False)
+    duration_ms = Column(Integer, nullable=False)
+    events = Column(LargeBinary, nullable=False)
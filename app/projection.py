@@ -0,0 +1,53 @@
+"""Sparse fieldsets (``?fields=id,map,score``) for list endpoints.
+
+A projection is resolved against the response schema, then only those columns are
+selected, so unrequested text columns never leave the database. Routes keep the
+full schema as their ``response_model`` and return projections as they are.
+"""
+
+from typing import Iterable, List, Optional, Sequence, Type
+
+from fastapi import HTTPException, Query, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+FIELDS_QUERY = Query(
+    None,
+    description=(
+        "Comma-separated list of fields to return, e.g. `id,map,agent,score,created_at`; "
+        "each item then holds only these fields"
+    ),
+)
+
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[List[str]]:
+    """Validate a ``fields=`` value against ``schema``; ``None`` means every field."""
+    if fields is None:
+        return None
+    requested = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in schema.model_fields]
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields requested",
+        )
+    return requested
+
+
+def select_fields(
+    db: Session, model, fields: Sequence[str], *criteria, order_by: Iterable = ()
+) -> List[dict]:
+    columns = [getattr(model, name) for name in fields]
+    rows = db.execute(select(*columns).where(*criteria).order_by(*order_by)).mappings()
+    return [dict(row) for row in rows]
+
+
+def project(rows: Iterable[dict], fields: Sequence[str]) -> List[dict]:
+    return [{name: row[name] for name in fields} for row in rows]
+
+
+def fields_response(rows: List[dict], fields: Optional[Sequence[str]]):
+    """Full rows go through the route's ``response_model``; projections skip it."""
+    return rows if fields is None else JSONResponse(rows)
@@ -0,0 +1,290 @@
+"""Strategy recommendations from per-user TF-IDF vectors.
+
+Each strategy's title and description are tokenized once into hashed term counts.
+A changed strategy only replaces its own row and term frequencies (see
+``StrategyIndex``), so a query is one vectorised pass over the non-zeros.
+An index notices changes through the user's ``/sync`` version and re-reads only
+the strategies logged since, which also keeps several workers consistent.
+"""
+
+from collections import OrderedDict
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+import zlib
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .core.config import get_settings
+from .models import Match, Strategy
+from .sync import changed_rows, latest_version
+
+FEATURES = 1 << 18
+TITLE_WEIGHT = 2.0
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or the then this to with".split()
+)
+
+Vector = Tuple[np.ndarray, np.ndarray]  # (sorted feature ids, weights)
+
+
+def _term_counts(text: Optional[str], weight: float, counts: Dict[int, float]) -> None:
+    for token in TOKEN_PATTERN.findall((text or "").lower()):
+        if token not in STOPWORDS:
+            feature = zlib.crc32(token.encode()) % FEATURES
+            counts[feature] = counts.get(feature, 0.0) + weight
+
+
+def vectorize(*texts: Optional[str], title: Optional[str] = None) -> Vector:
+    counts: Dict[int, float] = {}
+    _term_counts(title, TITLE_WEIGHT, counts)
+    for text in texts:
+        _term_counts(text, 1.0, counts)
+    features = np.fromiter(sorted(counts), dtype=np.int32, count=len(counts))
+    return features, np.array([counts[int(f)] for f in features], dtype=np.float32)
+
+
+class StrategyIndex:
+    """TF-IDF rows of one user's strategies in flat arrays, one slot per strategy.
+
+    A change appends the strategy's new row, frees its old slot and adjusts the
+    document frequencies of its terms; before the next query only the weights are
+    recomputed, since the idf of every term moves with the number of strategies.
+    Freed slots are compacted away once they hold half the entries.
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.terms: Dict[int, Vector] = {}
+        self.df: Dict[int, int] = {}
+        self.lock = threading.RLock()
+        self._clear_rows()
+
+    def _clear_rows(self) -> None:
+        self._slots: Dict[int, int] = {}
+        self._pending: Dict[int, None] = {}
+        self._ids = np.empty(0, dtype=np.int64)  # strategy per slot, -1 once freed
+        self._row_of = np.empty(0, dtype=np.int64)
+        self._features = np.empty(0, dtype=np.int32)
+        self._tf = np.empty(0, dtype=np.float32)
+        self._freed = 0
+        self._matrix: Optional[tuple] = None
+
+    def clear(self) -> None:
+        self.terms.clear()
+        self.df.clear()
+        self._clear_rows()
+
+    def upsert(self, strategy_id: int, title: str, description: Optional[str]) -> None:
+        self.remove(strategy_id)
+        vector = self.terms[strategy_id] = vectorize(description, title=title)
+        for feature in vector[0].tolist():
+            self.df[feature] = self.df.get(feature, 0) + 1
+        self._pending[strategy_id] = None
+        self._matrix = None
+
+    def remove(self, strategy_id: int) -> None:
+        vector = self.terms.pop(strategy_id, None)
+        if vector is None:
+            return
+        for feature in vector[0].tolist():
+            count = self.df.pop(feature) - 1
+            if count:
+                self.df[feature] = count
+        if strategy_id in self._pending:
+            del self._pending[strategy_id]
+        else:
+            self._ids[self._slots.pop(strategy_id)] = -1
+            self._freed += len(vector[0])
+        self._matrix = None
+
+    def _append_pending(self) -> None:
+        if self._freed * 2 > len(self._features):
+            pending = {**dict.fromkeys(self._slots), **self._pending}
+            self._clear_rows()
+            self._pending = pending
+        added, self._pending = list(self._pending), {}
+        if not added:
+            return
+        rows = [self.terms[strategy_id] for strategy_id in added]
+        lengths = np.array([len(features) for features, _ in rows], dtype=np.int64)
+        start = len(self._ids)
+        self._slots.update(zip(added, range(start, start + len(added))))
+        self._ids = np.concatenate([self._ids, np.array(added, dtype=np.int64)])
+        self._row_of = np.concatenate(
+            [self._row_of, np.repeat(np.arange(start, start + len(added)), lengths)]
+        )
+        self._features = np.concatenate([self._features, *(features for features, _ in rows)])
+        self._tf = np.concatenate([self._tf, *(1 + np.log(counts) for _, counts in rows)])
+
+    def _weigh_rows(self) -> tuple:
+        vocabulary = np.fromiter(sorted(self.df), dtype=np.int32, count=len(self.df))
+        df = np.fromiter(
+            (self.df[feature] for feature in vocabulary.tolist()),
+            dtype=np.float32,
+            count=len(vocabulary),
+        )
+        idf = (np.log((1 + len(self.terms)) / (1 + df)) + 1).astype(np.float32)
+        weights = np.zeros(len(self._features), dtype=np.float32)
+        if len(vocabulary):
+            # Entries of freed slots may hold terms no longer in the vocabulary.
+            position = np.searchsorted(vocabulary, self._features).clip(max=len(vocabulary) - 1)
+            alive = self._ids[self._row_of] >= 0
+            weights = np.where(alive, self._tf * idf[position], 0).astype(np.float32)
+        norms = np.sqrt(np.bincount(self._row_of, weights=weights**2, minlength=len(self._ids)))
+        weights /= np.where(norms > 0, norms, 1)[self._row_of]
+        return self._ids, self._row_of, self._features, weights, vocabulary, idf
+
+    @property
+    def matrix(self) -> tuple:
+        if self._matrix is None:
+            self._append_pending()
+            self._matrix = self._weigh_rows()
+        return self._matrix
+
+    def _weigh(self, vector: Vector) -> Vector:
+        """TF-IDF weights for an ad-hoc query against this index's vocabulary."""
+        _, _, _, _, vocabulary, idf = self.matrix
+        features, counts = vector
+        if not len(vocabulary):
+            return features[:0], counts[:0]
+        position = np.searchsorted(vocabulary, features).clip(max=len(vocabulary) - 1)
+        known = vocabulary[position] == features
+        features, weights = features[known], (1 + np.log(counts[known])) * idf[position[known]]
+        norm = np.sqrt((weights**2).sum())
+        return features, weights / norm if norm else weights
+
+    def _scores(self, vector: Vector) -> np.ndarray:
+        ids, row_of, features, weights, _, _ = self.matrix
+        query_features, query_weights = vector
+        if not len(query_features) or not len(features):
+            return np.zeros(len(ids), dtype=np.float32)
+        position = np.searchsorted(query_features, features).clip(max=len(query_features) - 1)
+        contribution = np.where(
+            query_features[position] == features, weights * query_weights[position], 0
+        )
+        return np.bincount(row_of, weights=contribution, minlength=len(ids))
+
+    def _top(self, scores: np.ndarray, limit: int, exclude: Optional[int] = None):
+        ids = self.matrix[0]
+        if exclude is not None:
+            scores = np.where(ids == exclude, 0, scores)
+        limit = min(limit, int((scores > 0).sum()))
+        if limit <= 0:
+            return []
+        best = np.argpartition(-scores, limit - 1)[:limit]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(ids[i]), round(float(scores[i]), 4)) for i in best]
+
+    def similar(self, strategy_id: int, limit: int) -> Optional[List[Tuple[int, float]]]:
+        with self.lock:
+            if strategy_id not in self.terms:
+                return None
+            _, row_of, features, weights, _, _ = self.matrix
+            row = row_of == self._slots[strategy_id]
+            return self._top(self._scores((features[row], weights[row])), limit, strategy_id)
+
+    def search(self, text: str, limit: int) -> List[Tuple[int, float]]:
+        with self.lock:
+            return self._top(self._scores(self._weigh(vectorize(text))), limit)
+
+
+class IndexCache:
+    """Most recently used per-user indexes, refreshed from the sync log on access."""
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._indexes: "OrderedDict[int, StrategyIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+    def _load(self, db: Session, index: StrategyIndex, user_id: int, ids=None) -> None:
+        query = select(Strategy.id, Strategy.title, Strategy.description).where(
+            Strategy.user_id == user_id
+        )
+        if ids is not None:
+            query = query.where(Strategy.id.in_(ids))
+        for strategy_id, title, description in db.execute(query):
+            index.upsert(strategy_id, title, description)
+
+    def _refresh(self, db: Session, index: StrategyIndex, user_id: int, version: int) -> None:
+        if index.version is None or index.version > version:
+            # New index, or the counter went backwards (data was reset): start over.
+            index.clear()
+            self._load(db, index, user_id)
+        elif index.version < version:
+            changed = changed_rows(db, user_id, Strategy.__tablename__, index.version)
+            for strategy_id, _ in changed:
+                index.remove(strategy_id)
+            self._load(db, index, user_id, [sid for sid, deleted in changed if not deleted])
+        index.version = version
+
+    def get(self, db: Session, user_id: int) -> StrategyIndex:
+        version = latest_version(db, user_id)
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                index = self._indexes[user_id] = StrategyIndex()
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        with index.lock:
+            if index.version != version:
+                self._refresh(db, index, user_id, version)
+        return index
+
+
+indexes = IndexCache(get_settings().RECOMMENDATION_CACHE_USERS)
+
+
+def worst_map(db: Session, user_id: int) -> Optional[str]:
+    """The map with the lowest average score across the user's matches."""
+    return db.execute(
+        select(Match.map)
+        .where(Match.user_id == user_id)
+        .group_by(Match.map)
+        .order_by(func.avg(Match.score), Match.map)
+        .limit(1)
+    ).scalar()
+
+
+def _with_strategies(db: Session, user_id: int, ranked: List[Tuple[int, float]]) -> List[dict]:
+    strategies = {
+        strategy.id: strategy
+        for strategy in db.query(Strategy).filter(
+            Strategy.user_id == user_id, Strategy.id.in_([sid for sid, _ in ranked])
+        )
+    }
+    return [
+        {"strategy": strategies[sid], "similarity": score}
+        for sid, score in ranked
+        if sid in strategies
+    ]
+
+
+def similar_strategies(
+    db: Session, user_id: int, strategy_id: int, limit: int
+) -> Optional[List[dict]]:
+    ranked = indexes.get(db, user_id).similar(strategy_id, limit)
+    return None if ranked is None else _with_strategies(db, user_id, ranked)
+
+
+def recommend_strategies(
+    db: Session, user_id: int, map_name: Optional[str], limit: int
+) -> dict:
+    """Strategies matching ``map_name`` (default: the user's worst map) and the agents played there."""
+    map_name = map_name or worst_map(db, user_id)
+    if map_name is None:
+        return {"map": None, "results": []}
+    agents = db.execute(
+        select(Match.agent).where(Match.user_id == user_id, Match.map == map_name).distinct()
+    ).scalars()
+    query = " ".join([map_name, map_name, *agents])
+    ranked = indexes.get(db, user_id).search(query, limit)
+    return {"map": map_name, "results": _with_strategies(db, user_id, ranked)}
@@ -0,0 +1,76 @@
+"""Streamed server-side rendering for the HTML pages.
+
+``stream_template`` renders with Jinja's ``generate()`` and sends the page while
+it is still being rendered. Output is buffered up to each ``{{ flush }}`` in the
+template and sent before the template evaluates anything after it, so putting a
+flush before a section whose data comes from a lazy context value (a callable
+that runs a query) gets the layout and earlier sections to the browser first.
+
+By then the status line has been sent, so a failing loader can no longer turn
+into an error response. Context values named ``load_*`` are wrapped so that an
+exception is logged and the loader returns a ``SectionError`` instead; templates
+check for it with ``is failed`` and print it, which renders an inline error block
+in place of that section while the rest of the page still arrives.
+"""
+
+import logging
+from typing import Callable, Iterable, Iterator
+
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
+from markupsafe import Markup
+
+logger = logging.getLogger(__name__)
+
+FLUSH = Markup("<!-- flush -->")
+
+
+class SectionError:
+    """Stands in for the data of a section whose loader raised."""
+
+    def __init__(self, section: str):
+        self.section = section
+
+    def __html__(self) -> str:
+        return (
+            '<div class="empty-state section-error" role="alert">'
+            "This section could not be loaded. Refresh the page to try again.</div>"
+        )
+
+
+def _guarded(section: str, loader: Callable) -> Callable:
+    def load(*args, **kwargs):
+        try:
+            return loader(*args, **kwargs)
+        except Exception:
+            logger.exception("Streamed section %s failed to load", section)
+            return SectionError(section)
+
+    return load
+
+
+def _flushed(parts: Iterable[str]) -> Iterator[bytes]:
+    buffer = []
+    for part in parts:
+        if part == FLUSH:
+            if buffer:
+                yield "".join(buffer).encode()
+                buffer = []
+        else:
+            buffer.append(part)
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+def stream_template(templates: Jinja2Templates, name: str, context: dict) -> StreamingResponse:
+    """Like ``TemplateResponse``, but streamed; ``context`` must include ``request``."""
+    template = templates.get_template(name)
+    template.environment.tests.setdefault("failed", lambda value: isinstance(value, SectionError))
+    context = {
+        key: _guarded(key[len("load_") :], value) if key.startswith("load_") else value
+        for key, value in context.items()
+    }
+    return StreamingResponse(
+        _flushed(template.generate({**context, "flush": FLUSH})),
+        media_type="text/html; charset=utf-8",
+    )
@@ -0,0 +1,140 @@
+from typing import List, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse, Response
+from sqlalchemy.orm import Session
+
+from ..auth import get_current_admin_user
+from ..core.memory import memory
+from ..core.profiler import profiler
+from ..database import get_db
+from ..sharding import shard_stats
+from ..schemas import (
+    MemorySnapshotInfo,
+    MemoryStart,
+    MemoryStat,
+    MemoryStatus,
+    ProfilerStart,
+    ProfilerStatus,
+    ShardStats,
+)
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(get_current_admin_user)],
+)
+
+
+@router.get("/profiler", response_model=ProfilerStatus)
+def profiler_status() -> ProfilerStatus:
+    return profiler.status()
+
+
+@router.post("/profiler/start", response_model=ProfilerStatus)
+def start_profiler(payload: ProfilerStart) -> ProfilerStatus:
+    """Sample requests whose path matches ``pattern`` (a glob such as ``/matches*``).
+
+    ``rate`` is the fraction of matching requests to profile. Samples are kept
+    until the profile is cleared, across stops and restarts.
+    """
+    profiler.start(payload.pattern, payload.rate, payload.interval_ms / 1000)
+    return profiler.status()
+
+
+@router.post("/profiler/stop", response_model=ProfilerStatus)
+def stop_profiler() -> ProfilerStatus:
+    profiler.stop()
+    return profiler.status()
+
+
+@router.delete("/profiler", status_code=status.HTTP_204_NO_CONTENT)
+def clear_profile() -> Response:
+    profiler.reset()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/profiler/collapsed", response_class=PlainTextResponse)
+def collapsed_stacks() -> str:
+    """Stacks in folded format (``route;frame;...;frame count``), for flamegraph.pl or speedscope."""
+    return profiler.collapsed()
+
+
+@router.get("/profiler/flamegraph")
+def flamegraph() -> Response:
+    return Response(profiler.flamegraph(), media_type="image/svg+xml")
+
+
+@router.get("/memory", response_model=MemoryStatus)
+def memory_status() -> MemoryStatus:
+    """RSS, traced totals and per-route allocations, largest net allocation first."""
+    return memory.status()
+
+
+@router.post("/memory/start", response_model=MemoryStatus)
+def start_memory_tracing(payload: MemoryStart) -> MemoryStatus:
+    """Start ``tracemalloc``, keeping ``frames`` frames per allocation."""
+    memory.start(payload.frames)
+    return memory.status()
+
+
+@router.post("/memory/stop", response_model=MemoryStatus)
+def stop_memory_tracing() -> MemoryStatus:
+    memory.stop()
+    return memory.status()
+
+
+@router.delete("/memory", status_code=status.HTTP_204_NO_CONTENT)
+def clear_memory_stats() -> Response:
+    memory.reset()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post(
+    "/memory/snapshots", response_model=MemorySnapshotInfo, status_code=status.HTTP_201_CREATED
+)
+def take_memory_snapshot() -> MemorySnapshotInfo:
+    if not memory.tracing:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Memory tracing is off")
+    return memory.take_snapshot()
+
+
+@router.get("/memory/snapshots", response_model=List[MemorySnapshotInfo])
+def list_memory_snapshots() -> List[MemorySnapshotInfo]:
+    return memory.snapshot_infos()
+
+
+@router.get(
+    "/memory/snapshots/{snapshot_id}",
+    response_model=List[MemoryStat],
+    response_model_exclude_none=True,
+)
+def memory_snapshot(
+    snapshot_id: int,
+    group_by: Literal["lineno", "filename"] = "lineno",
+    limit: int = Query(25, ge=1, le=500),
+) -> List[MemoryStat]:
+    stats = memory.top(snapshot_id, group_by, limit)
+    if stats is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found")
+    return stats
+
+
+@router.get("/memory/diff", response_model=List[MemoryStat])
+def memory_diff(
+    base: int,
+    current: int,
+    group_by: Literal["lineno", "filename"] = "lineno",
+    limit: int = Query(25, ge=1, le=500),
+) -> List[MemoryStat]:
+    """Allocation changes from snapshot ``base`` to snapshot ``current``, largest first."""
+    stats = memory.diff(base, current, group_by, limit)
+    if stats is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found")
+    return stats
+
+
+@router.get("/shards", response_model=List[ShardStats])
+def shards(db: Session = Depends(get_db)) -> List[ShardStats]:
+    """Row counts on every shard, queried in parallel (one entry when not sharded)."""
+    return shard_stats(db)
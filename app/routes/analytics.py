@@ -0,0 +1,40 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from .. import analytics
+from ..auth import get_current_active_user
+from ..database import get_db
+from ..schemas import AnalyticsQuery, AnalyticsResponse
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+
+@router.get("/matches", response_model=AnalyticsResponse, response_model_exclude_none=True)
+def match_stats(
+    map: Optional[List[str]] = Query(None),
+    agent: Optional[List[str]] = Query(None),
+    min_score: Optional[int] = Query(None, ge=0, le=10),
+    max_score: Optional[int] = Query(None, ge=0, le=10),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    group_by: List[Literal["map", "agent", "day", "month"]] = Query([], max_length=3),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> AnalyticsResponse:
+    """Match count, average and best score, optionally per map/agent/day/month.
+
+    ``map`` and ``agent`` may be repeated to match any of several values.
+    """
+    query = AnalyticsQuery(
+        map=map,
+        agent=agent,
+        min_score=min_score,
+        max_score=max_score,
+        since=since,
+        until=until,
+        group_by=group_by,
+    )
+    return analytics.match_stats(db, current_user.id, query)
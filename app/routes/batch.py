@@ -0,0 +1,341 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from sqlalchemy.orm import Session
+
+from .. import analytics, leaderboard, recommendations
+from ..auth import get_current_active_user
+from ..bulk import bulk_result, delete_rows, filter_criteria, update_rows
+from ..database import get_db
+from ..models import Match, Session as ValorantSession, Strategy, User
+from ..projection import parse_fields
+from ..schemas import (
+    AnalyticsQuery,
+    AnalyticsResponse,
+    BatchOperation,
+    BatchRequest,
+    BatchResponse,
+    BatchResult,
+    BulkFilter,
+    BulkResult,
+    LeaderboardQuery,
+    LeaderboardResponse,
+    LeaderboardStanding,
+    ListQuery,
+    MatchBulkUpdate,
+    MatchCreate,
+    MatchFilter,
+    MatchListItem,
+    MatchResponse,
+    RecommendationQuery,
+    SessionBulkUpdate,
+    SessionCreate,
+    SessionFilter,
+    SessionListItem,
+    SessionResponse,
+    SimilarStrategiesQuery,
+    StrategyBulkUpdate,
+    StrategyCreate,
+    StrategyListItem,
+    StrategyRecommendation,
+    StrategyRecommendations,
+    StrategyResponse,
+    SyncQuery,
+    SyncResponse,
+)
+from .matches import add_match, query_matches
+from .sessions import add_session, query_sessions
+from .strategies import add_strategy, query_strategies
+from .sync import changes_since
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+MAX_PARALLEL_READS = 4
+
+
+@dataclass(frozen=True)
+class Operation:
+    handler: Callable[[Session, User, Any], Any]
+    result: TypeAdapter
+    args_model: Optional[Type[BaseModel]]
+    read_only: bool
+    status_code: int
+
+
+OPERATIONS: Dict[str, Operation] = {}
+Prepared = Tuple[BatchOperation, Operation, Any]
+
+
+def register_operation(
+    name: str,
+    handler: Callable[[Session, User, Any], Any],
+    result_type: Any,
+    args_model: Optional[Type[BaseModel]] = None,
+    read_only: bool = True,
+    status_code: int = status.HTTP_200_OK,
+) -> None:
+    """Expose ``handler(db, user, args)`` to ``/batch`` as ``name``."""
+    OPERATIONS[name] = Operation(
+        handler, TypeAdapter(result_type), args_model, read_only, status_code
+    )
+
+
+def _leaderboard_standing(db: Session, user: User, args: LeaderboardQuery):
+    standing = leaderboard.standing(db, user.id, args.map, args.agent)
+    if standing is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No matches logged for this map and agent",
+        )
+    return standing
+
+
+def _similar_strategies(db: Session, user: User, args: SimilarStrategiesQuery):
+    results = recommendations.similar_strategies(db, user.id, args.strategy_id, args.limit)
+    if results is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Strategy not found")
+    return results
+
+
+register_operation(
+    "matches.list",
+    lambda db, user, args: query_matches(
+        db, user.id, parse_fields(args.fields, MatchListItem), args.include_archived
+    ),
+    List[MatchListItem],
+    ListQuery,
+)
+register_operation(
+    "strategies.list",
+    lambda db, user, args: query_strategies(
+        db, user.id, parse_fields(args.fields, StrategyListItem)
+    ),
+    List[StrategyListItem],
+    ListQuery,
+)
+register_operation(
+    "sessions.list",
+    lambda db, user, args: query_sessions(
+        db, user.id, parse_fields(args.fields, SessionListItem), args.include_archived
+    ),
+    List[SessionListItem],
+    ListQuery,
+)
+register_operation(
+    "matches.create",
+    lambda db, user, args: add_match(db, user.id, args),
+    MatchResponse,
+    MatchCreate,
+    read_only=False,
+    status_code=status.HTTP_201_CREATED,
+)
+register_operation(
+    "strategies.create",
+    lambda db, user, args: add_strategy(db, user.id, args),
+    StrategyResponse,
+    StrategyCreate,
+    read_only=False,
+    status_code=status.HTTP_201_CREATED,
+)
+register_operation(
+    "sessions.create",
+    lambda db, user, args: add_session(db, user.id, args),
+    SessionResponse,
+    SessionCreate,
+    read_only=False,
+    status_code=status.HTTP_201_CREATED,
+)
+register_operation(
+    "leaderboards.top",
+    lambda db, user, args: leaderboard.top_players(db, args.map, args.agent, args.limit),
+    LeaderboardResponse,
+    LeaderboardQuery,
+)
+register_operation(
+    "leaderboards.me",
+    _leaderboard_standing,
+    LeaderboardStanding,
+    LeaderboardQuery,
+)
+register_operation(
+    "strategies.similar",
+    _similar_strategies,
+    List[StrategyRecommendation],
+    SimilarStrategiesQuery,
+)
+register_operation(
+    "strategies.recommend",
+    lambda db, user, args: recommendations.recommend_strategies(
+        db, user.id, args.map, args.limit
+    ),
+    StrategyRecommendations,
+    RecommendationQuery,
+)
+register_operation(
+    "analytics.matches",
+    lambda db, user, args: analytics.match_stats(db, user.id, args),
+    AnalyticsResponse,
+    AnalyticsQuery,
+)
+register_operation(
+    "sync",
+    lambda db, user, args: changes_since(db, user.id, args.since, args.limit),
+    SyncResponse,
+    SyncQuery,
+)
+
+
+def _register_bulk_operations(prefix: str, model, update_args, filter_args) -> None:
+    register_operation(
+        f"{prefix}.bulk_update",
+        lambda db, user, args: bulk_result(
+            update_rows(
+                db,
+                model,
+                user.id,
+                filter_criteria(model, args.filter),
+                args.values.model_dump(exclude_unset=True),
+            )
+        ),
+        BulkResult,
+        update_args,
+        read_only=False,
+    )
+    register_operation(
+        f"{prefix}.bulk_delete",
+        lambda db, user, args: bulk_result(
+            delete_rows(db, model, user.id, filter_criteria(model, args))
+        ),
+        BulkResult,
+        filter_args,
+        read_only=False,
+    )
+
+
+_register_bulk_operations("matches", Match, MatchBulkUpdate, MatchFilter)
+_register_bulk_operations("strategies", Strategy, StrategyBulkUpdate, BulkFilter)
+_register_bulk_operations("sessions", ValorantSession, SessionBulkUpdate, SessionFilter)
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def _prepare(operations: List[BatchOperation]) -> List[Prepared]:
+    prepared, errors = [], []
+    for index, operation in enumerate(operations):
+        spec = OPERATIONS.get(operation.op)
+        if spec is None:
+            errors.append({"index": index, "op": operation.op, "error": "Unknown operation"})
+            continue
+        args = None
+        if spec.args_model is not None:
+            try:
+                args = spec.args_model.model_validate(operation.args)
+            except ValidationError as exc:
+                errors.append(
+                    {
+                        "index": index,
+                        "op": operation.op,
+                        "error": exc.errors(include_url=False, include_context=False),
+                    }
+                )
+                continue
+        prepared.append((operation, spec, args))
+    if errors:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=errors)
+    return prepared
+
+
+def _execute(db: Session, user: User, item: Prepared) -> BatchResult:
+    operation, spec, args = item
+    started = time.perf_counter()
+    try:
+        value = spec.result.validate_python(spec.handler(db, user, args), from_attributes=True)
+        result = spec.result.dump_python(value, mode="json", exclude_unset=True)
+    except HTTPException as exc:
+        return BatchResult(
+            id=operation.id,
+            op=operation.op,
+            status=exc.status_code,
+            elapsed_ms=_elapsed_ms(started),
+            error=exc.detail,
+        )
+    return BatchResult(
+        id=operation.id,
+        op=operation.op,
+        status=spec.status_code,
+        elapsed_ms=_elapsed_ms(started),
+        result=result,
+    )
+
+
+def _execute_parallel(db: Session, user: User, items: List[Prepared]) -> List[BatchResult]:
+    # Each parallel read needs its own session (and connection); sessions are not
+    # thread-safe. Only reads issued before any write may run this way.
+    shards = getattr(db, "shards", None)
+    bind = None if shards else db.get_bind()
+    user_id = user.id
+
+    def run(item: Prepared) -> BatchResult:
+        read_db = shards.session() if shards else Session(bind=bind, autoflush=False)
+        with read_db:
+            read_db.info.update(user_id=user_id, read_only=True)
+            return _execute(read_db, user, item)
+
+    with ThreadPoolExecutor(max_workers=min(len(items), MAX_PARALLEL_READS)) as pool:
+        return list(pool.map(run, items))
+
+
+@router.post("/", response_model=BatchResponse)
+def run_batch(
+    payload: BatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> BatchResponse:
+    """Run several operations after a single authentication, in one transaction.
+
+    Operations run in order and the batch stops at the first failure, in which
+    case nothing is committed and the remaining operations report 424.
+    """
+    started = time.perf_counter()
+    prepared = _prepare(payload.operations)
+
+    leading_reads = 0
+    for _, spec, _ in prepared:
+        if not spec.read_only:
+            break
+        leading_reads += 1
+
+    results: List[BatchResult] = []
+    remaining = prepared
+    if payload.parallel_reads and leading_reads > 1:
+        results = _execute_parallel(db, current_user, prepared[:leading_reads])
+        remaining = prepared[leading_reads:]
+
+    failed = any(result.status >= 400 for result in results)
+    for item in remaining:
+        if failed:
+            results.append(
+                BatchResult(
+                    id=item[0].id,
+                    op=item[0].op,
+                    status=status.HTTP_424_FAILED_DEPENDENCY,
+                    elapsed_ms=0.0,
+                    error="Skipped because an earlier operation failed",
+                )
+            )
+            continue
+        result = _execute(db, current_user, item)
+        results.append(result)
+        failed = result.status >= 400
+
+    if failed:
+        db.rollback()
+    else:
+        db.commit()
+    return BatchResponse(committed=not failed, elapsed_ms=_elapsed_ms(started), results=results)
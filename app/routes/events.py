@@ -0,0 +1,144 @@
+import asyncio
+from datetime import date, datetime
+import json
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query, Request, WebSocket
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ..auth import (
+    STREAM_SCOPE,
+    create_stream_token,
+    get_active_user_from_token,
+    get_current_active_user,
+    html_oauth2_scheme,
+)
+from ..core.changes import Change, on_commit
+from ..core.config import get_settings
+from ..core.events import EventHub, build_backend
+from ..database import get_db
+from ..models import User
+from ..schemas import StreamToken
+
+settings = get_settings()
+hub = EventHub(
+    build_backend(settings.EVENTS_BACKEND, settings.EVENTS_REDIS_URL),
+    queue_size=settings.EVENTS_QUEUE_SIZE,
+)
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def serialize_change(change: Change) -> str:
+    delta = {"op": change.op, "entity": change.entity, "id": change.id}
+    if change.op == "create":
+        delta["data"] = change.values
+    elif change.op == "update":
+        delta["data"] = {key: change.values.get(key) for key in change.previous}
+    return json.dumps(delta, default=_json_default, separators=(",", ":"))
+
+
+@on_commit
+def publish_changes(changes: List[Change]) -> None:
+    for change in changes:
+        hub.publish(change.user_id, serialize_change(change))
+
+
+@router.post("/token", response_model=StreamToken)
+def stream_token(current_user: User = Depends(get_current_active_user)) -> StreamToken:
+    """Short-lived token for opening one event stream.
+
+    EventSource and WebSocket clients cannot send an Authorization header and
+    query strings end up in access and proxy logs, so streams take this token,
+    which expires after ``EVENTS_TOKEN_EXPIRE_SECONDS`` and is refused by every
+    other route, instead of the access token.
+    """
+    return StreamToken(
+        stream_token=create_stream_token(current_user),
+        expires_in=settings.EVENTS_TOKEN_EXPIRE_SECONDS,
+    )
+
+
+# The session is closed as soon as the user is resolved so long-lived streams do
+# not hold a connection.
+def get_stream_user(
+    header_token: Optional[str] = Depends(html_oauth2_scheme),
+    stream_token: Optional[str] = Query(None),
+    db: Session = Depends(get_db, scope="function"),
+) -> User:
+    if header_token is not None:
+        return get_active_user_from_token(header_token, db)
+    return get_active_user_from_token(stream_token, db, scope=STREAM_SCOPE)
+
+
+def get_socket_user(
+    stream_token: Optional[str] = Query(None),
+    db: Session = Depends(get_db, scope="function"),
+) -> User:
+    return get_active_user_from_token(stream_token, db, scope=STREAM_SCOPE)
+
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    current_user: User = Depends(get_stream_user),
+) -> StreamingResponse:
+    user_id = current_user.id
+    keepalive = settings.EVENTS_KEEPALIVE_SECONDS
+
+    async def event_source():
+        async with hub.subscribe(user_id) as subscription:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(subscription.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    yield "event: reset\ndata: {}\n\n"
+                    return
+                yield f"data: {message}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def events_websocket(
+    websocket: WebSocket,
+    current_user: User = Depends(get_socket_user),
+) -> None:
+    async with hub.subscribe(current_user.id) as subscription:
+        await websocket.accept()
+        receiver = asyncio.ensure_future(websocket.receive())
+        try:
+            while True:
+                getter = asyncio.ensure_future(subscription.get())
+                done, _ = await asyncio.wait(
+                    {getter, receiver}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if getter in done:
+                    message = getter.result()
+                    if message is None:
+                        await websocket.close(code=1013, reason="Too slow, reload and reconnect")
+                        return
+                    await websocket.send_text(message)
+                else:
+                    getter.cancel()
+                if receiver in done:
+                    if receiver.result()["type"] == "websocket.disconnect":
+                        return
+                    receiver = asyncio.ensure_future(websocket.receive())
+        finally:
+            receiver.cancel()
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from .. import leaderboard
+from ..auth import get_current_active_user
+from ..database import get_db
+from ..schemas import LeaderboardResponse, LeaderboardStanding
+
+router = APIRouter(prefix="/leaderboards", tags=["leaderboards"])
+
+
+@router.get("/", response_model=LeaderboardResponse)
+def top_players(
+    map: str = Query(..., min_length=1, max_length=100),
+    agent: str = Query(..., min_length=1, max_length=50),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> LeaderboardResponse:
+    return leaderboard.top_players(db, map, agent, limit)
+
+
+@router.get("/me", response_model=LeaderboardStanding)
+def my_standing(
+    map: str = Query(..., min_length=1, max_length=100),
+    agent: str = Query(..., min_length=1, max_length=50),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> LeaderboardStanding:
+    standing = leaderboard.standing(db, current_user.id, map, agent)
+    if standing is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No matches logged for this map and agent",
+        )
+    return standing
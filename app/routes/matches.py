@@ -1,42 +1,229 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional, Sequence, Union
 
+from ..archive import ARCHIVED_QUERY, archived_rows, delete_archived
 from ..auth import get_current_active_user
+from ..bulk import bulk_result, delete_rows, filter_criteria, update_rows
+from ..core.cache import cached
+from ..core.config import get_settings
 from ..database import get_db
+from ..match_events import (
+    MEDIA_TYPE as EVENTS_MEDIA_TYPE,
+    EventFormatError,
+    EventLimitError,
+    decode_events,
+    ingest_events,
+    max_payload_bytes,
+    owned_match,
+    stream_timeline,
+)
 from ..models import Match
-from ..schemas import MatchCreate, MatchResponse
+from ..projection import FIELDS_QUERY, fields_response, parse_fields, project, select_fields
+from ..schemas import (
+    BulkResult,
+    MatchBulkUpdate,
+    MatchCreate,
+    MatchEventsIngested,
+    MatchFilter,
+    MatchListItem,
+    MatchResponse,
+    MatchUpdate,
+)
 
 router = APIRouter(prefix="/matches", tags=["matches"])
 
 
-@router.post("/", response_model=MatchResponse, status_code=status.HTTP_201_CREATED)
-def create_match(
-    payload: MatchCreate,
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_active_user),
-) -> MatchResponse:
+def add_match(db: Session, user_id: int, payload: MatchCreate) -> Match:
     match = Match(
         map=payload.map,
         agent=payload.agent,
         score=payload.score,
         notes=payload.notes,
-        user_id=current_user.id,
+        user_id=user_id,
     )
     db.add(match)
-    db.commit()
-    db.refresh(match)
+    db.flush()
     return match
 
 
+@cached("matches.list", List[MatchListItem])
+def query_matches(
+    db: Session,
+    user_id: int,
+    fields: Optional[Sequence[str]] = None,
+    include_archived: bool = True,
+) -> List[Union[Match, dict]]:
+    archived = archived_rows(db, Match, user_id) if include_archived else []
+    if fields is not None:
+        rows = select_fields(
+            db,
+            Match,
+            fields,
+            Match.user_id == user_id,
+            order_by=[Match.created_at.desc(), Match.id.desc()],
+        )
+        return rows + project(archived, fields)
+    matches = (
+        db.query(Match)
+        .filter(Match.user_id == user_id)
+        .order_by(Match.created_at.desc(), Match.id.desc())
+        .all()
+    )
+    return matches + archived
+
+
+@router.post("/", response_model=MatchResponse, status_code=status.HTTP_201_CREATED)
+def create_match(
+    payload: MatchCreate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> MatchResponse:
+    # Built before commit: the INSERT already returned every column, and reading
+    # attributes after commit would expire them and cost another SELECT.
+    response = MatchResponse.model_validate(add_match(db, current_user.id, payload))
+    db.commit()
+    return response
+
+
 @router.get("/", response_model=List[MatchResponse])
 def list_matches(
+    fields: Optional[str] = FIELDS_QUERY,
+    include_archived: bool = ARCHIVED_QUERY,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_active_user),
 ) -> List[MatchResponse]:
-    return (
-        db.query(Match)
-        .filter(Match.user_id == current_user.id)
-        .order_by(Match.created_at.desc())
-        .all()
-    )
\ No newline at end of file
+    projection = parse_fields(fields, MatchListItem)
+    rows = query_matches(db, current_user.id, projection, include_archived)
+    return fields_response(rows, projection)
+
+
+@router.patch("/{match_id}", response_model=MatchResponse)
+def update_match(
+    match_id: int,
+    payload: MatchUpdate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> MatchResponse:
+    rows = update_rows(
+        db,
+        Match,
+        current_user.id,
+        [Match.id == match_id],
+        payload.model_dump(exclude_unset=True),
+    )
+    if not rows:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Match not found")
+    db.commit()
+    return rows[0]
+
+
+@router.delete("/{match_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_match(
+    match_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> None:
+    deleted = delete_rows(db, Match, current_user.id, [Match.id == match_id])
+    if not deleted and not delete_archived(db, Match, current_user.id, match_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Match not found")
+    db.commit()
+
+
+@router.post("/bulk-update", response_model=BulkResult)
+def bulk_update_matches(
+    payload: MatchBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> BulkResult:
+    rows = update_rows(
+        db,
+        Match,
+        current_user.id,
+        filter_criteria(Match, payload.filter),
+        payload.values.model_dump(exclude_unset=True),
+    )
+    db.commit()
+    return bulk_result(rows)
+
+
+@router.post("/bulk-delete", response_model=BulkResult)
+def bulk_delete_matches(
+    payload: MatchFilter,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> BulkResult:
+    rows = delete_rows(db, Match, current_user.id, filter_criteria(Match, payload))
+    db.commit()
+    return bulk_result(rows)
+
+
+def _ensure_owned(db: Session, user_id: int, match_id: int) -> None:
+    if not owned_match(db, user_id, match_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Match not found")
+
+
+async def events_payload(request: Request) -> bytes:
+    """The request body, refused with 413 past ``MATCH_EVENTS_MAX_EVENTS`` events."""
+    max_events = get_settings().MATCH_EVENTS_MAX_EVENTS
+    limit = max_payload_bytes(max_events)
+    too_large = HTTPException(
+        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+        detail=f"At most {max_events} events per upload",
+    )
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise too_large
+    return bytes(body)
+
+
+@router.post(
+    "/{match_id}/events",
+    response_model=MatchEventsIngested,
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {EVENTS_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}}},
+        }
+    },
+)
+def ingest_match_events(
+    match_id: int,
+    payload: bytes = Depends(events_payload),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> MatchEventsIngested:
+    """Store round events sent in the binary ``VEV1`` format; resent rounds are replaced."""
+    _ensure_owned(db, current_user.id, match_id)
+    try:
+        events = decode_events(payload, get_settings().MATCH_EVENTS_MAX_ROUNDS)
+    except EventLimitError as exc:
+        raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=str(exc))
+    except EventFormatError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc))
+    result = ingest_events(db, current_user.id, match_id, events)
+    db.commit()
+    return result
+
+
+@router.get("/{match_id}/timeline")
+def match_timeline(
+    match_id: int,
+    format: Literal["ndjson", "binary"] = "ndjson",
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> StreamingResponse:
+    """Stream the match's events round by round, as NDJSON or in the ``VEV1`` format."""
+    _ensure_owned(db, current_user.id, match_id)
+    binary = format == "binary"
+    return StreamingResponse(
+        stream_timeline(db, match_id, binary),
+        media_type=EVENTS_MEDIA_TYPE if binary else "application/x-ndjson",
+    )
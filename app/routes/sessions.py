@@ -1,43 +1,147 @@
-from typing import List
+from typing import List, Optional, Sequence, Union
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session as DbSession
 
+from ..archive import ARCHIVED_QUERY, archived_rows, delete_archived
 from ..auth import get_current_active_user
+from ..bulk import bulk_result, delete_rows, filter_criteria, update_rows
+from ..core.cache import cached
 from ..database import get_db
 from ..models import Session as ValorantSession
-from ..schemas import SessionCreate, SessionResponse
+from ..projection import FIELDS_QUERY, fields_response, parse_fields, project, select_fields
+from ..schemas import (
+    BulkResult,
+    SessionBulkUpdate,
+    SessionCreate,
+    SessionFilter,
+    SessionListItem,
+    SessionResponse,
+    SessionUpdate,
+)
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
 
-@router.post("/", response_model=SessionResponse, status_code=status.HTTP_201_CREATED)
-def create_session(
-    payload: SessionCreate,
-    db: DbSession = Depends(get_db),
-    current_user=Depends(get_current_active_user),
-) -> SessionResponse:
+def add_session(db: DbSession, user_id: int, payload: SessionCreate) -> ValorantSession:
     session = ValorantSession(
         title=payload.title,
         focus_area=payload.focus_area,
         duration_minutes=payload.duration_minutes,
         notes=payload.notes,
-        user_id=current_user.id,
+        user_id=user_id,
     )
     db.add(session)
-    db.commit()
-    db.refresh(session)
+    db.flush()
     return session
 
 
+@cached("sessions.list", List[SessionListItem])
+def query_sessions(
+    db: DbSession,
+    user_id: int,
+    fields: Optional[Sequence[str]] = None,
+    include_archived: bool = True,
+) -> List[Union[ValorantSession, dict]]:
+    archived = archived_rows(db, ValorantSession, user_id) if include_archived else []
+    if fields is not None:
+        rows = select_fields(
+            db,
+            ValorantSession,
+            fields,
+            ValorantSession.user_id == user_id,
+            order_by=[ValorantSession.created_at.desc(), ValorantSession.id.desc()],
+        )
+        return rows + project(archived, fields)
+    sessions = (
+        db.query(ValorantSession)
+        .filter(ValorantSession.user_id == user_id)
+        .order_by(ValorantSession.created_at.desc(), ValorantSession.id.desc())
+        .all()
+    )
+    return sessions + archived
+
+
+@router.post("/", response_model=SessionResponse, status_code=status.HTTP_201_CREATED)
+def create_session(
+    payload: SessionCreate,
+    db: DbSession = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> SessionResponse:
+    response = SessionResponse.model_validate(add_session(db, current_user.id, payload))
+    db.commit()
+    return response
+
+
 @router.get("/", response_model=List[SessionResponse])
 def list_sessions(
+    fields: Optional[str] = FIELDS_QUERY,
+    include_archived: bool = ARCHIVED_QUERY,
     db: DbSession = Depends(get_db),
     current_user=Depends(get_current_active_user),
 ) -> List[SessionResponse]:
-    return (
-        db.query(ValorantSession)
-        .filter(ValorantSession.user_id == current_user.id)
-        .order_by(ValorantSession.created_at.desc())
-        .all()
+    projection = parse_fields(fields, SessionListItem)
+    rows = query_sessions(db, current_user.id, projection, include_archived)
+    return fields_response(rows, projection)
+
+
+@router.patch("/{session_id}", response_model=SessionResponse)
+def update_session(
+    session_id: int,
+    payload: SessionUpdate,
+    db: DbSession = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> SessionResponse:
+    rows = update_rows(
+        db,
+        ValorantSession,
+        current_user.id,
+        [ValorantSession.id == session_id],
+        payload.model_dump(exclude_unset=True),
     )
+    if not rows:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    db.commit()
+    return rows[0]
+
+
+@router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_session(
+    session_id: int,
+    db: DbSession = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> None:
+    deleted = delete_rows(db, ValorantSession, current_user.id, [ValorantSession.id == session_id])
+    if not deleted and not delete_archived(db, ValorantSession, current_user.id, session_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    db.commit()
+
+
+@router.post("/bulk-update", response_model=BulkResult)
+def bulk_update_sessions(
+    payload: SessionBulkUpdate,
+    db: DbSession = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> BulkResult:
+    rows = update_rows(
+        db,
+        ValorantSession,
+        current_user.id,
+        filter_criteria(ValorantSession, payload.filter),
+        payload.values.model_dump(exclude_unset=True),
+    )
+    db.commit()
+    return bulk_result(rows)
+
+
+@router.post("/bulk-delete", response_model=BulkResult)
+def bulk_delete_sessions(
+    payload: SessionFilter,
+    db: DbSession = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> BulkResult:
+    rows = delete_rows(
+        db, ValorantSession, current_user.id, filter_criteria(ValorantSession, payload)
+    )
+    db.commit()
+    return bulk_result(rows)
@@ -1,41 +1,159 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Sequence, Union
 
 from ..auth import get_current_active_user
+from ..bulk import bulk_result, delete_rows, filter_criteria, update_rows
+from ..core.cache import cached
 from ..database import get_db
 from ..models import Strategy
-from ..schemas import StrategyCreate, StrategyResponse
+from ..projection import FIELDS_QUERY, fields_response, parse_fields, select_fields
+from ..recommendations import recommend_strategies, similar_strategies
+from ..schemas import (
+    BulkFilter,
+    BulkResult,
+    StrategyBulkUpdate,
+    StrategyCreate,
+    StrategyListItem,
+    StrategyRecommendation,
+    StrategyRecommendations,
+    StrategyResponse,
+    StrategyUpdate,
+)
 
 router = APIRouter(prefix="/strategies", tags=["strategies"])
 
 
+def add_strategy(db: Session, user_id: int, payload: StrategyCreate) -> Strategy:
+    strategy = Strategy(
+        title=payload.title,
+        description=payload.description,
+        user_id=user_id,
+    )
+    db.add(strategy)
+    db.flush()
+    return strategy
+
+
+@cached("strategies.list", List[StrategyListItem])
+def query_strategies(
+    db: Session, user_id: int, fields: Optional[Sequence[str]] = None
+) -> List[Union[Strategy, dict]]:
+    if fields is not None:
+        return select_fields(
+            db,
+            Strategy,
+            fields,
+            Strategy.user_id == user_id,
+            order_by=[Strategy.created_at.desc(), Strategy.id.desc()],
+        )
+    return (
+        db.query(Strategy)
+        .filter(Strategy.user_id == user_id)
+        .order_by(Strategy.created_at.desc(), Strategy.id.desc())
+        .all()
+    )
+
+
 @router.post("/", response_model=StrategyResponse, status_code=status.HTTP_201_CREATED)
 def create_strategy(
     payload: StrategyCreate,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_active_user),
 ) -> StrategyResponse:
-    strategy = Strategy(
-        title=payload.title,
-        description=payload.description,
-        user_id=current_user.id,
-    )
-    db.add(strategy)
+    response = StrategyResponse.model_validate(add_strategy(db, current_user.id, payload))
     db.commit()
-    db.refresh(strategy)
-    return strategy
+    return response
 
 
 @router.get("/", response_model=List[StrategyResponse])
 def list_strategies(
+    fields: Optional[str] = FIELDS_QUERY,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_active_user),
 ) -> List[StrategyResponse]:
-    return (
-        db.query(Strategy)
-        .filter(Strategy.user_id == current_user.id)
-        .order_by(Strategy.created_at.desc())
-        .all()
+    projection = parse_fields(fields, StrategyListItem)
+    return fields_response(query_strategies(db, current_user.id, projection), projection)
+
+
+@router.patch("/{strategy_id}", response_model=StrategyResponse)
+def update_strategy(
+    strategy_id: int,
+    payload: StrategyUpdate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> StrategyResponse:
+    rows = update_rows(
+        db,
+        Strategy,
+        current_user.id,
+        [Strategy.id == strategy_id],
+        payload.model_dump(exclude_unset=True),
+    )
+    if not rows:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Strategy not found")
+    db.commit()
+    return rows[0]
+
+
+@router.delete("/{strategy_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_strategy(
+    strategy_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> None:
+    if not delete_rows(db, Strategy, current_user.id, [Strategy.id == strategy_id]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Strategy not found")
+    db.commit()
+
+
+@router.post("/bulk-update", response_model=BulkResult)
+def bulk_update_strategies(
+    payload: StrategyBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> BulkResult:
+    rows = update_rows(
+        db,
+        Strategy,
+        current_user.id,
+        filter_criteria(Strategy, payload.filter),
+        payload.values.model_dump(exclude_unset=True),
     )
+    db.commit()
+    return bulk_result(rows)
+
+
+@router.post("/bulk-delete", response_model=BulkResult)
+def bulk_delete_strategies(
+    payload: BulkFilter,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> BulkResult:
+    rows = delete_rows(db, Strategy, current_user.id, filter_criteria(Strategy, payload))
+    db.commit()
+    return bulk_result(rows)
+
 
+@router.get("/recommend", response_model=StrategyRecommendations)
+def recommend(
+    map: Optional[str] = Query(None, min_length=1, max_length=100),
+    limit: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> StrategyRecommendations:
+    """Strategies relevant to ``map``, or to the map the user scores worst on."""
+    return recommend_strategies(db, current_user.id, map, limit)
+
+
+@router.get("/{strategy_id}/similar", response_model=List[StrategyRecommendation])
+def similar(
+    strategy_id: int,
+    limit: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> List[StrategyRecommendation]:
+    results = similar_strategies(db, current_user.id, strategy_id, limit)
+    if results is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Strategy not found")
+    return results
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from .. import sync
+from ..auth import get_current_active_user
+from ..database import get_db
+from ..schemas import SyncResponse
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+
+def changes_since(db: Session, user_id: int, since: int, limit: int) -> dict:
+    if since > sync.latest_version(db, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Version is ahead of the server; resync from since=0",
+        )
+    return sync.changes_since(db, user_id, since, limit)
+
+
+@router.get("/", response_model=SyncResponse)
+def sync_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+) -> SyncResponse:
+    """Rows changed and deleted since ``since``; call again with ``version`` while ``more``."""
+    return changes_since(db, current_user.id, since, limit)
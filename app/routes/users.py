@@ -1,9 +1,10 @@
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
+from ..archive import archived_rows
 from ..auth import (
     create_access_token,
     create_refresh_token,
@@ -12,9 +13,11 @@ from ..auth import (
     get_password_hash,
     verify_password,
 )
+from ..core.cache import cached
 from ..core.config import get_settings
-from ..database import get_db
+from ..database import dialect_insert, get_db
 from ..models import Match, Session, Strategy, User
+from ..sharding import place_user
 from ..schemas import (
     DashboardPayload,
     MatchResponse,
@@ -32,27 +35,26 @@ router = APIRouter(tags=["auth"])
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 def register_user(data: UserCreate, db: Session = Depends(get_db)) -> UserResponse:
-    existing = (
-        db.query(User)
-        .filter((User.username == data.username) | (User.email == data.email))
-        .first()
-    )
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username or email already exists",
-        )
-
-    user = User(
+    # One statement: a taken username or email makes the INSERT a no-op that
+    # returns nothing, instead of a pre-query that could race another signup.
+    users = User.__table__
+    stmt = dialect_insert(db.get_bind(), users).values(
         username=data.username,
         email=data.email,
         hashed_password=get_password_hash(data.password),
         is_active=True,
     )
-    db.add(user)
+    user = db.execute(stmt.on_conflict_do_nothing().returning(*users.c)).mappings().first()
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already exists",
+        )
+    place_user(db, user)
+    db.info["user_id"] = user["id"]  # reads right after signup stay on the primary
+    response = UserResponse.model_validate(dict(user))
     db.commit()
-    db.refresh(user)
-    return UserResponse.from_orm(user)
+    return response
 
 
 @router.post("/login", response_model=TokenResponse)
@@ -106,35 +108,43 @@ def refresh_token(payload: TokenRefresh, db: Session = Depends(get_db)) -> Token
     )
 
 
-@router.get("/dashboard", response_model=DashboardPayload)
-def dashboard_data(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
-) -> DashboardPayload:
+@cached(
+    "dashboard",
+    Tuple[List[MatchResponse], List[StrategyResponse], List[SessionResponse]],
+)
+def dashboard_rows(db: Session, user_id: int) -> tuple:
     matches = (
         db.query(Match)
-        .filter(Match.user_id == current_user.id)
-        .order_by(Match.created_at.desc())
+        .filter(Match.user_id == user_id)
+        .order_by(Match.created_at.desc(), Match.id.desc())
         .all()
     )
     strategies = (
         db.query(Strategy)
-        .filter(Strategy.user_id == current_user.id)
-        .order_by(Strategy.created_at.desc())
+        .filter(Strategy.user_id == user_id)
+        .order_by(Strategy.created_at.desc(), Strategy.id.desc())
         .all()
     )
     sessions = (
         db.query(Session)
-        .filter(Session.user_id == current_user.id)
-        .order_by(Session.created_at.desc())
+        .filter(Session.user_id == user_id)
+        .order_by(Session.created_at.desc(), Session.id.desc())
         .all()
     )
-    match_payload = [MatchResponse.from_orm(match) for match in matches]
-    strategy_payload = [StrategyResponse.from_orm(strategy) for strategy in strategies]
-    session_payload = [SessionResponse.from_orm(session) for session in sessions]
+    matches += archived_rows(db, Match, user_id)
+    sessions += archived_rows(db, Session, user_id)
+    return matches, strategies, sessions
+
+
+@router.get("/dashboard", response_model=DashboardPayload)
+def dashboard_data(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+) -> DashboardPayload:
+    matches, strategies, sessions = dashboard_rows(db, current_user.id)
     return DashboardPayload(
         user=UserResponse.from_orm(current_user),
-        matches=match_payload,
-        strategies=strategy_payload,
-        sessions=session_payload,
+        matches=matches,
+        strategies=strategies,
+        sessions=sessions,
     )
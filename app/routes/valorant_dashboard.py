@@ -1,20 +1,45 @@
 from fastapi import APIRouter, Depends, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from sqlalchemy.orm import Session
 
+from .. import analytics
 from ..auth import get_current_user_for_templates
+from ..database import get_db
+from ..rendering import stream_template
+from ..schemas import AnalyticsQuery
+from .sessions import query_sessions
 
 templates = Jinja2Templates(directory="templates")
 
 router = APIRouter()
 
 
+def performance_summary(db: Session, user_id: int) -> dict:
+    overall = analytics.match_stats(db, user_id, AnalyticsQuery())
+    by_map = analytics.match_stats(db, user_id, AnalyticsQuery(group_by=["map"]))["groups"]
+    totals = overall["groups"][0] if overall["groups"] else {}
+    return {
+        "matches": overall["matches"],
+        "average": totals.get("average"),
+        "best": totals.get("best"),
+        "top_map": max(by_map, key=lambda group: group["matches"])["map"] if by_map else None,
+    }
+
+
 @router.get("/valorant-dashboard", response_class=HTMLResponse, name="valorant_dashboard")
-async def valorant_dashboard(
+def valorant_dashboard(
     request: Request,
+    db: Session = Depends(get_db),
     current_user=Depends(get_current_user_for_templates),
-) -> HTMLResponse:
-    return templates.TemplateResponse(
+) -> StreamingResponse:
+    user_id = current_user.id
+    return stream_template(
+        templates,
         "valorant_dashboard.html",
-        {"request": request},
-    )
\ No newline at end of file
+        {
+            "request": request,
+            "load_stats": lambda: performance_summary(db, user_id),
+            "load_sessions": lambda: query_sessions(db, user_id),
+        },
+    )
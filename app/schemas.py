@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, ClassVar, Dict, List, Literal, Optional, Tuple
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
 
 
 class UserBase(BaseModel):
@@ -39,6 +39,48 @@ class TokenRefresh(BaseModel):
     refresh_token: str
 
 
+class StreamToken(BaseModel):
+    stream_token: str
+    expires_in: int
+
+
+class PartialUpdate(BaseModel):
+    """PATCH payload: only the fields sent are written; ``nullable`` ones may be cleared."""
+
+    nullable: ClassVar[Tuple[str, ...]] = ()
+
+    @model_validator(mode="after")
+    def check_values(self):
+        values = self.model_dump(exclude_unset=True)
+        if not values:
+            raise ValueError("No fields to update")
+        cleared = [
+            name for name, value in values.items() if value is None and name not in self.nullable
+        ]
+        if cleared:
+            raise ValueError(f"Fields cannot be null: {', '.join(cleared)}")
+        return self
+
+
+class BulkFilter(BaseModel):
+    """Rows a bulk update/delete applies to; every criterion given must match."""
+
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=1000)
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def check_criteria(self):
+        if not self.model_dump(exclude_none=True):
+            raise ValueError("At least one filter is required")
+        return self
+
+
+class BulkResult(BaseModel):
+    affected: int
+    ids: List[int]
+
+
 class MatchBase(BaseModel):
     map: str = Field(..., min_length=1, max_length=100)
     agent: str = Field(..., min_length=1, max_length=50)
@@ -59,6 +101,45 @@ class MatchResponse(MatchBase):
     model_config = {"from_attributes": True}
 
 
+class MatchListItem(BaseModel):
+    """``MatchResponse`` with every field optional, for ``fields=`` projections."""
+
+    id: Optional[int] = None
+    user_id: Optional[int] = None
+    map: Optional[str] = None
+    agent: Optional[str] = None
+    score: Optional[int] = None
+    notes: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    model_config = {"from_attributes": True}
+
+
+class MatchUpdate(PartialUpdate):
+    nullable: ClassVar[Tuple[str, ...]] = ("notes",)
+
+    map: Optional[str] = Field(None, min_length=1, max_length=100)
+    agent: Optional[str] = Field(None, min_length=1, max_length=50)
+    score: Optional[int] = Field(None, ge=0, le=10)
+    notes: Optional[str] = Field(None, max_length=500)
+
+
+class MatchFilter(BulkFilter):
+    map: Optional[str] = None
+    agent: Optional[str] = None
+
+
+class MatchBulkUpdate(BaseModel):
+    filter: MatchFilter
+    values: MatchUpdate
+
+
+class MatchEventsIngested(BaseModel):
+    rounds: int
+    events: int
+
+
 class StrategyBase(BaseModel):
     title: str = Field(..., min_length=1, max_length=128)
     description: Optional[str] = Field(None, max_length=1000)
@@ -77,6 +158,49 @@ class StrategyResponse(StrategyBase):
     model_config = {"from_attributes": True}
 
 
+class StrategyListItem(BaseModel):
+    id: Optional[int] = None
+    user_id: Optional[int] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    model_config = {"from_attributes": True}
+
+
+class StrategyUpdate(PartialUpdate):
+    nullable: ClassVar[Tuple[str, ...]] = ("description",)
+
+    title: Optional[str] = Field(None, min_length=1, max_length=128)
+    description: Optional[str] = Field(None, max_length=1000)
+
+
+class StrategyBulkUpdate(BaseModel):
+    filter: BulkFilter
+    values: StrategyUpdate
+
+
+class StrategyRecommendation(BaseModel):
+    similarity: float
+    strategy: StrategyResponse
+
+
+class StrategyRecommendations(BaseModel):
+    map: Optional[str]
+    results: List[StrategyRecommendation]
+
+
+class SimilarStrategiesQuery(BaseModel):
+    strategy_id: int
+    limit: int = Field(5, ge=1, le=50)
+
+
+class RecommendationQuery(BaseModel):
+    map: Optional[str] = Field(None, min_length=1, max_length=100)
+    limit: int = Field(5, ge=1, le=50)
+
+
 class SessionBase(BaseModel):
     title: str = Field(..., min_length=1, max_length=128)
     focus_area: str = Field(..., min_length=1, max_length=128)
@@ -97,8 +221,218 @@ class SessionResponse(SessionBase):
     model_config = {"from_attributes": True}
 
 
+class SessionListItem(BaseModel):
+    id: Optional[int] = None
+    user_id: Optional[int] = None
+    title: Optional[str] = None
+    focus_area: Optional[str] = None
+    duration_minutes: Optional[int] = None
+    notes: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    model_config = {"from_attributes": True}
+
+
+class SessionUpdate(PartialUpdate):
+    nullable: ClassVar[Tuple[str, ...]] = ("notes",)
+
+    title: Optional[str] = Field(None, min_length=1, max_length=128)
+    focus_area: Optional[str] = Field(None, min_length=1, max_length=128)
+    duration_minutes: Optional[int] = Field(None, ge=0, le=600)
+    notes: Optional[str] = Field(None, max_length=1000)
+
+
+class SessionFilter(BulkFilter):
+    focus_area: Optional[str] = None
+
+
+class SessionBulkUpdate(BaseModel):
+    filter: SessionFilter
+    values: SessionUpdate
+
+
 class DashboardPayload(BaseModel):
     user: UserResponse
     matches: List[MatchResponse]
     strategies: List[StrategyResponse]
     sessions: List[SessionResponse]
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    username: str
+    best: int
+    average: float
+    matches: int
+
+
+class LeaderboardResponse(BaseModel):
+    map: str
+    agent: str
+    players: int
+    entries: List[LeaderboardEntry]
+
+
+class LeaderboardStanding(BaseModel):
+    map: str
+    agent: str
+    best: int
+    average: float
+    matches: int
+    rank: int
+    players: int
+    percentile: float
+    match_percentile: float
+
+
+class SyncUpserts(BaseModel):
+    matches: List[MatchResponse] = []
+    strategies: List[StrategyResponse] = []
+    sessions: List[SessionResponse] = []
+
+
+class SyncDeletes(BaseModel):
+    matches: List[int] = []
+    strategies: List[int] = []
+    sessions: List[int] = []
+
+
+class SyncResponse(BaseModel):
+    version: int
+    latest: int
+    more: bool
+    upserts: SyncUpserts
+    deletes: SyncDeletes
+
+
+class SyncQuery(BaseModel):
+    since: int = Field(0, ge=0)
+    limit: int = Field(500, ge=1, le=1000)
+
+
+class AnalyticsQuery(BaseModel):
+    map: Optional[List[str]] = None
+    agent: Optional[List[str]] = None
+    min_score: Optional[int] = Field(None, ge=0, le=10)
+    max_score: Optional[int] = Field(None, ge=0, le=10)
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    group_by: List[Literal["map", "agent", "day", "month"]] = Field(
+        default_factory=list, max_length=3
+    )
+
+
+class AnalyticsGroup(BaseModel):
+    map: Optional[str] = None
+    agent: Optional[str] = None
+    day: Optional[str] = None
+    month: Optional[str] = None
+    matches: int
+    average: float
+    best: int
+
+
+class AnalyticsResponse(BaseModel):
+    matches: int
+    groups: List[AnalyticsGroup]
+
+
+class ProfilerStart(BaseModel):
+    pattern: str = Field("*", min_length=1, max_length=200)
+    rate: float = Field(1.0, gt=0, le=1)
+    interval_ms: float = Field(10.0, ge=1, le=1000)
+
+
+class ProfilerStatus(BaseModel):
+    active: bool
+    pattern: str
+    rate: float
+    interval_ms: float
+    requests: int
+    samples: int
+    overhead: float
+
+
+class ShardStats(BaseModel):
+    shard: str
+    users: int
+    matches: int
+    strategies: int
+    sessions: int
+
+
+class MemoryStart(BaseModel):
+    frames: int = Field(1, ge=1, le=50)
+
+
+class RouteMemoryStats(BaseModel):
+    route: str
+    requests: int
+    net_bytes: int
+    avg_net_bytes: int
+    max_net_bytes: int
+    peak_bytes: int
+
+
+class MemoryStatus(BaseModel):
+    tracing: bool
+    frames: int
+    rss_bytes: int
+    recycle_rss_bytes: int
+    traced_bytes: int
+    traced_peak_bytes: int
+    routes: List[RouteMemoryStats]
+
+
+class MemorySnapshotInfo(BaseModel):
+    id: int
+    taken_at: datetime
+    traced_bytes: int
+    rss_bytes: int
+
+
+class MemoryStat(BaseModel):
+    location: str
+    size_bytes: int
+    count: int
+    size_diff_bytes: Optional[int] = None
+    count_diff: Optional[int] = None
+
+
+class ListQuery(BaseModel):
+    fields: Optional[str] = None
+    include_archived: bool = True
+
+
+class LeaderboardQuery(BaseModel):
+    map: str = Field(..., min_length=1, max_length=100)
+    agent: str = Field(..., min_length=1, max_length=50)
+    limit: int = Field(10, ge=1, le=100)
+
+
+class BatchOperation(BaseModel):
+    id: Optional[str] = Field(None, max_length=64)
+    op: str
+    args: Dict[str, Any] = Field(default_factory=dict)
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=50)
+    parallel_reads: bool = False
+
+
+class BatchResult(BaseModel):
+    id: Optional[str]
+    op: str
+    status: int
+    elapsed_ms: float
+    result: Any = None
+    error: Optional[Any] = None
+
+
+class BatchResponse(BaseModel):
+    committed: bool
+    elapsed_ms: float
+    results: List[BatchResult]
@@ -0,0 +1,255 @@
+"""Setup and rebalancing for user-sharded storage (``ShardMap`` in ``app.database``).
+
+    DATABASE_SHARD_URLS='["sqlite:///./shard0.db", "sqlite:///./shard1.db"]' \\
+        python -m app.sharding status|move USER_ID SHARD|rebalance [--dry-run]
+
+``move_user`` moves one user while the app keeps serving. It freezes the user's
+writes (they get 503 until the move is done; reads keep working), waits
+``drain_seconds`` for requests that resolved the old shard before the freeze,
+copies the rows into the target in one transaction, points the directory at the
+target and only then deletes the old copy. Leaderboard rows are rebuilt from the
+player's score histogram rather than copied, so each shard's ranking histograms
+count exactly the players it holds. An interrupted move can simply be run again.
+"""
+
+import argparse
+import time
+from typing import Dict, List, Mapping, Tuple
+
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from .archive import maintain_partitions
+from .database import (
+    Base,
+    ShardMap,
+    dialect_insert,
+    ensure_server_defaults,
+    fan_out,
+    shard_map,
+)
+from .leaderboard import ScoreKey, apply_score_deltas
+from .models import PlayerScoreBucket, User, UserShard
+
+# A user's rows, in insert order; deleted in reverse.
+COPIED_TABLES = (
+    "users",
+    "matches",
+    "match_rounds",
+    "strategies",
+    "sessions",
+    "sync_versions",
+    "sync_log",
+)
+STAT_TABLES = ("users", "matches", "strategies", "sessions")
+REBALANCE_BATCH = 50
+
+
+def init_shards(shards: ShardMap) -> None:
+    for engine in shards.engines.values():
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            ensure_server_defaults(connection)
+        maintain_partitions(engine)
+
+
+def place_user(db: Session, user: Mapping) -> None:
+    """Copy a new user's ``users`` row to their shard and record it (no-op unsharded).
+
+    The session would commit the directory and the shard one after the other,
+    without two-phase commit, so the shard row is committed on its own first: a
+    user the directory knows always has it. If the directory commit then fails,
+    the leftover row is replaced by the next signup given that id or name.
+    """
+    shards = getattr(db, "shards", None)
+    if not shards:
+        return
+    shard = shards.home(user["id"])
+    users = User.__table__
+    with shards.engines[shard].begin() as connection:
+        connection.execute(
+            delete(users).where(
+                or_(
+                    users.c.id == user["id"],
+                    users.c.username == user["username"],
+                    users.c.email == user["email"],
+                )
+            )
+        )
+        connection.execute(insert(users).values(**user))
+    db.execute(insert(UserShard.__table__).values(user_id=user["id"], shard=shard))
+
+
+def shard_stats(db: Session) -> List[dict]:
+    shards = getattr(db, "shards", None)
+
+    def count(shard_db: Session) -> dict:
+        # On the shard's own connection: a query on ``users`` alone would go to
+        # the directory.
+        connection = shard_db.connection()
+        return {
+            name: connection.execute(
+                select(func.count()).select_from(Base.metadata.tables[name])
+            ).scalar()
+            for name in STAT_TABLES
+        }
+
+    names = list(shards.engines) if shards else ["primary"]
+    return [{"shard": name, **counts} for name, counts in zip(names, fan_out(db, count))]
+
+
+def _user_rows(table, user_id: int):
+    if table.name == "users":
+        return table.c.id == user_id
+    return table.c.user_id == user_id
+
+
+def _score_counts(connection, user_id: int) -> Dict[ScoreKey, int]:
+    buckets = PlayerScoreBucket.__table__
+    rows = connection.execute(
+        select(buckets.c.map, buckets.c.agent, buckets.c.score, buckets.c.count).where(
+            (buckets.c.user_id == user_id) & (buckets.c.count > 0)
+        )
+    )
+    return {(user_id, map_name, agent, score): count for map_name, agent, score, count in rows}
+
+
+def _remove_user(connection, user_id: int) -> None:
+    counts = _score_counts(connection, user_id)
+    apply_score_deltas(connection, {key: -count for key, count in counts.items()})
+    buckets = PlayerScoreBucket.__table__
+    connection.execute(delete(buckets).where(buckets.c.user_id == user_id))
+    for name in reversed(COPIED_TABLES):
+        table = Base.metadata.tables[name]
+        connection.execute(delete(table).where(_user_rows(table, user_id)))
+
+
+def _copy_user(source, target, user_id: int) -> None:
+    for name in COPIED_TABLES:
+        table = Base.metadata.tables[name]
+        rows = source.execute(select(table).where(_user_rows(table, user_id))).mappings().all()
+        if rows:
+            target.execute(insert(table), [dict(row) for row in rows])
+    apply_score_deltas(target, _score_counts(source, user_id))
+
+
+def _place(shards: ShardMap, user_id: int, **values) -> None:
+    placements = UserShard.__table__
+    with shards.directory.begin() as connection:
+        stmt = dialect_insert(connection, placements).values(user_id=user_id, **values)
+        connection.execute(
+            stmt.on_conflict_do_update(index_elements=[placements.c.user_id], set_=values)
+        )
+
+
+def _empty_previous(shards: ShardMap, user_id: int, previous: str) -> None:
+    with shards.engines[previous].begin() as connection:
+        _remove_user(connection, user_id)
+    placements = UserShard.__table__
+    with shards.directory.begin() as connection:
+        connection.execute(
+            update(placements).where(placements.c.user_id == user_id).values(previous=None)
+        )
+
+
+def _freeze(shards: ShardMap, user_id: int) -> str:
+    """Freeze the user's writes and return the shard holding their rows."""
+    placements = UserShard.__table__
+    with shards.directory.connect() as connection:
+        row = connection.execute(
+            select(placements).where(placements.c.user_id == user_id)
+        ).first()
+    source = shards.home(user_id) if row is None else row.shard
+    if row is not None and row.previous not in (None, source):
+        _empty_previous(shards, user_id, row.previous)  # an earlier move stopped short
+    _place(shards, user_id, shard=source, moving=True, previous=None)
+    return source
+
+
+def move_user(shards: ShardMap, user_id: int, target: str, drain_seconds: float = 5.0) -> bool:
+    """Move a user's rows to ``target``; returns False when they already live there."""
+    if target not in shards.engines:
+        raise ValueError(f"Unknown shard {target!r}")
+    source = _freeze(shards, user_id)
+    if source == target:
+        _place(shards, user_id, shard=source, moving=False)
+        return False
+    time.sleep(drain_seconds)
+    try:
+        with shards.engines[source].connect() as src, shards.engines[target].begin() as dst:
+            _remove_user(dst, user_id)  # leftovers of an interrupted copy
+            _copy_user(src, dst, user_id)
+    except BaseException:
+        _place(shards, user_id, shard=source, moving=False)
+        raise
+    _place(shards, user_id, shard=target, moving=False, previous=source)
+    _empty_previous(shards, user_id, source)
+    return True
+
+
+def misplaced_users(shards: ShardMap) -> List[Tuple[int, str, str]]:
+    """``(user_id, shard, ring's shard)`` for users not where the hash ring puts them."""
+    users, placements = User.__table__, UserShard.__table__
+    with shards.directory.connect() as connection:
+        rows = connection.execute(
+            select(users.c.id, placements.c.shard)
+            .outerjoin(placements, placements.c.user_id == users.c.id)
+            .order_by(users.c.id)
+        ).all()
+    moves = []
+    for user_id, shard in rows:
+        home = shards.home(user_id)
+        if (shard or home) != home:
+            moves.append((user_id, shard, home))
+    return moves
+
+
+def rebalance(shards: ShardMap, drain_seconds: float = 5.0) -> List[Tuple[int, str, str]]:
+    """Move every misplaced user to the ring's shard, e.g. after adding a shard.
+
+    Users are frozen in batches so one drain wait covers a whole batch.
+    """
+    moves = misplaced_users(shards)
+    for start in range(0, len(moves), REBALANCE_BATCH):
+        batch = moves[start : start + REBALANCE_BATCH]
+        for user_id, _, _ in batch:
+            _freeze(shards, user_id)
+        time.sleep(drain_seconds)
+        for user_id, _, target in batch:
+            move_user(shards, user_id, target, drain_seconds=0)
+    return moves
+
+
+def main() -> None:  # pragma: no cover
+    parser = argparse.ArgumentParser(description="Inspect and rebalance user shards.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status")
+    move = commands.add_parser("move")
+    move.add_argument("user_id", type=int)
+    move.add_argument("shard")
+    move.add_argument("--drain-seconds", type=float, default=5.0)
+    balance = commands.add_parser("rebalance")
+    balance.add_argument("--dry-run", action="store_true")
+    balance.add_argument("--drain-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if not shard_map:
+        parser.error("DATABASE_SHARD_URLS is not set")
+    init_shards(shard_map)
+    if args.command == "status":
+        with shard_map.session() as db:
+            for stats in shard_stats(db):
+                print(" ".join(f"{key}={value}" for key, value in stats.items()))
+        print(f"misplaced users: {len(misplaced_users(shard_map))}")
+    elif args.command == "move":
+        moved = move_user(shard_map, args.user_id, args.shard, args.drain_seconds)
+        print(f"moved user {args.user_id} to {args.shard}" if moved else "nothing to move")
+    else:
+        moves = misplaced_users(shard_map) if args.dry_run else rebalance(shard_map, args.drain_seconds)
+        for user_id, shard, target in moves:
+            print(f"user {user_id}: {shard} -> {target}")
+        print(f"{len(moves)} users {'to move' if args.dry_run else 'moved'}")
+
+
+if __name__ == "__main__":
+    main()
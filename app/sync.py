@@ -0,0 +1,162 @@
+"""Per-user change feed for offline clients.
+
+Every create/update/delete of a match, strategy or session bumps the owner's
+counter in ``sync_versions`` and stamps the row's ``sync_log`` entry with the new
+version, inside the writing transaction. ``changes_since`` then returns the rows
+changed after a client's last version (read from the archive for rows moved there
+since, see ``app.archive``) plus tombstones for deleted ones. Bumping the counter locks the
+user's ``sync_versions`` row, so versions become visible in commit order and a
+client cursor never skips a concurrent write.
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from sqlalchemy import and_, select
+from sqlalchemy.orm import Session
+
+from .archive import PARTITIONED_MODELS, archived_rows
+from .core.changes import Change, on_flush
+from .database import dialect_insert, shard_sessions
+from .models import Match, Session as ValorantSession, Strategy, SyncChange, SyncVersion
+
+SYNCED_MODELS = {model.__tablename__: model for model in (Match, Strategy, ValorantSession)}
+
+
+def _reserve_versions(connection, user_id: int, count: int) -> int:
+    """Advance ``user_id``'s counter by ``count`` and return its new value."""
+    table = SyncVersion.__table__
+    stmt = dialect_insert(connection, table).values(user_id=user_id, version=count)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id], set_={"version": table.c.version + count}
+    ).returning(table.c.version)
+    return connection.execute(stmt).scalar_one()
+
+
+def log_changes(connection, changes: List[Change]) -> None:
+    by_user: Dict[int, Dict[Tuple[str, int], bool]] = defaultdict(dict)
+    for change in changes:
+        # Archiving moves a row without changing it; clients keep their copy.
+        if change.entity in SYNCED_MODELS and change.op != "archive":
+            by_user[change.user_id][(change.entity, change.id)] = change.op == "delete"
+
+    table = SyncChange.__table__
+    for user_id, entries in by_user.items():
+        first = _reserve_versions(connection, user_id, len(entries)) - len(entries) + 1
+        rows = [
+            {
+                "user_id": user_id,
+                "entity": entity,
+                "entity_id": entity_id,
+                "version": first + offset,
+                "deleted": deleted,
+            }
+            for offset, ((entity, entity_id), deleted) in enumerate(entries.items())
+        ]
+        stmt = dialect_insert(connection, table).values(rows)
+        connection.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[column.name for column in table.primary_key],
+                set_={"version": stmt.excluded.version, "deleted": stmt.excluded.deleted},
+            )
+        )
+
+
+@on_flush
+def record_sync_changes(session: Session, changes: List[Change]) -> None:
+    log_changes(session.connection(), changes)
+
+
+def latest_version(db: Session, user_id: int) -> int:
+    version = db.execute(
+        select(SyncVersion.version).where(SyncVersion.user_id == user_id)
+    ).scalar()
+    return version or 0
+
+
+def changed_rows(db: Session, user_id: int, entity: str, since: int) -> List[Tuple[int, bool]]:
+    """``(id, deleted)`` for each of the user's ``entity`` rows written after ``since``."""
+    return [
+        tuple(row)
+        for row in db.execute(
+            select(SyncChange.entity_id, SyncChange.deleted).where(
+                SyncChange.user_id == user_id,
+                SyncChange.entity == entity,
+                SyncChange.version > since,
+            )
+        )
+    ]
+
+
+def changes_since(db: Session, user_id: int, since: int, limit: int) -> dict:
+    """Up to ``limit`` changes after ``since``, oldest first.
+
+    ``version`` is the cursor for the next call; ``more`` says whether another
+    batch is already waiting.
+    """
+    entries = db.execute(
+        select(SyncChange)
+        .where(SyncChange.user_id == user_id, SyncChange.version > since)
+        .order_by(SyncChange.version)
+        .limit(limit + 1)
+    ).scalars().all()
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    upserts: Dict[str, list] = {entity: [] for entity in SYNCED_MODELS}
+    deletes: Dict[str, List[int]] = {entity: [] for entity in SYNCED_MODELS}
+    changed: Dict[str, List[int]] = defaultdict(list)
+    for entry in entries:
+        if entry.deleted:
+            deletes[entry.entity].append(entry.entity_id)
+        else:
+            changed[entry.entity].append(entry.entity_id)
+    for entity, ids in changed.items():
+        model = SYNCED_MODELS[entity]
+        rows = (
+            db.query(model)
+            .filter(model.user_id == user_id, model.id.in_(ids))
+            .order_by(model.id)
+            .all()
+        )
+        if len(rows) < len(ids) and model in PARTITIONED_MODELS:
+            missing = set(ids) - {row.id for row in rows}
+            rows += [row for row in archived_rows(db, model, user_id) if row["id"] in missing]
+        upserts[entity] = rows
+
+    return {
+        "version": entries[-1].version if entries else since,
+        "latest": latest_version(db, user_id),
+        "more": more,
+        "upserts": upserts,
+        "deletes": deletes,
+    }
+
+
+def backfill(db: Session) -> None:
+    """Log rows written before the feed existed so a ``since=0`` sync includes them."""
+    for entity, model in SYNCED_MODELS.items():
+        rows = db.execute(
+            select(model.id, model.user_id)
+            .outerjoin(
+                SyncChange,
+                and_(
+                    SyncChange.user_id == model.user_id,
+                    SyncChange.entity == entity,
+                    SyncChange.entity_id == model.id,
+                ),
+            )
+            .where(SyncChange.entity_id.is_(None))
+            .order_by(model.id)
+        )
+        log_changes(
+            db.connection(),
+            [Change("create", entity, row_id, user_id) for row_id, user_id in rows],
+        )
+    db.commit()
+
+
+if __name__ == "__main__":
+    for session in shard_sessions():  # pragma: no cover
+        with session:
+            backfill(session)
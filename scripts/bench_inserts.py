@@ -0,0 +1,124 @@
+"""Compare the create path before and after ``INSERT ... RETURNING``.
+
+    DATABASE_URL=sqlite:///./bench.db JWT_SECRET_KEY=x JWT_REFRESH_SECRET_KEY=x \
+        python scripts/bench_inserts.py --rows 5000
+
+"legacy" is the old ``add``/``commit``/``refresh`` sequence; "returning" flushes
+(one ``INSERT ... RETURNING`` that brings back the server defaults), serialises
+the response and then commits. Both run in the app's session class with every
+flush hook loaded, and "route" posts to ``POST /matches/`` itself (token lookup
+included), so the counts cover the whole write: the ``matches`` statements plus
+the leaderboard and sync upkeep that commits with them. Uses ``--database-url``
+(default: a temporary SQLite file) so it never touches app data.
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from typing import List
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.auth import create_access_token  # noqa: E402
+from app.database import Base, get_db, get_sessionmaker  # noqa: E402
+from app.main import app  # noqa: E402  (registers the routes' flush hooks)
+from app.models import Match, User  # noqa: E402
+from app.schemas import MatchResponse  # noqa: E402
+
+ON_MATCHES = re.compile(r"\b(FROM|INTO|UPDATE) matches\b")
+
+
+def legacy(db: Session, user_id: int) -> MatchResponse:
+    match = Match(map="Bind", agent="Sage", score=5, user_id=user_id)
+    db.add(match)
+    db.commit()
+    db.refresh(match)
+    return MatchResponse.model_validate(match)
+
+
+def returning(db: Session, user_id: int) -> MatchResponse:
+    match = Match(map="Bind", agent="Sage", score=5, user_id=user_id)
+    db.add(match)
+    db.flush()
+    response = MatchResponse.model_validate(match)
+    db.commit()
+    return response
+
+
+def report(name: str, statements: List[str], rows: int, elapsed: float) -> None:
+    on_matches = sum(1 for statement in statements if ON_MATCHES.search(statement))
+    print(
+        f"{name:>9}: {len(statements) / rows:.1f} statements/create "
+        f"({on_matches / rows:.1f} on matches), "
+        f"{elapsed / rows * 1e6:,.0f} us/create, "
+        f"{rows / elapsed:,.0f} creates/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    directory = tempfile.TemporaryDirectory()
+    url = args.database_url or f"sqlite:///{os.path.join(directory.name, 'bench.db')}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    factory = get_sessionmaker(engine)
+    statements: List[str] = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *rest: statements.append(statement),
+    )
+
+    with factory() as db:
+        user = User(username="bench", email="bench@valorant.app", hashed_password="x")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+        token = create_access_token(user)
+
+    for name, create in (("legacy", legacy), ("returning", returning)):
+        with factory() as db:
+            db.info["user_id"] = user_id
+            statements.clear()
+            started = time.perf_counter()
+            for _ in range(args.rows):
+                response = create(db, user_id)
+            elapsed = time.perf_counter() - started
+        assert response.created_at is not None
+        report(name, statements, args.rows, elapsed)
+
+    def bench_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = bench_db
+    headers = {"Authorization": f"Bearer {token}"}
+    match = {"map": "Bind", "agent": "Sage", "score": 5}
+    with TestClient(app) as client:
+        statements.clear()
+        started = time.perf_counter()
+        for _ in range(args.rows):
+            assert client.post("/matches/", json=match, headers=headers).status_code == 201
+        elapsed = time.perf_counter() - started
+    app.dependency_overrides.pop(get_db, None)
+    report("route", statements, args.rows, elapsed)
+    engine.dispose()
+    directory.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Measure round-event ingest throughput.
+
+    DATABASE_URL=sqlite:///./bench.db JWT_SECRET_KEY=x JWT_REFRESH_SECRET_KEY=x \
+        python scripts/bench_match_events.py --events 1000000
+
+Uses ``--database-url`` (default: in-memory SQLite) so it never touches app data.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import Base  # noqa: E402
+from app.match_events import (  # noqa: E402
+    EVENT_KINDS,
+    RECORD,
+    decode_events,
+    encode_events,
+    ingest_events,
+)
+from app.models import Match, MatchRound, User  # noqa: E402
+
+
+def synthetic_events(count: int, rounds: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    events = np.empty(count, dtype=RECORD)
+    events["round"] = rng.integers(1, rounds + 1, count)
+    events["time_ms"] = rng.integers(0, 100_000, count)
+    events["kind"] = rng.integers(0, len(EVENT_KINDS), count)
+    events["actor"] = rng.integers(0, 10, count)
+    events["target"] = rng.integers(0, 10, count)
+    events["value"] = rng.integers(0, 9000, count)
+    return events
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=500_000)
+    parser.add_argument("--rounds", type=int, default=24)
+    parser.add_argument("--matches", type=int, default=5)
+    parser.add_argument("--database-url", default="sqlite://")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(engine)
+    payloads = [
+        encode_events(synthetic_events(args.events // args.matches, args.rounds, seed))
+        for seed in range(args.matches)
+    ]
+
+    with Session(engine) as db:
+        user = User(username="bench", email="bench@valorant.app", hashed_password="x")
+        matches = [Match(map="Bind", agent="Sage", score=5, user=user) for _ in payloads]
+        db.add_all(matches)
+        db.commit()
+
+        user_id, match_ids = user.id, [match.id for match in matches]
+        started = time.perf_counter()
+        for match_id, payload in zip(match_ids, payloads):
+            ingest_events(db, user_id, match_id, decode_events(payload))
+            db.commit()
+        elapsed = time.perf_counter() - started
+
+        stored = db.execute(select(func.sum(func.length(MatchRound.events)))).scalar()
+
+    total = sum(len(payload) - 4 for payload in payloads) // RECORD.itemsize
+    print(f"ingested {total} events in {elapsed:.3f}s: {total / elapsed:,.0f} events/s")
+    print(f"wire {RECORD.itemsize} B/event, stored {stored / total:.2f} B/event")
+
+
+if __name__ == "__main__":
+    main()
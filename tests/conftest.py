@@ -5,7 +5,10 @@ from sqlalchemy.pool import StaticPool
 from sqlalchemy.orm import sessionmaker
 
 from app.database import Base, get_db
+from app.analytics import columns_cache
+from app.core.cache import query_cache
 from app.main import app
+from app.recommendations import indexes as recommendation_indexes
 
 TEST_DATABASE_URL = "sqlite:///:memory:"
 engine = create_engine(
@@ -44,3 +47,6 @@ def clean_tables():
     with engine.begin() as connection:
         for table in reversed(Base.metadata.sorted_tables):
             connection.execute(table.delete())
+    recommendation_indexes.clear()
+    columns_cache.clear()
+    query_cache.clear()
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.analytics import MatchColumns, columns_cache
+
+from ..conftest import engine
+from .test_auth_matches import authenticate
+
+
+def test_match_stats_follow_writes(client, monkeypatch):
+    monkeypatch.setattr(columns_cache, "max_bytes", 1 << 20)
+    tokens = authenticate(client, "statscoach")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    logged = [("Bind", "Sage", 4), ("Bind", "Jett", 8), ("Haven", "Sage", 6)]
+    ids = [
+        client.post(
+            "/matches/", json={"map": map_name, "agent": agent, "score": score}, headers=headers
+        ).json()["id"]
+        for map_name, agent, score in logged
+    ]
+
+    stats = client.get("/analytics/matches?group_by=map", headers=headers).json()
+    assert stats == {
+        "matches": 3,
+        "groups": [
+            {"map": "Bind", "matches": 2, "average": 6.0, "best": 8},
+            {"map": "Haven", "matches": 1, "average": 6.0, "best": 6},
+        ],
+    }
+
+    client.patch(f"/matches/{ids[0]}", json={"agent": "Jett"}, headers=headers)
+    client.delete(f"/matches/{ids[2]}", headers=headers)
+    stats = client.get(
+        "/analytics/matches?agent=Jett&agent=Omen&min_score=1&group_by=map&group_by=agent",
+        headers=headers,
+    ).json()
+    assert stats["groups"] == [
+        {"map": "Bind", "agent": "Jett", "matches": 2, "average": 6.0, "best": 8}
+    ]
+    assert columns_cache.nbytes > 0
+
+
+def test_columns_group_only_the_groups_that_occur():
+    columns = MatchColumns()
+    start = datetime(2025, 1, 1)
+    maps, agents = ["Bind", "Haven", "Split", "Ascent"], ["Sage", "Jett", "Omen"]
+    columns.append(
+        [
+            (i, maps[i % 4], agents[i % 3], i % 11, start + timedelta(minutes=i))
+            for i in range(100_000)
+        ]
+    )
+    result = columns.query(
+        maps=["Bind", "Split"], min_score=5, since=start, group_by=["map", "agent"]
+    )
+    assert len(result["groups"]) == 6
+    assert sum(group["matches"] for group in result["groups"]) == result["matches"]
+    assert columns.query(group_by=["month"])["groups"][0]["month"] == "2025-01"
+
+    columns.append(
+        [
+            (-1, "Pearl", "Sova", 3, datetime(1900, 1, 1)),
+            (-2, "Pearl", "Sova", 7, datetime(2200, 1, 1)),
+        ]
+    )
+    wide = columns.query(maps=["Pearl"], group_by=["day", "map", "agent", "day"])
+    assert [(group["day"], group["best"]) for group in wide["groups"]] == [
+        ("1900-01-01", 3),
+        ("2200-01-01", 7),
+    ]
+
+
+def test_repeated_queries_read_cached_columns(client, monkeypatch):
+    monkeypatch.setattr(columns_cache, "max_bytes", 1 << 20)
+    tokens = authenticate(client, "cachedstats")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    for score in (3, 9):
+        match = {"map": "Lotus", "agent": "Raze", "score": score}
+        client.post("/matches/", json=match, headers=headers)
+    assert client.get("/analytics/matches", headers=headers).json()["matches"] == 2
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        stats = client.get("/analytics/matches?group_by=map", headers=headers).json()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert stats["groups"] == [{"map": "Lotus", "matches": 2, "average": 6.0, "best": 9}]
+    assert not [sql for sql in statements if "FROM matches" in sql]
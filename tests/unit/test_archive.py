@@ -0,0 +1,107 @@
+from datetime import date, datetime
+import json
+import os
+
+import numpy as np
+from sqlalchemy import func, select, update
+
+from app.analytics import columns_cache
+from app.archive import archive_partitions
+from app.core.config import get_settings
+from app.leaderboard import rebuild
+from app.match_events import MEDIA_TYPE, RECORD, encode_events
+from app.models import (
+    ArchivedPartition,
+    Match,
+    MatchRound,
+    PlayerScore,
+    PlayerScoreBucket,
+    ScoreBucket,
+)
+
+from ..conftest import TestingSessionLocal
+from .test_auth_matches import authenticate
+
+
+def test_archived_months_stay_visible_in_lists(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(get_settings(), "ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(columns_cache, "max_bytes", 1 << 20)
+    auth = authenticate(client, "veteran")
+    headers = {"Authorization": f"Bearer {auth['access_token']}"}
+    other = authenticate(client, "rookie")
+    other_headers = {"Authorization": f"Bearer {other['access_token']}"}
+
+    ids = []
+    for map_name, month in (("Bind", 1), ("Haven", 2), ("Split", None)):
+        created = client.post(
+            "/matches", json={"map": map_name, "agent": "Sova", "score": 5}, headers=headers
+        ).json()
+        ids.append(created["id"])
+        if month is not None:
+            with TestingSessionLocal() as db:
+                db.execute(
+                    update(Match)
+                    .where(Match.id == created["id"])
+                    .values(created_at=datetime(2024, month, 15, 12, 0))
+                )
+                db.commit()
+    client.post("/matches", json={"map": "Pearl", "agent": "Fade", "score": 4}, headers=other_headers)
+    events = np.array([(1, 0, 0, 255, 255, 0), (1, 900, 5, 1, 255, 0)], dtype=RECORD)
+    client.post(
+        f"/matches/{ids[0]}/events",
+        content=encode_events(events),
+        headers={**headers, "Content-Type": MEDIA_TYPE},
+    )
+    cursor = client.get("/sync/", headers=headers).json()["version"]
+    assert client.get("/analytics/matches", headers=headers).json()["matches"] == 3
+
+    with TestingSessionLocal() as db:
+        archived = archive_partitions(db, before=date(2024, 6, 1))
+        assert [(partition.month, partition.row_count) for partition in archived] == [
+            (date(2024, 1, 1), 1),
+            (date(2024, 2, 1), 1),
+        ]
+        assert db.execute(select(func.count()).select_from(Match)).scalar() == 2
+        assert db.execute(select(func.count()).select_from(ArchivedPartition)).scalar() == 2
+        assert db.execute(select(func.count()).select_from(MatchRound)).scalar() == 1
+    assert os.listdir(tmp_path / "matches" / "2024-01") == [f"{auth['user_id']}.json.gz"]
+
+    listed = client.get("/matches", headers=headers).json()
+    assert [match["map"] for match in listed] == ["Split", "Haven", "Bind"]
+    assert listed[2]["created_at"].startswith("2024-01-15T12:00")
+
+    dashboard = client.get("/dashboard", headers=headers).json()
+    assert len(dashboard["matches"]) == 3
+    assert len(client.get("/matches", headers=other_headers).json()) == 1
+    hot = client.get("/matches?include_archived=false", headers=headers).json()
+    assert [match["map"] for match in hot] == ["Split"]
+    assert client.get("/analytics/matches", headers=headers).json()["matches"] == 3
+
+    assert client.get(f"/sync/?since={cursor}", headers=headers).json()["version"] == cursor
+    full = client.get("/sync/", headers=headers).json()
+    assert sorted(match["id"] for match in full["upserts"]["matches"]) == sorted(ids)
+    timeline = client.get(f"/matches/{ids[0]}/timeline", headers=headers)
+    assert [json.loads(line)["time_ms"] for line in timeline.text.splitlines()] == [[0, 900]]
+
+    bind = {"map": "Bind", "agent": "Sova"}
+    assert client.get("/leaderboards/me", params=bind, headers=headers).json()["matches"] == 1
+    with TestingSessionLocal() as db:
+        tables = (ScoreBucket, PlayerScoreBucket, PlayerScore)
+        before = [sorted(db.execute(select(*model.__table__.c)).all()) for model in tables]
+        rebuild(db)
+        assert [sorted(db.execute(select(*model.__table__.c)).all()) for model in tables] == before
+
+    # Archived rows cannot be edited, but can be deleted like hot ones.
+    assert client.patch(f"/matches/{ids[0]}", json={"score": 9}, headers=headers).status_code == 404
+    assert client.delete(f"/matches/{ids[0]}", headers=headers).status_code == 204
+    assert client.delete(f"/matches/{ids[0]}", headers=headers).status_code == 404
+    assert [match["map"] for match in client.get("/matches", headers=headers).json()] == ["Split", "Haven"]
+    assert not (tmp_path / "matches" / "2024-01" / f"{auth['user_id']}.json.gz").exists()
+    changes = client.get(f"/sync/?since={cursor}", headers=headers).json()
+    assert changes["deletes"]["matches"] == [ids[0]]
+    assert client.get("/analytics/matches", headers=headers).json()["matches"] == 2
+    assert client.get("/leaderboards/me", params=bind, headers=headers).status_code == 404
+    with TestingSessionLocal() as db:
+        assert db.execute(select(func.count()).select_from(MatchRound)).scalar() == 0
+        counts = db.execute(select(ArchivedPartition.row_count).order_by(ArchivedPartition.month))
+        assert counts.scalars().all() == [0, 1]
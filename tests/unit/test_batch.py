@@ -0,0 +1,57 @@
+from .test_auth_matches import authenticate
+
+
+def test_batch_runs_creates_and_reads_in_one_transaction(client):
+    auth = authenticate(client, "batchcoach")
+    headers = {"Authorization": f"Bearer {auth['access_token']}"}
+
+    response = client.post(
+        "/batch",
+        json={
+            "operations": [
+                {"id": "m", "op": "matches.create", "args": {"map": "Icebox", "agent": "Viper", "score": 8}},
+                {"id": "s", "op": "strategies.create", "args": {"title": "B split"}},
+                {"id": "list", "op": "matches.list"},
+                {"op": "leaderboards.me", "args": {"map": "Icebox", "agent": "Viper"}},
+            ]
+        },
+        headers=headers,
+    )
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["committed"] is True
+    statuses = [result["status"] for result in payload["results"]]
+    assert statuses == [201, 201, 200, 200]
+    assert all(result["elapsed_ms"] >= 0 for result in payload["results"])
+    assert payload["results"][2]["result"][0]["map"] == "Icebox"
+    assert payload["results"][3]["result"]["rank"] == 1
+    assert len(client.get("/strategies", headers=headers).json()) == 1
+
+
+def test_batch_rolls_back_when_an_operation_fails(client):
+    auth = authenticate(client, "rollbackcoach")
+    headers = {"Authorization": f"Bearer {auth['access_token']}"}
+
+    response = client.post(
+        "/batch",
+        json={
+            "operations": [
+                {"op": "matches.create", "args": {"map": "Lotus", "agent": "Gekko", "score": 3}},
+                {"op": "leaderboards.me", "args": {"map": "Sunset", "agent": "Gekko"}},
+                {"op": "matches.list"},
+            ]
+        },
+        headers=headers,
+    )
+    payload = response.json()
+    assert payload["committed"] is False
+    assert [result["status"] for result in payload["results"]] == [201, 404, 424]
+    assert client.get("/matches", headers=headers).json() == []
+
+    invalid = client.post(
+        "/batch",
+        json={"operations": [{"op": "matches.create", "args": {"map": "Lotus"}}, {"op": "nope"}]},
+        headers=headers,
+    )
+    assert invalid.status_code == 422
+    assert [error["index"] for error in invalid.json()["detail"]] == [0, 1]
@@ -0,0 +1,78 @@
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.bulk import _update_with_old_values
+from app.models import Match
+
+from .test_auth_matches import authenticate
+
+
+def _headers(client, username):
+    tokens = authenticate(client, username)
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+def _log_match(client, headers, map_name, score):
+    payload = {"map": map_name, "agent": "Sage", "score": score}
+    return client.post("/matches/", json=payload, headers=headers).json()["id"]
+
+
+def test_patch_and_delete_single_rows(client):
+    headers = _headers(client, "bulkcoach")
+    other = _headers(client, "bulkrival")
+    match_id = _log_match(client, headers, "Bind", 4)
+
+    response = client.patch(
+        f"/matches/{match_id}", json={"score": 8, "notes": None}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["score"] == 8
+    assert client.patch(f"/matches/{match_id}", json={"map": None}, headers=headers).status_code == 422
+    assert client.patch(f"/matches/{match_id}", json={}, headers=headers).status_code == 422
+    assert client.patch(f"/matches/{match_id}", json={"score": 1}, headers=other).status_code == 404
+
+    best = client.get("/leaderboards/me?map=Bind&agent=Sage", headers=headers).json()
+    assert best["best"] == 8
+
+    assert client.delete(f"/matches/{match_id}", headers=other).status_code == 404
+    assert client.delete(f"/matches/{match_id}", headers=headers).status_code == 204
+    assert client.get("/matches/", headers=headers).json() == []
+    assert client.get("/leaderboards/me?map=Bind&agent=Sage", headers=headers).status_code == 404
+
+
+def test_bulk_update_and_delete_keep_aggregates_consistent(client):
+    headers = _headers(client, "bulkcoach2")
+    ids = [_log_match(client, headers, "Bind", score) for score in (3, 5)]
+    haven = _log_match(client, headers, "Haven", 9)
+    cursor = client.get("/sync/", headers=headers).json()["version"]
+
+    assert client.post("/matches/bulk-delete", json={}, headers=headers).status_code == 422
+    response = client.post(
+        "/matches/bulk-update",
+        json={"filter": {"map": "Bind"}, "values": {"map": "Lotus"}},
+        headers=headers,
+    )
+    assert response.json() == {"affected": 2, "ids": sorted(ids)}
+    lotus = client.get("/leaderboards/me?map=Lotus&agent=Sage", headers=headers).json()
+    assert (lotus["best"], lotus["matches"]) == (5, 2)
+    assert client.get("/leaderboards/me?map=Bind&agent=Sage", headers=headers).status_code == 404
+
+    response = client.post(
+        "/matches/bulk-delete", json={"ids": ids + [haven], "map": "Lotus"}, headers=headers
+    )
+    assert response.json() == {"affected": 2, "ids": sorted(ids)}
+    assert [row["id"] for row in client.get("/matches/", headers=headers).json()] == [haven]
+    assert client.get("/leaderboards/me?map=Lotus&agent=Sage", headers=headers).status_code == 404
+
+    delta = client.get(f"/sync/?since={cursor}", headers=headers).json()
+    assert sorted(delta["deletes"]["matches"]) == sorted(ids)
+    assert delta["upserts"]["matches"] == []
+
+
+def test_postgres_update_returns_old_values_in_one_statement():
+    table = Match.__table__
+    matched = select(table.c.id, table.c.score).where(table.c.user_id == 1).with_for_update()
+    sql = str(_update_with_old_values(table, matched, {"score": 3}).compile(dialect=postgresql.dialect()))
+    assert sql.startswith("WITH old_rows AS")
+    assert "FOR UPDATE" in sql and "FROM old_rows" in sql
+    assert sql.endswith("old_rows.score AS old_score")
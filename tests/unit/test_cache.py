@@ -0,0 +1,188 @@
+import fnmatch
+import socketserver
+import threading
+import time
+
+import pytest
+from sqlalchemy import event
+
+from app.core.cache import MemoryBackend, QueryCache, RedisBackend
+
+from ..conftest import TestingSessionLocal, engine
+from .test_auth_matches import authenticate
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    """Just enough of the Redis protocol for ``RedisBackend``."""
+
+    def command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def bulk(self, value):
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def handle(self):
+        data = self.server.data
+        while True:
+            args = self.command()
+            if args is None:
+                return
+            name = args[0].upper()
+            if name == b"GET":
+                reply = self.bulk(data.get(args[1]))
+            elif name == b"SET":
+                data[args[1]] = args[2]
+                reply = b"+OK\r\n"
+            elif name == b"INCRBY":
+                data[args[1]] = b"%d" % (int(data.get(args[1], 0)) + int(args[2]))
+                reply = b":" + data[args[1]] + b"\r\n"
+            elif name == b"SCAN":
+                pattern = args[args.index(b"MATCH") + 1].decode()
+                keys = [k for k in data if fnmatch.fnmatch(k.decode(), pattern)]
+                reply = b"*2\r\n$1\r\n0\r\n*%d\r\n" % len(keys) + b"".join(map(self.bulk, keys))
+            elif name == b"DEL":
+                removed = sum(data.pop(key, None) is not None for key in args[1:])
+                reply = b":%d\r\n" % removed
+            else:
+                reply = b"+OK\r\n"
+            self.wfile.write(reply)
+
+
+@pytest.fixture
+def redis_stand_in():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), RespHandler)
+    server.daemon_threads = True
+    server.data = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"redis://127.0.0.1:{server.server_address[1]}/0"
+    server.shutdown()
+    server.server_close()
+
+
+def _select_count(client, url, headers):
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        body = client.get(url, headers=headers).json()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return body, sum("FROM matches" in s for s in statements)
+
+
+def test_list_served_from_cache_until_write(client):
+    tokens = authenticate(client, "cachecoach")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    client.post("/matches/", json={"map": "Bind", "agent": "Sage", "score": 5}, headers=headers)
+
+    first, queried = _select_count(client, "/matches/", headers)
+    assert queried == 1
+    second, queried = _select_count(client, "/matches/?fields=id,map", headers)
+    assert queried == 1
+    third, queried = _select_count(client, "/matches/", headers)
+    assert queried == 0
+    assert third == first
+    assert set(second[0]) == {"id", "map"}
+
+    client.post("/matches/", json={"map": "Lotus", "agent": "Omen", "score": 8}, headers=headers)
+    fresh, queried = _select_count(client, "/matches/", headers)
+    assert queried == 1
+    assert [match["map"] for match in fresh] == ["Lotus", "Bind"]
+
+    match_id = fresh[0]["id"]
+    client.patch(f"/matches/{match_id}", json={"score": 3}, headers=headers)
+    dashboard = client.get("/dashboard", headers=headers).json()
+    assert dashboard["matches"][0]["score"] == 3
+
+
+def test_concurrent_misses_compute_once():
+    cache = QueryCache(MemoryBackend(1024), ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"value": 1}
+
+    results = []
+    with TestingSessionLocal() as db:
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cache.get_or_compute(db, 1, "slow", (), compute))
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert len(calls) == 1
+    assert results == [{"value": 1}] * 8
+
+
+def test_memory_backend_bounds():
+    backend = MemoryBackend(max_bytes=10)
+    backend.set("a", b"12345", ttl=60)
+    backend.set("b", b"12345", ttl=60)
+    backend.get("a")
+    backend.set("c", b"12345", ttl=60)
+    assert backend.get("b") is None
+    assert backend.get("a") == b"12345" and backend.nbytes == 10
+
+    backend.set("d", b"1", ttl=-1)
+    assert backend.get("d") is None
+
+
+def test_memory_backend_counters_share_the_budget():
+    backend = MemoryBackend(max_bytes=64)
+    for user_id in range(100):
+        backend.incr(f"cache:generation:{user_id}")
+    assert backend.nbytes <= 64
+    assert backend.counter("cache:generation:99") == 100
+    # Evicted: it comes back as a value no entry was ever stored under.
+    assert backend.counter("cache:generation:0") > 100
+
+
+def test_redis_backend_against_stand_in(redis_stand_in):
+    cache = QueryCache(RedisBackend(redis_stand_in), ttl=60)
+    with TestingSessionLocal() as db:
+        assert cache.get_or_compute(db, 7, "stats", (1,), lambda: [1, 2]) == [1, 2]
+        assert cache.get_or_compute(db, 7, "stats", (1,), lambda: [3]) == [1, 2]
+        cache.invalidate(7)
+        assert cache.get_or_compute(db, 7, "stats", (1,), lambda: [3]) == [3]
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 2
+    cache.clear()
+
+
+def test_rolled_back_batch_rows_are_not_cached(client):
+    tokens = authenticate(client, "rollbackcoach")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    client.post("/matches/", json={"map": "Bind", "agent": "Sage", "score": 5}, headers=headers)
+
+    batch = client.post(
+        "/batch",
+        json={
+            "operations": [
+                {"op": "matches.create", "args": {"map": "Pearl", "agent": "Fade", "score": 9}},
+                {"op": "matches.list"},
+                {"op": "strategies.similar", "args": {"strategy_id": 999999}},
+            ]
+        },
+        headers=headers,
+    ).json()
+    assert not batch["committed"]
+    assert [match["map"] for match in batch["results"][1]["result"]] == ["Pearl", "Bind"]
+    assert [match["map"] for match in client.get("/matches/", headers=headers).json()] == ["Bind"]
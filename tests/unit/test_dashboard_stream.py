@@ -0,0 +1,105 @@
+import asyncio
+
+from app import main
+from app.main import app
+from app.routes import valorant_dashboard
+
+from .test_auth_matches import authenticate
+
+
+def _seed(client, username):
+    tokens = authenticate(client, username)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    client.post("/matches/", json={"map": "Icebox", "agent": "Sova", "score": 9}, headers=headers)
+    client.post("/matches/", json={"map": "Icebox", "agent": "Jett", "score": 4}, headers=headers)
+    client.post("/strategies/", json={"title": "B split <fast>"}, headers=headers)
+    client.post(
+        "/sessions/",
+        json={"title": "Aim block", "focus_area": "Crosshair placement", "duration_minutes": 45},
+        headers=headers,
+    )
+    return headers
+
+
+def _body_chunks(path, headers):
+    """Body messages as sent by the app; TestClient would join them into one."""
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"testserver")]
+        + [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": ("testclient", 50000),
+        "server": ("testserver", 80),
+    }
+    messages = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.Event().wait()  # the client never disconnects
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    assert messages[0]["status"] == 200
+    assert dict(messages[0]["headers"])[b"content-type"].startswith(b"text/html")
+    return [m["body"].decode() for m in messages[1:] if m["body"]]
+
+
+def test_dashboard_streams_sections_with_data(client):
+    headers = _seed(client, "streamcoach")
+    chunks = _body_chunks("/dashboard/app", headers)
+
+    # Layout and profile first, then one chunk per section.
+    assert len(chunks) >= 4
+    assert "<header" in chunks[0] and "streamcoach" in chunks[0]
+    assert "Icebox" not in chunks[0]
+    page = "".join(chunks)
+    assert page.index("Icebox") < page.index("B split &lt;fast&gt;") < page.index("Aim block")
+    assert 'id="matchesData"' in page and 'id="sessionsData"' in page
+    assert "<!-- flush -->" not in page
+
+
+def test_dashboard_client_mode_sends_shell(client):
+    headers = _seed(client, "shellcoach")
+    page = client.get("/dashboard/app?render=client", headers=headers).text
+    assert "Loading..." in page
+    assert "Icebox" not in page and 'id="matchesData"' not in page
+
+
+def test_dashboard_section_failure_renders_inline(client, monkeypatch):
+    headers = _seed(client, "brokencoach")
+
+    def broken(db, user_id):
+        raise RuntimeError("strategies unavailable")
+
+    monkeypatch.setattr(main, "query_strategies", broken)
+    page = "".join(_body_chunks("/dashboard/app", headers))
+    assert 'class="empty-state section-error"' in page
+    assert "Icebox" in page and "Aim block" in page
+    assert 'id="strategiesData"' not in page and 'id="sessionsData"' in page
+    assert page.rstrip().endswith("</html>")
+
+
+def test_valorant_dashboard_streams_stats(client, monkeypatch):
+    headers = _seed(client, "statcoach")
+    chunks = _body_chunks("/valorant-dashboard", headers)
+    assert len(chunks) >= 3
+    assert "6.5" not in chunks[0]
+    page = "".join(chunks)
+    assert '<p class="match-score">6.5</p>' in page
+    assert '<p class="match-score">Icebox</p>' in page
+    assert "Aim block" in page
+
+    monkeypatch.setattr(valorant_dashboard, "performance_summary", lambda db, user_id: 1 / 0)
+    page = "".join(_body_chunks("/valorant-dashboard", headers))
+    assert page.count("section-error") == 1
+    assert "Aim block" in page
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+
+from app.core.events import EventHub, RedisBackend
+
+from .test_auth_matches import authenticate
+
+
+def test_hub_drops_slow_consumers():
+    async def scenario():
+        hub = EventHub(queue_size=2)
+        await hub.start()
+        async with hub.subscribe(1) as slow, hub.subscribe(2) as other:
+            for index in range(3):
+                hub.publish(1, f"event-{index}")
+            hub.publish(2, "hello")
+            await asyncio.sleep(0)
+            assert slow.dropped
+            assert await slow.get() is None
+            assert hub.subscriber_count(1) == 0
+            assert await other.get() == "hello"
+        await hub.stop()
+
+    asyncio.run(scenario())
+
+
+def test_websocket_receives_match_delta(client):
+    auth = authenticate(client, "livecoach")
+    headers = {"Authorization": f"Bearer {auth['access_token']}"}
+
+    token = client.post("/events/token", headers=headers).json()["stream_token"]
+
+    with client.websocket_connect(f"/events/ws?stream_token={token}") as socket:
+        created = client.post(
+            "/matches",
+            json={"map": "Split", "agent": "Cypher", "score": 5},
+            headers=headers,
+        ).json()
+        delta = socket.receive_json()
+
+    assert delta["op"] == "create"
+    assert delta["entity"] == "matches"
+    assert delta["id"] == created["id"]
+    assert delta["data"]["map"] == "Split"
+
+
+def test_streams_take_stream_tokens_only(client):
+    auth = authenticate(client, "tokencoach")
+    headers = {"Authorization": f"Bearer {auth['access_token']}"}
+    token = client.post("/events/token", headers=headers).json()
+
+    assert token["expires_in"] == 60
+    # Access tokens are not accepted in the query string, and stream tokens are
+    # good for nothing but streams.
+    assert client.get(f"/events/stream?stream_token={auth['access_token']}").status_code == 401
+    assert client.get(
+        "/matches", headers={"Authorization": f"Bearer {token['stream_token']}"}
+    ).status_code == 401
+
+
+class FlakyPubSub:
+    def __init__(self, messages, fail):
+        self.messages = messages
+        self.fail = fail
+
+    async def listen(self):
+        if self.fail:
+            raise ConnectionError("connection reset")
+        for message in self.messages:
+            yield message
+        await asyncio.Event().wait()
+
+    async def aclose(self):
+        pass
+
+
+def test_redis_listener_resubscribes_after_failure(caplog):
+    backend = RedisBackend("redis://unused", retry_seconds=0.01)
+    message = {"type": "pmessage", "channel": b"valorant:events:7", "data": b"hello"}
+    backend._pubsub = FlakyPubSub([], fail=True)
+    subscriptions = []
+
+    async def subscribe():
+        subscriptions.append(1)
+        backend._pubsub = FlakyPubSub([message], fail=False)
+
+    backend._subscribe = subscribe
+
+    async def scenario():
+        delivered = asyncio.Queue()
+        task = asyncio.create_task(backend._listen(lambda *event: delivered.put_nowait(event)))
+        try:
+            return await asyncio.wait_for(delivered.get(), timeout=2)
+        finally:
+            task.cancel()
+
+    with caplog.at_level(logging.ERROR, logger="app.core.events"):
+        assert asyncio.run(scenario()) == (7, "hello")
+    assert subscriptions == [1]
+    assert "resubscribing" in caplog.text
@@ -0,0 +1,81 @@
+import re
+
+from sqlalchemy import create_engine, event, inspect, text
+
+from app.database import ensure_server_defaults
+
+from ..conftest import engine
+from .test_auth_matches import authenticate
+
+
+def test_create_returns_row_without_a_select(client):
+    tokens = authenticate(client, "oneshot")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        response = client.post(
+            "/matches/", json={"map": "Lotus", "agent": "Viper", "score": 6}, headers=headers
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert response.status_code == 201
+    assert response.json()["created_at"] is not None
+    on_matches = [s for s in statements if re.search(r"\b(FROM|INTO|UPDATE) matches\b", s)]
+    assert len(on_matches) == 1
+    assert on_matches[0].startswith("INSERT INTO matches ") and "RETURNING" in on_matches[0]
+    # The whole request: the token's user lookup, the INSERT, five statements
+    # keeping the leaderboards current and two for the sync log.
+    tables = [re.search(r"(?:FROM|INTO|UPDATE) (\w+)", s).group(1) for s in statements]
+    assert tables == [
+        "users",
+        "matches",
+        "leaderboard_player_buckets",
+        "leaderboard_players",
+        "leaderboard_player_buckets",
+        "leaderboard_players",
+        "leaderboard_buckets",
+        "sync_versions",
+        "sync_log",
+    ]
+
+
+def test_duplicate_registration_rejected(client):
+    payload = {"username": "twin", "email": "twin@valorant.app", "password": "Twinpass123!"}
+    assert client.post("/register", json=payload).status_code == 201
+
+    taken_email = {**payload, "username": "twin2"}
+    response = client.post("/register", json=taken_email)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Username or email already exists"
+
+
+def test_ensure_server_defaults_rebuilds_old_sqlite_table():
+    scratch = create_engine("sqlite://")
+    with scratch.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE strategies (id INTEGER PRIMARY KEY, title VARCHAR(200) NOT NULL,"
+                " description TEXT, user_id INTEGER NOT NULL, created_at DATETIME,"
+                " updated_at DATETIME)"
+            )
+        )
+        connection.execute(
+            text("INSERT INTO strategies (id, title, user_id) VALUES (1, 'Old', 1)")
+        )
+        ensure_server_defaults(connection)
+
+        columns = {c["name"]: c for c in inspect(connection).get_columns("strategies")}
+        assert columns["created_at"]["default"] is not None
+        assert connection.execute(text("SELECT title FROM strategies")).scalar() == "Old"
+        connection.execute(text("INSERT INTO strategies (title, user_id) VALUES ('New', 1)"))
+        created = connection.execute(
+            text("SELECT created_at FROM strategies WHERE title = 'New'")
+        ).scalar()
+        assert created is not None
+    scratch.dispose()
@@ -0,0 +1,88 @@
+from sqlalchemy import event
+from sqlalchemy.orm import load_only
+
+from app.models import Match
+
+from ..conftest import TestingSessionLocal, engine
+from .test_auth_matches import authenticate
+
+
+def log_matches(client, username, scores, map_name="Ascent", agent="Jett"):
+    auth = authenticate(client, username)
+    headers = {"Authorization": f"Bearer {auth['access_token']}"}
+    for score in scores:
+        client.post(
+            "/matches",
+            json={"map": map_name, "agent": agent, "score": score},
+            headers=headers,
+        )
+    return headers
+
+
+def test_leaderboard_ranks_players_by_best_score(client):
+    log_matches(client, "topfragger", [9, 4])
+    log_matches(client, "midfragger", [6, 6, 7])
+    headers = log_matches(client, "lowfragger", [3])
+    log_matches(client, "otheragent", [10], agent="Sage")
+
+    response = client.get("/leaderboards", params={"map": "Ascent", "agent": "Jett"}, headers=headers)
+    assert response.status_code == 200
+    board = response.json()
+    assert board["players"] == 3
+    assert [entry["username"] for entry in board["entries"]] == ["topfragger", "midfragger", "lowfragger"]
+    assert [entry["rank"] for entry in board["entries"]] == [1, 2, 3]
+    assert board["entries"][1]["average"] == 6.33
+
+
+def test_standing_reports_rank_and_percentiles(client):
+    log_matches(client, "rival", [8])
+    headers = log_matches(client, "climber", [5, 7])
+
+    standing = client.get("/leaderboards/me", params={"map": "Ascent", "agent": "Jett"}, headers=headers)
+    assert standing.status_code == 200
+    payload = standing.json()
+    assert payload["rank"] == 2
+    assert payload["players"] == 2
+    assert payload["best"] == 7
+    assert payload["percentile"] == 25.0
+    # Average 6 against match scores [5, 7, 8]: one below, none equal.
+    assert payload["match_percentile"] == 33.33
+
+    missing = client.get("/leaderboards/me", params={"map": "Icebox", "agent": "Jett"}, headers=headers)
+    assert missing.status_code == 404
+
+
+def test_deleting_a_partly_loaded_match_updates_leaderboard(client):
+    headers = log_matches(client, "deferredfragger", [8, 5])
+    with TestingSessionLocal() as db:
+        match = db.query(Match).options(load_only(Match.id)).filter(Match.score == 8).one()
+        db.delete(match)
+        db.commit()
+
+    standing = client.get(
+        "/leaderboards/me", params={"map": "Ascent", "agent": "Jett"}, headers=headers
+    ).json()
+    assert (standing["best"], standing["matches"]) == (5, 1)
+
+
+def test_shared_buckets_are_bumped_once_in_key_order(client):
+    tokens = authenticate(client, "bucketcoach")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    match_id = client.post(
+        "/matches/", json={"map": "Bind", "agent": "Sage", "score": 7}, headers=headers
+    ).json()["id"]
+    writes = []
+
+    def capture(conn, cursor, statement, parameters, *args):
+        if "leaderboard_buckets" in statement:
+            writes.append(parameters)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        client.patch(f"/matches/{match_id}", json={"score": 5}, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert len(writes) == 1
+    rows = [tuple(writes[0][index : index + 5]) for index in range(0, len(writes[0]), 5)]
+    assert rows == sorted(rows)
+    assert [row[0] for row in rows] == ["best", "best", "match", "match"]
@@ -0,0 +1,102 @@
+import json
+
+import numpy as np
+from sqlalchemy import delete
+
+from app.core.config import get_settings
+from app.match_events import MEDIA_TYPE, RECORD, decode_events, encode_events
+from app.models import MatchRound, User
+
+from ..conftest import TestingSessionLocal, engine
+from .test_auth_matches import authenticate
+
+
+def _events(rows):
+    return np.array(rows, dtype=RECORD)
+
+
+def test_ingest_and_stream_timeline(client):
+    tokens = authenticate(client, "vodcoach")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    match_id = client.post(
+        "/matches/", json={"map": "Bind", "agent": "Sage", "score": 7}, headers=headers
+    ).json()["id"]
+    events = _events(
+        [
+            (2, 1500, 2, 3, 7, 12),
+            (1, 900, 5, 1, 255, 0),
+            (1, 300, 7, 0, 255, 3900),
+            (2, 0, 0, 255, 255, 0),
+        ]
+    )
+    upload = {**headers, "Content-Type": MEDIA_TYPE}
+
+    response = client.post(
+        f"/matches/{match_id}/events", content=encode_events(events), headers=upload
+    )
+    assert response.status_code == 201
+    assert response.json() == {"rounds": 2, "events": 4}
+
+    lines = client.get(f"/matches/{match_id}/timeline", headers=headers).text.splitlines()
+    first = json.loads(lines[0])
+    assert first == {
+        "round": 1,
+        "time_ms": [300, 900],
+        "kind": ["purchase", "plant"],
+        "actor": [0, 1],
+        "target": [None, None],
+        "value": [3900, 0],
+    }
+    binary = client.get(f"/matches/{match_id}/timeline?format=binary", headers=headers)
+    streamed = decode_events(binary.content)
+    assert sorted(streamed.tolist()) == sorted(events.tolist())
+
+    resend = _events([(2, 10, 4, 1, 2, 140)])
+    client.post(f"/matches/{match_id}/events", content=encode_events(resend), headers=upload)
+    lines = client.get(f"/matches/{match_id}/timeline", headers=headers).text.splitlines()
+    assert [json.loads(line)["kind"] for line in lines] == [["purchase", "plant"], ["damage"]]
+
+    bad = client.post(f"/matches/{match_id}/events", content=b"VEV1abc", headers=upload)
+    assert bad.status_code == 422
+    other = authenticate(client, "vodrival")
+    other_headers = {"Authorization": f"Bearer {other['access_token']}"}
+    assert client.get(f"/matches/{match_id}/timeline", headers=other_headers).status_code == 404
+
+    client.delete(f"/matches/{match_id}", headers=headers)
+    with TestingSessionLocal() as db:
+        assert db.query(MatchRound).count() == 0
+
+
+def test_oversized_uploads_are_refused(client, monkeypatch):
+    monkeypatch.setattr(get_settings(), "MATCH_EVENTS_MAX_EVENTS", 3)
+    monkeypatch.setattr(get_settings(), "MATCH_EVENTS_MAX_ROUNDS", 1)
+    tokens = authenticate(client, "vodhoarder")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    match_id = client.post(
+        "/matches/", json={"map": "Lotus", "agent": "Raze", "score": 4}, headers=headers
+    ).json()["id"]
+    upload = {**headers, "Content-Type": MEDIA_TYPE}
+    url = f"/matches/{match_id}/events"
+
+    too_many = _events([(1, time, 4, 0, 1, 10) for time in range(4)])
+    response = client.post(url, content=encode_events(too_many), headers=upload)
+    assert response.status_code == 413
+
+    chunks = iter([encode_events(too_many)[:20], encode_events(too_many)[20:]])
+    assert client.post(url, content=chunks, headers=upload).status_code == 413
+
+    two_rounds = _events([(1, 0, 4, 0, 1, 10), (2, 0, 4, 0, 1, 10)])
+    assert client.post(url, content=encode_events(two_rounds), headers=upload).status_code == 413
+    one_round = _events([(1, 0, 4, 0, 1, 10)])
+    assert client.post(url, content=encode_events(one_round), headers=upload).status_code == 201
+
+    # SQLite enforces ON DELETE CASCADE only with foreign keys switched on.
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA foreign_keys = ON")
+        try:
+            connection.execute(delete(User).where(User.id == tokens["user_id"]))
+            connection.commit()
+        finally:
+            connection.exec_driver_sql("PRAGMA foreign_keys = OFF")
+    with TestingSessionLocal() as db:
+        assert db.query(MatchRound).count() == 0
@@ -0,0 +1,93 @@
+import signal
+import threading
+
+import pytest
+
+from app.core import memory as memory_module
+from app.core.config import get_settings
+from app.core.memory import MemoryDiagnostics, memory
+
+from .test_auth_matches import authenticate
+
+
+@pytest.fixture
+def admin_headers(client, monkeypatch):
+    monkeypatch.setattr(get_settings(), "ADMIN_USERNAMES", ["memcoach"])
+    tokens = authenticate(client, "memcoach")
+    yield {"Authorization": f"Bearer {tokens['access_token']}"}
+    memory.stop()
+    memory.reset()
+
+
+def test_route_allocations_and_snapshot_diff(client, admin_headers):
+    assert client.post("/admin/memory/snapshots", headers=admin_headers).status_code == 409
+    started = client.post("/admin/memory/start", json={"frames": 1}, headers=admin_headers)
+    assert started.json()["tracing"] is True
+
+    for _ in range(3):
+        client.get("/dashboard", headers=admin_headers)
+    routes = {
+        route["route"]: route
+        for route in client.get("/admin/memory", headers=admin_headers).json()["routes"]
+    }
+    assert routes["GET /dashboard"]["requests"] == 3
+    assert routes["GET /dashboard"]["peak_bytes"] > 0
+
+    base = client.post("/admin/memory/snapshots", headers=admin_headers).json()["id"]
+    retained = [bytearray(64 * 1024) for _ in range(32)]
+    current = client.post("/admin/memory/snapshots", headers=admin_headers).json()["id"]
+
+    diff = client.get(
+        "/admin/memory/diff",
+        params={"base": base, "current": current},
+        headers=admin_headers,
+    ).json()
+    grown = [stat for stat in diff if "test_memory.py" in stat["location"]]
+    assert grown and grown[0]["size_diff_bytes"] >= 32 * 64 * 1024
+    top = client.get(
+        f"/admin/memory/snapshots/{current}?group_by=filename", headers=admin_headers
+    ).json()
+    assert all("size_diff_bytes" not in stat for stat in top)
+    assert client.get("/admin/memory/snapshots/999", headers=admin_headers).status_code == 404
+    del retained
+
+
+def test_memory_endpoints_require_admin(client):
+    tokens = authenticate(client, "plainmem")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/admin/memory", headers=headers).status_code == 403
+
+
+def test_recycles_worker_over_rss_threshold(monkeypatch):
+    killed = []
+    monkeypatch.setattr(memory_module.os, "kill", lambda pid, sig: killed.append(sig))
+    diagnostics = MemoryDiagnostics(recycle_bytes=1, check_every=2)
+
+    diagnostics.finish("GET /", None)
+    assert killed == []
+    diagnostics.finish("GET /", None)
+    diagnostics.finish("GET /", None)
+    diagnostics.finish("GET /", None)
+    assert killed == [signal.SIGTERM]
+
+
+def test_concurrent_requests_are_all_counted(monkeypatch):
+    monkeypatch.setattr(memory_module, "rss_bytes", lambda: 0)
+    diagnostics = MemoryDiagnostics(recycle_bytes=1, check_every=1000)
+    diagnostics.start()
+    try:
+
+        def serve():
+            for _ in range(500):
+                diagnostics.finish("GET /busy", diagnostics.begin())
+
+        threads = [threading.Thread(target=serve) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        diagnostics.stop()
+    assert diagnostics._requests == 4000
+    assert diagnostics.routes["GET /busy"].requests == 4000
+    assert diagnostics._inflight == 0
@@ -0,0 +1,58 @@
+import pytest
+
+from app.core.config import get_settings
+from app.core.profiler import flamegraph_svg, profiler
+
+from .test_auth_matches import authenticate
+
+
+@pytest.fixture
+def admin_headers(client, monkeypatch):
+    monkeypatch.setattr(get_settings(), "ADMIN_USERNAMES", ["opscoach"])
+    tokens = authenticate(client, "opscoach")
+    yield {"Authorization": f"Bearer {tokens['access_token']}"}
+    profiler.stop()
+    profiler.reset()
+
+
+def test_profiler_requires_admin(client, admin_headers):
+    tokens = authenticate(client, "plaincoach")
+    response = client.post(
+        "/admin/profiler/start",
+        json={},
+        headers={"Authorization": f"Bearer {tokens['access_token']}"},
+    )
+    assert response.status_code == 403
+    assert not profiler.active
+
+
+def test_profiles_selected_requests(client, admin_headers):
+    started = client.post(
+        "/admin/profiler/start", json={"pattern": "/login", "interval_ms": 1}, headers=admin_headers
+    )
+    assert started.status_code == 200 and started.json()["active"] is True
+
+    client.post("/login", json={"username": "opscoach", "password": "Str0ngPass!"})
+    client.get("/health")
+
+    status = client.post("/admin/profiler/stop", headers=admin_headers).json()
+    assert status["active"] is False
+    assert status["requests"] == 1 and status["samples"] > 0
+
+    collapsed = client.get("/admin/profiler/collapsed", headers=admin_headers).text
+    lines = collapsed.splitlines()
+    assert all(line.startswith("POST /login;") for line in lines)
+    assert any("verify_password (app/auth.py" in line for line in lines)
+
+    svg = client.get("/admin/profiler/flamegraph", headers=admin_headers)
+    assert svg.headers["content-type"] == "image/svg+xml"
+    assert "POST /login" in svg.text
+
+    assert client.delete("/admin/profiler", headers=admin_headers).status_code == 204
+    assert client.get("/admin/profiler/collapsed", headers=admin_headers).text == ""
+
+
+def test_flamegraph_widths_follow_samples():
+    svg = flamegraph_svg({"GET /a;f;g": 3, "GET /a;f": 1}, width=400)
+    assert 'width="400.0"' in svg
+    assert 'width="300.0"' in svg
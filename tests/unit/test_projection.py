@@ -0,0 +1,59 @@
+from sqlalchemy import event
+
+from ..conftest import engine
+from .test_auth_matches import authenticate
+
+
+def test_list_matches_projects_requested_fields(client):
+    tokens = authenticate(client, "sparsecoach")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    client.post(
+        "/matches/",
+        json={"map": "Bind", "agent": "Sage", "score": 7, "notes": "long notes " * 40},
+        headers=headers,
+    )
+
+    full = client.get("/matches/", headers=headers).json()
+    assert full[0]["notes"].startswith("long notes")
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        response = client.get("/matches/?fields=id,map,score", headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert response.status_code == 200
+    assert response.json() == [{"id": full[0]["id"], "map": "Bind", "score": 7}]
+    match_selects = [sql for sql in statements if "FROM matches" in sql]
+    assert match_selects and all("notes" not in sql.split("FROM")[0] for sql in match_selects)
+
+
+def test_unknown_fields_are_rejected(client):
+    tokens = authenticate(client, "sparsecoach2")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    response = client.get("/strategies/?fields=id,password", headers=headers)
+    assert response.status_code == 400
+    assert "password" in response.json()["detail"]
+
+    batch = client.post(
+        "/batch/",
+        json={"operations": [{"op": "sessions.list", "args": {"fields": "id,title"}}]},
+        headers=headers,
+    )
+    assert batch.status_code == 200
+    assert batch.json()["results"][0]["result"] == []
+
+
+def test_list_schemas_stay_strict(client):
+    paths = client.get("/openapi.json").json()["paths"]
+    for path, schema in (
+        ("/matches/", "MatchResponse"),
+        ("/strategies/", "StrategyResponse"),
+        ("/sessions/", "SessionResponse"),
+    ):
+        listed = paths[path]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+        assert listed["items"] == {"$ref": f"#/components/schemas/{schema}"}
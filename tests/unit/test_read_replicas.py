@@ -0,0 +1,152 @@
+import os
+import shutil
+
+import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.cache import query_cache
+from app.database import (
+    Base,
+    READ_METHODS,
+    ReplicaSet,
+    get_db,
+    get_sessionmaker,
+    sticky_cookie,
+    sticky_writers,
+)
+from app.main import app
+
+from .test_auth_matches import authenticate
+
+
+def sqlite_engine(path):
+    return create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        poolclass=NullPool,
+    )
+
+
+@pytest.fixture
+def replicated(tmp_path, monkeypatch):
+    # These tests check where queries go, so results must not come from the cache.
+    monkeypatch.setattr(query_cache, "backend", None)
+    primary_path = tmp_path / "primary.db"
+    replica_path = tmp_path / "replica.db"
+    primary = sqlite_engine(primary_path)
+    Base.metadata.create_all(bind=primary)
+    replicas = ReplicaSet([sqlite_engine(replica_path)], retry_seconds=60, health_interval=0)
+    factory = get_sessionmaker(primary, replicas)
+
+    def override_get_db(request: Request):
+        db = factory()
+        db.info["read_only"] = request.method in READ_METHODS
+        sticky_cookie.attach(db, request)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def replicate():
+        shutil.copyfile(primary_path, replica_path)
+
+    app.dependency_overrides[get_db] = override_get_db
+    with TestClient(app) as test_client:
+        yield test_client, factory, replicate
+    app.dependency_overrides.pop(get_db, None)
+    sticky_writers._until.clear()
+
+
+def _forget_writes(client):
+    """Drop both read-your-writes marks: this worker's and the client's cookie."""
+    sticky_writers._until.clear()
+    client.cookies.clear()
+
+
+def test_reads_use_replica_after_sticky_window(replicated):
+    client, factory, replicate = replicated
+    auth = authenticate(client, "replicacoach")
+    headers = {"Authorization": f"Bearer {auth['access_token']}"}
+    replicate()
+
+    match = {"map": "Lotus", "agent": "Raze", "score": 6}
+    assert client.post("/matches", json=match, headers=headers).status_code == 201
+    # Within the sticky window the writer reads its own write from the primary.
+    assert len(client.get("/matches", headers=headers).json()) == 1
+
+    _forget_writes(client)
+    # The replica has not caught up yet, so a routed read does not see the match.
+    assert client.get("/matches", headers=headers).json() == []
+
+    replicate()
+    assert len(client.get("/matches", headers=headers).json()) == 1
+
+
+def test_reads_fall_back_to_primary_when_replica_is_down(replicated, tmp_path):
+    client, factory, replicate = replicated
+    auth = authenticate(client, "fallbackcoach")
+    headers = {"Authorization": f"Bearer {auth['access_token']}"}
+    client.post("/matches", json={"map": "Haven", "agent": "Omen", "score": 8}, headers=headers)
+    _forget_writes(client)
+
+    factory.kw["replicas"].engines[0] = sqlite_engine(tmp_path / "missing" / "replica.db")
+    response = client.get("/matches", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+
+def test_read_retries_on_primary_when_chosen_replica_dies(replicated, tmp_path):
+    client, factory, replicate = replicated
+    auth = authenticate(client, "diedcoach")
+    headers = {"Authorization": f"Bearer {auth['access_token']}"}
+    client.post("/matches", json={"map": "Split", "agent": "Sova", "score": 4}, headers=headers)
+    replicate()
+    _forget_writes(client)
+    replicas = factory.kw["replicas"]
+    replicas.health_interval = 60
+    assert len(client.get("/matches", headers=headers).json()) == 1
+
+    # Health was just checked, so the next session still picks the replica.
+    replica_path = tmp_path / "replica.db"
+    os.remove(replica_path)
+    os.mkdir(replica_path)
+    response = client.get("/matches", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    assert 0 in replicas._down_until
+
+
+def test_sticky_writers_forget_expired_marks(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.database.time.monotonic", lambda: now[0])
+    writers = type(sticky_writers)()
+    writers.mark(1, 5)
+    now[0] += 10
+    writers.mark(2, 5)
+    assert set(writers._until) == {2}
+    assert not writers.is_sticky(1) and writers.is_sticky(2)
+
+
+def test_write_cookie_keeps_reads_on_primary_across_workers(replicated):
+    client, factory, replicate = replicated
+    replicate()
+    # Signing up (and logging in) commits on the primary; the replica has no user yet.
+    auth = authenticate(client, "cookiecoach")
+    headers = {"Authorization": f"Bearer {auth['access_token']}"}
+    assert sticky_cookie.name in client.cookies
+
+    # Another worker has no mark for this user, but the client sends the cookie.
+    sticky_writers._until.clear()
+    assert client.get("/matches", headers=headers).status_code == 200
+    match = {"map": "Pearl", "agent": "Harbor", "score": 5}
+    assert client.post("/matches", json=match, headers=headers).status_code == 201
+    sticky_writers._until.clear()
+    assert len(client.get("/matches", headers=headers).json()) == 1
+
+    forged = client.cookies[sticky_cookie.name].replace(".", "9.", 1)
+    client.cookies.clear()
+    client.cookies.set(sticky_cookie.name, forged)
+    assert client.get("/matches", headers=headers).status_code == 401
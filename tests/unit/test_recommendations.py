@@ -0,0 +1,66 @@
+from app import recommendations
+from app.recommendations import StrategyIndex, vectorize
+
+from .test_auth_matches import authenticate
+
+
+def _add_strategy(client, headers, title, description):
+    payload = {"title": title, "description": description}
+    return client.post("/strategies/", json=payload, headers=headers).json()["id"]
+
+
+def test_similar_and_recommend_follow_strategy_changes(client):
+    tokens = authenticate(client, "recocoach")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    smoke = _add_strategy(client, headers, "Ascent B split", "Smoke market and split B main")
+    split = _add_strategy(client, headers, "B split on Ascent", "Viper wall then split B")
+    eco = _add_strategy(client, headers, "Eco round", "Stack pistols and play for picks")
+
+    similar = client.get(f"/strategies/{smoke}/similar", headers=headers).json()
+    assert [row["strategy"]["id"] for row in similar] == [split]
+    assert 0 < similar[0]["similarity"] <= 1
+
+    client.post("/matches/", json={"map": "Ascent", "agent": "Viper", "score": 2}, headers=headers)
+    client.post("/matches/", json={"map": "Bind", "agent": "Sage", "score": 9}, headers=headers)
+    recommended = client.get("/strategies/recommend", headers=headers).json()
+    assert recommended["map"] == "Ascent"
+    assert recommended["results"][0]["strategy"]["id"] == split
+
+    client.patch(f"/strategies/{eco}", json={"description": "Ascent viper eco"}, headers=headers)
+    client.delete(f"/strategies/{split}", headers=headers)
+    recommended = client.get("/strategies/recommend?map=Ascent", headers=headers).json()
+    assert [row["strategy"]["id"] for row in recommended["results"]] == [eco, smoke]
+    assert client.get(f"/strategies/{split}/similar", headers=headers).status_code == 404
+
+
+def test_index_updates_only_the_changed_strategy(monkeypatch):
+    words = [f"term{number}" for number in range(500)]
+
+    def description(strategy_id):
+        return " ".join(words[(strategy_id * 7 + offset) % 500] for offset in range(30))
+
+    index = StrategyIndex()
+    for strategy_id in range(2000):
+        index.upsert(strategy_id, f"Plan {strategy_id}", description(strategy_id))
+    index.similar(0, 10)
+
+    calls = []
+    monkeypatch.setattr(
+        recommendations,
+        "vectorize",
+        lambda *args, **kwargs: calls.append(args) or vectorize(*args, **kwargs),
+    )
+    index.upsert(5, "Plan 5", description(6))
+    index.remove(7)
+    results = index.similar(1, 10)
+    assert len(calls) == 1
+    assert len(results) == 10 and 1 not in [strategy_id for strategy_id, _ in results]
+
+    monkeypatch.undo()
+    fresh = StrategyIndex()
+    for strategy_id in range(2000):
+        if strategy_id != 7:
+            text = description(6 if strategy_id == 5 else strategy_id)
+            fresh.upsert(strategy_id, f"Plan {strategy_id}", text)
+    for strategy_id in (1, 5, 6):
+        assert dict(index.similar(strategy_id, 2000)) == dict(fresh.similar(strategy_id, 2000))
@@ -0,0 +1,206 @@
+import numpy as np
+import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from app.core.cache import query_cache
+from app.core.config import get_settings
+from app.database import (
+    Base,
+    READ_METHODS,
+    HashRing,
+    RoutingSession,
+    ShardMap,
+    get_db,
+    get_sessionmaker,
+    sticky_cookie,
+)
+from app.main import app
+from app.match_events import MEDIA_TYPE, RECORD, encode_events
+from app.models import Match, MatchRound, User, UserShard
+from app.sharding import init_shards, misplaced_users, move_user, rebalance
+
+from .test_auth_matches import authenticate, create_user_payload
+from .test_read_replicas import sqlite_engine
+
+
+@pytest.fixture
+def sharded(tmp_path, monkeypatch):
+    monkeypatch.setattr(query_cache, "backend", None)
+    directory = sqlite_engine(tmp_path / "directory.db")
+    Base.metadata.create_all(bind=directory)
+    shards = ShardMap(
+        directory, {f"shard{index}": sqlite_engine(tmp_path / f"shard{index}.db") for index in range(3)}
+    )
+    init_shards(shards)
+    factory = get_sessionmaker(directory, shards=shards)
+
+    def override_get_db(request: Request):
+        db = factory()
+        db.info["read_only"] = request.method in READ_METHODS
+        sticky_cookie.attach(db, request)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    with TestClient(app) as test_client:
+        yield test_client, shards
+    app.dependency_overrides.pop(get_db, None)
+
+
+def _headers(client, username):
+    auth = authenticate(client, username)
+    return auth["user_id"], {"Authorization": f"Bearer {auth['access_token']}"}
+
+
+def _match_owners(shards):
+    owners = {}
+    for name, engine in shards.engines.items():
+        with engine.connect() as connection:
+            owners[name] = set(connection.execute(select(Match.user_id).distinct()).scalars())
+    return owners
+
+
+def test_ring_only_moves_keys_to_the_new_shard():
+    before = HashRing(["shard0", "shard1", "shard2"])
+    after = HashRing(["shard0", "shard1", "shard2", "shard3"])
+    moved = [key for key in range(10000) if before.node(key) != after.node(key)]
+    assert {after.node(key) for key in moved} == {"shard3"}
+    assert 0.15 < len(moved) / 10000 < 0.35
+
+
+def test_users_stay_on_their_shard_and_leaderboards_fan_out(sharded, monkeypatch):
+    client, shards = sharded
+    monkeypatch.setattr(get_settings(), "ADMIN_USERNAMES", ["shardcoach0"])
+    users = [_headers(client, f"shardcoach{index}") for index in range(6)]
+    for score, (_, headers) in enumerate(users):
+        match = {"map": "Ascent", "agent": "Jett", "score": score + 2}
+        assert client.post("/matches/", json=match, headers=headers).status_code == 201
+
+    owners = _match_owners(shards)
+    assert sum(1 for ids in owners.values() if ids) >= 2
+    for user_id, _ in users:
+        assert {name for name, ids in owners.items() if user_id in ids} == {shards.home(user_id)}
+    assert [m["score"] for m in client.get("/matches/", headers=users[3][1]).json()] == [5]
+
+    board = client.get(
+        "/leaderboards/", params={"map": "Ascent", "agent": "Jett", "limit": 3}, headers=users[0][1]
+    ).json()
+    assert board["players"] == 6
+    assert [(entry["rank"], entry["best"]) for entry in board["entries"]] == [(1, 7), (2, 6), (3, 5)]
+    assert board["entries"][0]["username"] == "shardcoach5"
+    standing = client.get(
+        "/leaderboards/me", params={"map": "Ascent", "agent": "Jett"}, headers=users[0][1]
+    ).json()
+    assert standing["rank"] == 6
+
+    batch = client.post(
+        "/batch",
+        json={
+            "parallel_reads": True,
+            "operations": [
+                {"op": "leaderboards.top", "args": {"map": "Ascent", "agent": "Jett"}},
+                {"op": "matches.list"},
+            ],
+        },
+        headers=users[4][1],
+    ).json()
+    assert batch["results"][0]["result"]["players"] == 6
+    assert [m["score"] for m in batch["results"][1]["result"]] == [6]
+
+    stats = client.get("/admin/shards", headers=users[0][1]).json()
+    assert [row["shard"] for row in stats] == ["shard0", "shard1", "shard2"]
+    assert sum(row["users"] for row in stats) == 6
+    assert sum(row["matches"] for row in stats) == 6
+
+
+def test_move_user_keeps_rows_and_ids(sharded):
+    client, shards = sharded
+    user_id, headers = _headers(client, "movingcoach")
+    _, other_headers = _headers(client, "stayingcoach")
+    for score in (4, 9):
+        client.post("/matches/", json={"map": "Bind", "agent": "Sage", "score": score}, headers=headers)
+    client.post("/strategies/", json={"title": "Retake B"}, headers=headers)
+    before = client.get("/matches/", headers=headers).json()
+
+    source = shards.home(user_id)
+    target = next(name for name in shards.engines if name != source)
+    assert move_user(shards, user_id, target, drain_seconds=0)
+    assert not move_user(shards, user_id, target, drain_seconds=0)
+
+    assert client.get("/matches/", headers=headers).json() == before
+    assert len(client.get("/strategies/", headers=headers).json()) == 1
+    assert user_id not in _match_owners(shards)[source]
+    standing = client.get(
+        "/leaderboards/me", params={"map": "Bind", "agent": "Sage"}, headers=headers
+    ).json()
+    assert (standing["best"], standing["matches"], standing["players"]) == (9, 2, 1)
+
+    created = client.post(
+        "/matches/", json={"map": "Bind", "agent": "Sage", "score": 1}, headers=other_headers
+    ).json()
+    assert created["id"] not in {match["id"] for match in before}
+    assert misplaced_users(shards) == [(user_id, target, source)]
+    assert rebalance(shards, drain_seconds=0) == [(user_id, target, source)]
+    assert client.get("/matches/", headers=headers).json() == before
+
+
+def test_writes_wait_while_user_is_moving(sharded):
+    client, shards = sharded
+    user_id, headers = _headers(client, "frozencoach")
+    match_id = client.post(
+        "/matches/", json={"map": "Haven", "agent": "Omen", "score": 6}, headers=headers
+    ).json()["id"]
+    with shards.directory.begin() as connection:
+        connection.execute(
+            UserShard.__table__.update()
+            .where(UserShard.user_id == user_id)
+            .values(moving=True)
+        )
+
+    response = client.post("/matches/", json={"map": "Haven", "agent": "Omen", "score": 7}, headers=headers)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+    assert len(client.get("/matches/", headers=headers).json()) == 1
+
+    events = np.array([(1, 0, 0, 255, 255, 0)], dtype=RECORD)
+    upload = client.post(
+        f"/matches/{match_id}/events",
+        content=encode_events(events),
+        headers={**headers, "Content-Type": MEDIA_TYPE},
+    )
+    assert upload.status_code == 503
+    with shards.engines[shards.home(user_id)].connect() as connection:
+        assert connection.execute(select(func.count()).select_from(Match)).scalar() == 1
+        assert connection.execute(select(func.count()).select_from(MatchRound)).scalar() == 0
+
+
+def test_signup_failing_after_the_shard_write_can_be_retried(sharded, monkeypatch):
+    client, shards = sharded
+    commit = RoutingSession.commit
+    before_commit = []
+
+    def failing_commit(self):
+        # What other connections see by the time the directory would commit.
+        for engine in shards.engines.values():
+            with engine.connect() as connection:
+                before_commit.extend(connection.execute(select(User.username)).scalars())
+        raise RuntimeError("directory went away")
+
+    monkeypatch.setattr(RoutingSession, "commit", failing_commit)
+    with pytest.raises(RuntimeError):
+        client.post("/register", json=create_user_payload("retrycoach"))
+    monkeypatch.setattr(RoutingSession, "commit", commit)
+    assert before_commit == ["retrycoach"]
+
+    user_id, headers = _headers(client, "retrycoach")
+    match = {"map": "Lotus", "agent": "Fade", "score": 8}
+    assert client.post("/matches/", json=match, headers=headers).status_code == 201
+    usernames = []
+    for engine in shards.engines.values():
+        with engine.connect() as connection:
+            usernames += connection.execute(select(User.username, User.id)).all()
+    assert usernames == [("retrycoach", user_id)]
@@ -0,0 +1,40 @@
+from app.models import Match
+
+from ..conftest import TestingSessionLocal
+from .test_auth_matches import authenticate
+
+
+def test_sync_returns_changes_and_tombstones_since_version(client):
+    tokens = authenticate(client, "synccoach")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    first = client.post(
+        "/matches/", json={"map": "Bind", "agent": "Sage", "score": 7}, headers=headers
+    ).json()
+    second = client.post(
+        "/matches/", json={"map": "Haven", "agent": "Jett", "score": 4}, headers=headers
+    ).json()
+    client.post("/strategies/", json={"title": "Default A"}, headers=headers)
+
+    snapshot = client.get("/sync/?since=0&limit=2", headers=headers).json()
+    assert snapshot["more"] is True
+    assert snapshot["latest"] == 3
+    assert [row["id"] for row in snapshot["upserts"]["matches"]] == [first["id"], second["id"]]
+    rest = client.get(f"/sync/?since={snapshot['version']}", headers=headers).json()
+    assert rest["more"] is False
+    assert [row["title"] for row in rest["upserts"]["strategies"]] == ["Default A"]
+    cursor = rest["version"]
+
+    with TestingSessionLocal() as db:
+        db.delete(db.get(Match, first["id"]))
+        db.get(Match, second["id"]).score = 9
+        db.commit()
+
+    delta = client.get(f"/sync/?since={cursor}", headers=headers).json()
+    assert delta["deletes"]["matches"] == [first["id"]]
+    assert [(row["id"], row["score"]) for row in delta["upserts"]["matches"]] == [(second["id"], 9)]
+    assert delta["upserts"]["strategies"] == []
+    assert delta["version"] == delta["latest"] == cursor + 2
+
+    empty = client.get(f"/sync/?since={delta['version']}", headers=headers).json()
+    assert empty["version"] == delta["version"]
+    assert client.get("/sync/?since=999", headers=headers).status_code == 409